@@ -21,20 +21,56 @@ Run with:
 
 Test with:
     uv run pytest basic_agent.py
+
+Stream the answer as it arrives, with time-to-first-token and tokens/sec:
+    uv run basic_agent.py --prompt x --stream
+
+Answer several prompts concurrently over one shared connection pool:
+    uv run basic_agent.py --prompt x --prompt y --concurrency 8 --timeout 30
+
+Run a JSONL file of prompts, resuming from the output file if a previous run stopped:
+    uv run basic_agent.py --input prompts.jsonl --output results.jsonl --concurrency 16
+
+Answer repeated prompts from a response cache (memory LRU plus SQLite, with a TTL):
+    uv run basic_agent.py --prompt x --cache .agent1/response_cache.sqlite --cache-ttl 3600
+
+Hold a multi-turn conversation within a fixed token budget (older turns are summarized):
+    uv run basic_agent.py --session demo --memory-tokens 2000 --prompt "My name is Ada."
+    uv run basic_agent.py --session demo --prompt "What is my name?"
+
+Write a span per model call (tokens, cached tokens, latency, estimated cost) plus Prometheus metrics:
+    uv run basic_agent.py --prompt x --telemetry .agent1/spans.jsonl
+
+Record and replay model calls (modes: record, replay, auto):
+    uv run basic_agent.py --prompt x --cassette agent1.cassette.jsonl --cassette-mode replay
 """
 
 import os
 import sys
+import json
+import gzip
 import argparse
-from typing import Optional, Dict, Any
+import atexit
+import time
+import weakref
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Union, AsyncIterator, Awaitable, Callable
 from rich.console import Console
+from rich.live import Live
 from rich.panel import Panel
 from dotenv import load_dotenv
 import asyncio
 
-from openai import AzureOpenAI
+import httpx
+from openai import AsyncAzureOpenAI
 from openai.types.chat import ChatCompletion
 
+from batch import completed_ids, run_batch
+from cassettes import cassette_http_client
+from response_cache import ResponseCache
+from telemetry import Telemetry, add_usage, report_telemetry, trace, use_telemetry
+
 # Initialize console and load environment variables
 console = Console()
 load_dotenv()
@@ -42,56 +78,350 @@ load_dotenv()
 # Constants
 MODEL = os.environ.get("AZURE_MODEL", "gpt-4o")  # Use environment variable or default to "gpt-4o"
 
+@dataclass
+class CallMetrics:
+    """Timings of one model call, in seconds."""
+    latency: float
+    time_to_first_token: Optional[float] = None  # Streaming calls only
+    completion_tokens: int = 0
+
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """Generation rate after the first token (over the whole call when not streaming)."""
+        generating = self.latency - (self.time_to_first_token or 0.0)
+        if not self.completion_tokens or generating <= 0:
+            return None
+        return self.completion_tokens / generating
+
+    def summary(self) -> str:
+        parts = []
+        if self.time_to_first_token is not None:
+            parts.append(f"first token {self.time_to_first_token * 1000:.0f}ms")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tokens/s")
+        parts.append(f"total {self.latency:.2f}s")
+        return ", ".join(parts)
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: about four characters per token."""
+    return len(text) // 4 + 1
+
+SUMMARY_INSTRUCTIONS = """You maintain the running summary of a conversation between a user and an assistant.
+Merge the new turns into the current summary. Keep names, numbers, decisions, open questions and the user's
+preferences; drop pleasantries and repetition. Reply with the updated summary only, in at most {words} words."""
+
+class Session:
+    """
+    Conversation memory with a hard token budget.
+
+    Recent turns are kept verbatim in a sliding window. Once the summary plus the
+    window grows past max_tokens, the oldest turns are folded into a running
+    summary of at most summary_tokens, in the background, until the window is
+    back under half its share of the budget. Only the evicted turns and the
+    previous summary go to the summarizer, so each prompt and each compaction
+    stays the same size however long the conversation runs.
+    """
+    VERSION = 1
+
+    def __init__(self, session_id: str = "default", max_tokens: int = 2000, summary_tokens: Optional[int] = None):
+        summary_tokens = summary_tokens or max_tokens // 5
+        if summary_tokens >= max_tokens:
+            raise ValueError("summary_tokens must be smaller than max_tokens")
+        self.session_id = session_id
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.turns: List[Dict[str, str]] = []
+        self.summarized_turns = 0
+        self.compaction: Optional[asyncio.Task] = None
+
+    def tokens(self) -> int:
+        return estimate_tokens(self.summary) + sum(estimate_tokens(turn["content"]) for turn in self.turns)
+
+    def messages(self) -> List[Dict[str, str]]:
+        """The summary and recent turns, to go between the system prompt and the new user message."""
+        messages = []
+        if self.summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{self.summary}"})
+        return messages + self.turns
+
+    def add(self, prompt: str, response: str):
+        self.turns += [{"role": "user", "content": prompt}, {"role": "assistant", "content": response}]
+
+    def compact(self, summarize: Callable[[str, List[Dict[str, str]], int], Awaitable[str]]):
+        """If over budget, evict the oldest turns now and fold them into the summary in the background."""
+        if self.tokens() <= self.max_tokens:
+            return
+        target = (self.max_tokens - self.summary_tokens) // 2
+        evicted = []
+        while self.turns and sum(estimate_tokens(turn["content"]) for turn in self.turns) > target:
+            evicted += self.turns[:2]
+            del self.turns[:2]
+        self.compaction = asyncio.create_task(self.fold(evicted, summarize))
+
+    async def fold(self, evicted: List[Dict[str, str]], summarize):
+        try:
+            summary = await summarize(self.summary, evicted, self.summary_tokens)
+        except Exception as e:
+            # Keep the turns verbatim and try again after the next turn
+            self.turns[:0] = evicted
+            console.print(f"[yellow]Session summary failed, keeping the turns for now: {e}[/yellow]")
+            return
+        # The summarizer is asked for a length; the budget holds even when it overshoots
+        self.summary = (summary or self.summary)[:self.summary_tokens * 4]
+        self.summarized_turns += len(evicted) // 2
+
+    async def settle(self):
+        """Wait for a background compaction to finish."""
+        task, self.compaction = self.compaction, None
+        if task:
+            await task
+
+    def save(self, path: str):
+        """Write the session as gzipped, compact JSON; call settle() first."""
+        data = {
+            "v": self.VERSION,
+            "id": self.session_id,
+            "max": self.max_tokens,
+            "sum_max": self.summary_tokens,
+            "sum": self.summary,
+            "n": self.summarized_turns,
+            "turns": [[turn["role"][0], turn["content"]] for turn in self.turns],
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, session_id: str = "default", max_tokens: int = 2000) -> "Session":
+        """Read a saved session, or start a new one if the file doesn't exist."""
+        if not os.path.exists(path):
+            return cls(session_id, max_tokens)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            data = json.load(f)
+        session = cls(data["id"], data["max"], data["sum_max"])
+        session.summary = data["sum"]
+        session.summarized_turns = data["n"]
+        roles = {"u": "user", "a": "assistant"}
+        session.turns = [{"role": roles[role], "content": content} for role, content in data["turns"]]
+        return session
+
 class Agent:
     """Simple Agent implementation"""
-    def __init__(self, name: str, instructions: str, model: str):
+    def __init__(self, name: str, instructions: str, model: str, cache: Optional[ResponseCache] = None):
         self.name = name
         self.instructions = instructions
         self.model = model
         self.client = None
+        # Set to None to opt this agent out of caching
+        self.cache = cache
+        # Metrics of the most recent calls, oldest first
+        self.metrics = deque(maxlen=1000)
 
-    async def run(self, prompt: str) -> str:
-        """Run the agent with a prompt"""
-        if not self.client:
-            self.client = get_azure_openai_client()
-
-        messages = [
+    def build_messages(self, prompt: str, session: Optional[Session] = None) -> List[Dict[str, str]]:
+        return [
             {"role": "system", "content": self.instructions},
+            *(session.messages() if session else []),
             {"role": "user", "content": prompt}
         ]
 
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=messages
-        )
-
+    async def summarize(self, summary: str, turns: List[Dict[str, str]], max_tokens: int) -> str:
+        """Fold conversation turns into a running summary of about max_tokens."""
+        client = self.client or get_azure_openai_client()
+        transcript = "\n".join(f"{turn['role']}: {turn['content']}" for turn in turns)
+        with trace("llm", f"{self.name} summary", model=self.model) as span:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=max_tokens * 3 // 4)},
+                    {"role": "user", "content": f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"}
+                ]
+            )
+            add_usage(span, response.usage)
         return response.choices[0].message.content
 
-def get_azure_openai_client():
+    async def run(self, prompt: str, session: Optional[Session] = None) -> str:
+        """Run the agent with a prompt, continuing the session's conversation if one is given"""
+        if session:
+            await session.settle()
+        elif self.cache:
+            cached = self.cache.get("response", self, prompt)
+            if cached is not None:
+                return cached
+
+        client = self.client or get_azure_openai_client()
+
+        start = time.perf_counter()
+        with trace("llm", self.name, model=self.model) as span:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=self.build_messages(prompt, session)
+            )
+            add_usage(span, response.usage)
+
+        self.metrics.append(CallMetrics(
+            latency=time.perf_counter() - start,
+            completion_tokens=response.usage.completion_tokens if response.usage else 0
+        ))
+        content = response.choices[0].message.content
+        if session:
+            session.add(prompt, content)
+            session.compact(self.summarize)
+        elif self.cache and content:
+            self.cache.put("response", self, prompt, content)
+        return content
+
+    async def stream(self, prompt: str, session: Optional[Session] = None) -> AsyncIterator[str]:
+        """Run the agent with a prompt, yielding the response text as it arrives"""
+        start = time.perf_counter()
+        if session:
+            await session.settle()
+        elif self.cache:
+            cached = self.cache.get("response", self, prompt)
+            if cached is not None:
+                yield cached
+                self.metrics.append(CallMetrics(latency=time.perf_counter() - start, time_to_first_token=0.0))
+                return
+
+        client = self.client or get_azure_openai_client()
+
+        first_token = None
+        chunks = 0
+        usage = None
+        text = []
+        messages = self.build_messages(prompt, session)
+        with trace("llm", self.name, model=self.model, stream=True) as span:
+            call_start = time.perf_counter()
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in response:
+                if chunk.usage:
+                    usage = chunk.usage
+                # Azure sends content-filter results in chunks without choices
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                    span["time_to_first_token"] = time.perf_counter() - call_start
+                chunks += 1
+                text.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+
+            if usage:
+                add_usage(span, usage)
+            else:
+                # Estimated: about 4 characters per prompt token and one token per chunk
+                add_usage(span, {
+                    "prompt_tokens": sum(len(message["content"]) for message in messages) // 4,
+                    "completion_tokens": chunks,
+                })
+                span["estimated"] = True
+
+        # Without usage in the stream, count chunks: the service sends about one token per chunk
+        self.metrics.append(CallMetrics(
+            latency=time.perf_counter() - start,
+            time_to_first_token=first_token,
+            completion_tokens=usage.completion_tokens if usage else chunks
+        ))
+        if session:
+            session.add(prompt, "".join(text))
+            session.compact(self.summarize)
+        elif self.cache and text:
+            self.cache.put("response", self, prompt, "".join(text))
+
+    async def run_many(
+        self,
+        prompts: List[str],
+        concurrency: int = 8,
+        timeout: Optional[float] = None
+    ) -> List[Union[str, Exception]]:
+        """
+        Run the agent on many prompts with at most `concurrency` requests in flight.
+
+        Args:
+            prompts: The prompts to run
+            concurrency: Maximum number of concurrent requests
+            timeout: Optional per-request timeout in seconds
+
+        Returns:
+            One result per prompt, in prompt order. A prompt that fails or times out
+            yields its exception instead of a response, so the rest of the batch still completes.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(prompt: str) -> Union[str, Exception]:
+            async with semaphore:
+                try:
+                    return await asyncio.wait_for(self.run(prompt), timeout)
+                except Exception as e:
+                    return e
+
+        return await asyncio.gather(*(run_one(prompt) for prompt in prompts))
+
+# Shared clients per event loop (httpx connection pools can't cross loops), keyed by configuration
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncAzureOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def get_azure_openai_client() -> AsyncAzureOpenAI:
     """
-    Create and return an Azure OpenAI client.
+    Return the shared async Azure OpenAI client for the running event loop.
+
+    Every agent on the loop uses the same client and keep-alive connection pool,
+    so concurrent requests don't each pay for a new connection.
 
     Returns:
-        An AzureOpenAI client instance.
+        An AsyncAzureOpenAI client instance.
     """
+    if os.environ.get("LLM_CASSETTE") and os.environ.get("LLM_CASSETTE_MODE") == "replay":
+        # Replays never reach Azure, so placeholder credentials will do
+        os.environ.setdefault("AZURE_API_KEY", "replay")
+        os.environ.setdefault("AZURE_API_BASE", "https://replay.invalid/")
+
+    loop_clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (
+        os.environ.get("AZURE_API_KEY"),
+        os.environ.get("AZURE_API_BASE"),
+        os.environ.get("AZURE_API_VERSION", "2024-02-15-preview"),
+        os.environ.get("LLM_CASSETTE"),
+        os.environ.get("LLM_CASSETTE_MODE"),
+    )
+    if key in loop_clients:
+        return loop_clients[key]
+
+    http_client = cassette_http_client()
+
     if not os.environ.get("AZURE_API_KEY"):
         raise ValueError("Azure OpenAI API key not found. Set AZURE_API_KEY environment variable.")
 
     if not os.environ.get("AZURE_API_BASE"):
         raise ValueError("Azure OpenAI endpoint not found. Set AZURE_API_BASE environment variable.")
 
-    return AzureOpenAI(
+    loop_clients[key] = AsyncAzureOpenAI(
         api_key=os.environ.get("AZURE_API_KEY"),
         api_version=os.environ.get("AZURE_API_VERSION", "2024-02-15-preview"),
-        azure_endpoint=os.environ.get("AZURE_API_BASE")
+        azure_endpoint=os.environ.get("AZURE_API_BASE"),
+        http_client=http_client
     )
+    return loop_clients[key]
+
+async def close_clients():
+    """Close the shared clients of the running event loop."""
+    for client in _clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.close()
 
-def create_basic_agent(instructions: str = None) -> Agent:
+def create_basic_agent(instructions: str = None, cache: Optional[ResponseCache] = None) -> Agent:
     """
     Create a basic agent with the given instructions.
 
     Args:
         instructions: Custom instructions for the agent. If None, default instructions are used.
+        cache: Optional response cache shared with other agents
 
     Returns:
         An Agent instance configured with the provided instructions.
@@ -105,16 +435,18 @@ def create_basic_agent(instructions: str = None) -> Agent:
     return Agent(
         name="BasicAssistant",
         instructions=instructions or default_instructions,
-        model=MODEL
+        model=MODEL,
+        cache=cache
     )
 
-async def run_basic_agent(prompt: str, agent: Optional[Agent] = None) -> str:
+async def run_basic_agent(prompt: str, agent: Optional[Agent] = None, session: Optional[Session] = None) -> str:
     """
     Run the basic agent with the given prompt.
 
     Args:
         prompt: The user's query or prompt
         agent: Optional pre-configured agent. If None, a default agent is created.
+        session: Optional conversation memory the prompt continues
 
     Returns:
         The agent's response as a string
@@ -124,22 +456,181 @@ async def run_basic_agent(prompt: str, agent: Optional[Agent] = None) -> str:
         agent = create_basic_agent()
 
     # Run the agent with the prompt
-    return await agent.run(prompt)
+    return await agent.run(prompt, session)
+
+async def stream_basic_agent(
+    prompt: str,
+    agent: Optional[Agent] = None,
+    session: Optional[Session] = None
+) -> AsyncIterator[str]:
+    """
+    Run the basic agent with the given prompt, streaming the response.
+
+    Args:
+        prompt: The user's query or prompt
+        agent: Optional pre-configured agent. If None, a default agent is created.
+        session: Optional conversation memory the prompt continues
+
+    Yields:
+        Pieces of the agent's response as they arrive. The call's timings are
+        appended to agent.metrics once the stream ends.
+    """
+    if agent is None:
+        agent = create_basic_agent()
+
+    async for token in agent.stream(prompt, session):
+        yield token
+
+async def render_stream(agent: Agent, prompt: str, title: str, session: Optional[Session] = None) -> str:
+    """Stream the agent's response into a live panel and print its timings."""
+    text = ""
+    if console.is_terminal:
+        with Live(Panel(text, title=title, border_style="green"), console=console, refresh_per_second=15) as live:
+            async for token in stream_basic_agent(prompt, agent, session):
+                text += token
+                live.update(Panel(text, title=title, border_style="green"))
+    else:
+        # Live redraws need a terminal; piped output gets the finished panel
+        async for token in stream_basic_agent(prompt, agent, session):
+            text += token
+        console.print(Panel(text, title=title, border_style="green"))
+    console.print(f"[dim]{agent.metrics[-1].summary()}[/dim]")
+    return text
 
 def main():
     """Main function to parse arguments and run the agent."""
     parser = argparse.ArgumentParser(description="Basic Agent Example with Azure OpenAI")
-    parser.add_argument("--prompt", "-p", type=str, required=True,
-                        help="The prompt to send to the agent")
+    parser.add_argument("--prompt", "-p", type=str, action="append",
+                        help="The prompt to send to the agent (repeat to run several concurrently)")
+    parser.add_argument("--input", type=str,
+                        help="JSONL file of prompts to run as a batch instead of --prompt")
+    parser.add_argument("--output", type=str,
+                        help="JSONL file the batch results are appended to (default: <input>.results.jsonl)")
+    parser.add_argument("--prompt-field", default="prompt", help="Field of each input record holding the prompt")
+    parser.add_argument("--id-field", default="id", help="Field of each input record holding its id")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum number of concurrent requests")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Per-request timeout in seconds")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream responses as they arrive and report time to first token")
+    parser.add_argument("--cassette", type=str,
+                        help="Record model calls to, or replay them from, this cassette file")
+    parser.add_argument("--cassette-mode", choices=["record", "replay", "auto"], default="auto",
+                        help="record: always call the model; replay: offline, recorded responses only; auto: both")
+    parser.add_argument("--cache", nargs="?", const=".agent1/response_cache.sqlite",
+                        help="Answer repeated prompts from this SQLite response cache (default path if no value)")
+    parser.add_argument("--cache-ttl", type=float, default=24 * 3600,
+                        help="Seconds before a cached response expires")
+    parser.add_argument("--telemetry", nargs="?", const=".agent1/spans.jsonl",
+                        help="Append a span per model call to this JSONL file and write Prometheus metrics beside it")
+    parser.add_argument("--session", type=str,
+                        help="Continue this conversation, kept in .agent1/sessions/ (prompts run in order)")
+    parser.add_argument("--memory-tokens", type=int, default=2000,
+                        help="Token budget of a new session's summary plus recent turns")
 
     args = parser.parse_args()
+    if not args.prompt and not args.input:
+        parser.error("one of --prompt or --input is required")
+    if args.session and args.input:
+        parser.error("--session can't be combined with --input")
+    session_path = os.path.join(".agent1", "sessions", f"{args.session}.json.gz") if args.session else None
+    session = Session.load(session_path, args.session, args.memory_tokens) if args.session else None
+    cache = ResponseCache(args.cache, ttl_seconds=args.cache_ttl) if args.cache else None
+    if args.telemetry:
+        use_telemetry(Telemetry(args.telemetry))
+        # Runs on every exit path, after the responses have been printed
+        atexit.register(report_telemetry, lambda message: console.print(f"[dim]{message}[/dim]"))
+
+    if args.cassette:
+        os.environ["LLM_CASSETTE"] = args.cassette
+        os.environ["LLM_CASSETTE_MODE"] = args.cassette_mode
+
+    async def save_session():
+        if session:
+            await session.settle()
+            session.save(session_path)
+
+    async def run_prompts():
+        try:
+            agent = create_basic_agent(cache=cache)
+            if not session:
+                return await agent.run_many(args.prompt, concurrency=args.concurrency, timeout=args.timeout)
+            # Turns of one conversation build on each other, so they run in order
+            results = []
+            for prompt in args.prompt:
+                try:
+                    results.append(await asyncio.wait_for(agent.run(prompt, session), args.timeout))
+                except Exception as e:
+                    results.append(e)
+            return results
+        finally:
+            await save_session()
+            await close_clients()
+
+    async def stream_prompts():
+        try:
+            agent = create_basic_agent(cache=cache)
+            for index, prompt in enumerate(args.prompt, 1):
+                title = "Agent Response" if len(args.prompt) == 1 else f"Agent Response {index}/{len(args.prompt)}"
+                await asyncio.wait_for(render_stream(agent, prompt, title, session), args.timeout)
+        finally:
+            await save_session()
+            await close_clients()
+
+    if args.input:
+        output = args.output or os.path.splitext(args.input)[0] + ".results.jsonl"
+
+        async def run_file():
+            try:
+                agent = create_basic_agent(cache=cache)
+                return await run_batch(
+                    agent.run, args.input, output, args.concurrency, args.timeout, args.prompt_field, args.id_field
+                )
+            finally:
+                await close_clients()
+
+        try:
+            counts = asyncio.run(run_file())
+        except Exception as e:
+            console.print(Panel(f"[bold red]Error: {str(e) or type(e).__name__}[/bold red]"))
+            sys.exit(1)
+        console.print(
+            f"Batch: {counts['completed']} completed, {counts['failed']} failed, "
+            f"{counts['resumed']} already done -> {output}"
+        )
+        if cache:
+            console.print(f"[dim]{cache.summary()}[/dim]")
+        if counts["failed"]:
+            sys.exit(1)
+        return
+
+    if args.stream:
+        try:
+            asyncio.run(stream_prompts())
+            if cache:
+                console.print(f"[dim]{cache.summary()}[/dim]")
+        except Exception as e:
+            console.print(Panel(f"[bold red]Error: {str(e) or type(e).__name__}[/bold red]"))
+            sys.exit(1)
+        return
 
     try:
-        # Run the agent and get response
-        response = asyncio.run(run_basic_agent(args.prompt))
-
-        # Display the response
-        console.print(Panel(response, title="Agent Response", border_style="green"))
+        # Run the agent on every prompt
+        results = asyncio.run(run_prompts())
+
+        # Display the responses in prompt order
+        for index, result in enumerate(results, 1):
+            title = "Agent Response" if len(results) == 1 else f"Agent Response {index}/{len(results)}"
+            if isinstance(result, Exception):
+                console.print(Panel(f"[bold red]Error: {str(result) or type(result).__name__}[/bold red]", title=title))
+            else:
+                console.print(Panel(result, title=title, border_style="green"))
+        if cache:
+            console.print(f"[dim]{cache.summary()}[/dim]")
+
+        if any(isinstance(result, Exception) for result in results):
+            sys.exit(1)
 
     except ValueError as e:
         console.print(Panel(f"[bold red]Error: {str(e)}[/bold red]"))
@@ -149,6 +640,24 @@ def main():
         sys.exit(1)
 
 # Test functions
+def completion(content: str, usage: Optional[dict] = None) -> httpx.Response:
+    body = {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": MODEL,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    }
+    if usage:
+        body["usage"] = usage
+    return httpx.Response(200, json=body)
+
+def mock_client(service) -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        api_key="test",
+        api_version="2024-02-15-preview",
+        azure_endpoint="https://example.invalid/",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(service)),
+        max_retries=0
+    )
+
 def test_create_basic_agent():
     """Test that the agent is created with the correct configuration."""
     import pytest
@@ -177,5 +686,227 @@ def test_run_basic_agent():
     # The response should contain "4" somewhere
     assert "4" in response
 
+def test_cassette_record_and_replay(tmp_path, monkeypatch):
+    """Test that a recorded response is replayed without calling the service."""
+    import cassettes
+
+    calls = []
+
+    def service(request):
+        calls.append(request)
+        return completion("2+2 is 4")
+
+    cassette = str(tmp_path / "agent1.cassette.jsonl")
+    monkeypatch.setenv("LLM_CASSETTE", cassette)
+    monkeypatch.setenv("AZURE_API_KEY", "test")
+    monkeypatch.setenv("AZURE_API_BASE", "https://example.invalid/")
+    transport = cassettes.async_cassette_transport(cassettes.Cassette(cassette, "record"), httpx.MockTransport(service))
+    monkeypatch.setitem(cassettes._cassette_transports, (os.path.abspath(cassette), "record"), transport)
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "record")
+    assert asyncio.run(run_basic_agent("What is 2+2?")) == "2+2 is 4"
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    assert asyncio.run(run_basic_agent("What is 2+2?")) == "2+2 is 4"
+    assert len(calls) == 1
+
+def test_run_many_bounds_concurrency_and_keeps_order():
+    """Test that run_many runs prompts concurrently, in order, within the concurrency and timeout limits."""
+    in_flight = 0
+    peak = 0
+
+    async def service(request):
+        nonlocal in_flight, peak
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(1.0 if prompt == "slow" else 0.05)
+        in_flight -= 1
+        return completion(f"echo {prompt}")
+
+    agent = create_basic_agent()
+    agent.client = mock_client(service)
+    prompts = [f"prompt {index}" for index in range(6)] + ["slow"]
+
+    results = asyncio.run(agent.run_many(prompts, concurrency=3, timeout=0.5))
+
+    assert results[:6] == [f"echo prompt {index}" for index in range(6)]
+    assert isinstance(results[6], asyncio.TimeoutError)
+    assert peak == 3
+
+def test_stream_yields_tokens_and_records_metrics():
+    """Test that streaming yields the response piece by piece and records time to first token."""
+    pieces = ["2+2", " is", " 4"]
+    events = "".join(
+        "data: " + json.dumps({
+            "id": "chatcmpl-test", "object": "chat.completion.chunk", "created": 0, "model": MODEL,
+            "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+        }) + "\n\n"
+        for piece in pieces
+    ) + "data: [DONE]\n\n"
+
+    def service(request):
+        assert json.loads(request.content)["stream"] is True
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=events.encode())
+
+    agent = create_basic_agent()
+    agent.client = mock_client(service)
+
+    async def collect():
+        return [token async for token in stream_basic_agent("What is 2+2?", agent)]
+
+    assert asyncio.run(collect()) == pieces
+    metrics = agent.metrics[-1]
+    assert metrics.completion_tokens == 3
+    assert 0 <= metrics.time_to_first_token <= metrics.latency
+
+def test_response_cache_serves_repeats_from_memory_and_disk(tmp_path):
+    """Test that a repeated prompt is answered from the cache, including by a fresh cache on the same file."""
+    import pytest
+
+    calls = []
+
+    def service(request):
+        calls.append(request)
+        return completion("2+2 is 4")
+
+    def make_agent(cache):
+        agent = create_basic_agent(cache=cache)
+        agent.client = mock_client(service)
+        return agent
+
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    agent = make_agent(cache)
+    assert asyncio.run(agent.run("What is 2+2?")) == "2+2 is 4"
+    assert asyncio.run(agent.run("  what is   2+2? ")) == "2+2 is 4"
+    assert len(calls) == 1
+    assert (cache.hits["response"], cache.misses["response"]) == (1, 1)
+    cache.close()
+
+    # A new process reads the disk tier; different instructions don't share entries
+    reopened = ResponseCache(path)
+    assert asyncio.run(make_agent(reopened).run("What is 2+2?")) == "2+2 is 4"
+    assert len(calls) == 1
+    other = make_agent(reopened)
+    other.instructions = "Answer in French."
+    asyncio.run(other.run("What is 2+2?"))
+    assert len(calls) == 2
+
+    # Expired entries are misses, and the memory tier stays within max_entries
+    expired = ResponseCache(path, max_entries=1, ttl_seconds=0)
+    assert expired.get("response", agent, "What is 2+2?") is None
+    expired.put("response", agent, "a", "1")
+    expired.put("response", agent, "b", "2")
+    assert len(expired.memory) == 1
+
+    # Without a memory tier every hit comes from the disk tier
+    disk_only = ResponseCache(path, max_entries=0)
+    disk_only.put("response", agent, "c", "3")
+    assert disk_only.get("response", agent, "c") == "3"
+    assert not disk_only.memory and disk_only.hits["response"] == 1
+    disk_only.close()
+    with pytest.raises(ValueError):
+        ResponseCache(max_entries=-1)
+
+def test_run_batch_writes_results_and_resumes(tmp_path):
+    """Test that a batch appends one result per prompt and a rerun only retries what is missing."""
+    input_path = tmp_path / "prompts.jsonl"
+    input_path.write_text("".join(json.dumps({"id": f"q{index}", "prompt": f"prompt {index}"}) + "\n"
+                                  for index in range(5)))
+    output_path = tmp_path / "results.jsonl"
+    # A previous run answered q0 and died while writing q1
+    output_path.write_text(json.dumps({"id": "q0", "response": "done earlier"}) + "\n" + '{"id": "q1", "resp')
+    calls = []
+
+    async def run_prompt(prompt):
+        calls.append(prompt)
+        if prompt == "prompt 3" and calls.count(prompt) == 1:
+            raise RuntimeError("rate limited")
+        await asyncio.sleep(0.01)
+        return f"echo {prompt}"
+
+    counts = asyncio.run(run_batch(run_prompt, str(input_path), str(output_path), concurrency=2))
+    assert (counts["completed"], counts["failed"], counts["resumed"]) == (3, 1, 1)
+    assert "prompt 0" not in calls
+
+    counts = asyncio.run(run_batch(run_prompt, str(input_path), str(output_path), concurrency=2))
+    assert (counts["completed"], counts["failed"], counts["resumed"]) == (1, 0, 4)
+    assert completed_ids(str(output_path)) == {f"q{index}" for index in range(5)}
+
+    # Malformed lines become error rows instead of aborting the rest of the batch
+    input_path.write_text('{"id": "ok", "prompt": "fine"}\n{"id": "cut\n["list"]\n{"id": "empty"}\n')
+    output_path = tmp_path / "malformed.jsonl"
+    counts = asyncio.run(run_batch(run_prompt, str(input_path), str(output_path), concurrency=2))
+    assert (counts["completed"], counts["failed"]) == (1, 3)
+    rows = {row["id"]: row for row in map(json.loads, output_path.read_text().splitlines())}
+    assert rows["ok"]["response"] == "echo fine"
+    assert "not a JSON object" in rows["2"]["error"] and "not a JSON object" in rows["3"]["error"]
+    assert "no 'prompt' field" in rows["empty"]["error"]
+
+def test_telemetry_records_model_calls(tmp_path, monkeypatch):
+    """Test that model calls become spans with tokens, cached tokens and cost, exported as Prometheus text."""
+    def service(request):
+        return completion("2+2 is 4", usage={
+            "prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100,
+            "prompt_tokens_details": {"cached_tokens": 400},
+        })
+
+    agent = create_basic_agent()
+    agent.model = "gpt-4o"
+    agent.client = mock_client(service)
+    telemetry = Telemetry(tmp_path / "spans.jsonl")
+    monkeypatch.setattr("telemetry._telemetry", telemetry)
+
+    asyncio.run(agent.run("What is 2+2?"))
+
+    span = json.loads((tmp_path / "spans.jsonl").read_text())
+    assert (span["kind"], span["name"], span["model"]) == ("llm", "BasicAssistant", "gpt-4o")
+    assert (span["prompt_tokens"], span["cached_tokens"], span["completion_tokens"]) == (1000, 400, 100)
+    # 600 uncached at $2.50/M, 400 cached at $1.25/M, 100 out at $10/M
+    assert abs(span["cost"] - 0.003) < 1e-9
+    metrics = telemetry.prometheus()
+    assert 'llm_calls_total{name="BasicAssistant",model="gpt-4o"} 1' in metrics
+    assert 'llm_cached_tokens_total{name="BasicAssistant",model="gpt-4o"} 400' in metrics
+
+def test_session_keeps_prompt_size_flat(tmp_path):
+    """Test that a long conversation stays within its token budget, summarizing older turns incrementally."""
+    chat_sizes = []
+    summary_sizes = []
+
+    def service(request):
+        messages = json.loads(request.content)["messages"]
+        size = sum(estimate_tokens(message["content"]) for message in messages)
+        if "running summary" in messages[0]["content"]:
+            summary_sizes.append(size)
+            content = "The user is counting upwards. " * 10
+        else:
+            chat_sizes.append(size)
+            content = f"Noted {messages[-1]['content']}. " + "Here is a fairly long answer. " * 12
+        return completion(content)
+
+    agent = create_basic_agent("Be brief.")
+    agent.client = mock_client(service)
+    session = Session("test", max_tokens=500)
+
+    async def converse():
+        for turn in range(40):
+            await agent.run(f"Number {turn}, please remember it. " * 3, session)
+        await session.settle()
+
+    asyncio.run(converse())
+
+    # Every prompt's memory fits the budget, so late turns cost no more than early ones
+    assert max(chat_sizes) <= 500 + 100
+    assert max(chat_sizes[20:]) <= max(chat_sizes[:20])
+    # Each compaction sees only the evicted turns and the previous summary
+    assert len(summary_sizes) >= 5 and max(summary_sizes[5:]) <= max(summary_sizes[:5]) + 20
+    assert session.summary and session.summarized_turns + len(session.turns) // 2 == 40
+
+    path = str(tmp_path / "test.json.gz")
+    session.save(path)
+    loaded = Session.load(path)
+    assert (loaded.summary, loaded.turns, loaded.max_tokens) == (session.summary, session.turns, 500)
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -21,22 +21,76 @@ Run with:
 
 Test with:
     uv run pytest multi_agent.py
+
+Start likely specialists while the coordinator decides (speculative delegation):
+    uv run multi_agent.py --prompt "..." --speculate 1
+
+Let the coordinator consult several specialists at once and merge their answers:
+    uv run multi_agent.py --prompt "How do quantum computers use physics to run AI workloads?" --fan-out
+
+Route confident queries to a specialist locally, skipping the coordinator model:
+    uv run multi_agent.py --prompt "..." --router
+
+Learn routing from the coordinator's past decisions, so more confident queries stay local:
+    uv run multi_agent.py --prompt "..." --routing-log .agent2/routing_log.jsonl
+
+Run a JSONL file of prompts, resuming from the output file if a previous run stopped:
+    uv run multi_agent.py --input prompts.jsonl --output results.jsonl --concurrency 16
+
+Cache specialist answers and coordinator routing decisions (memory LRU plus SQLite, with a TTL):
+    uv run multi_agent.py --prompt "..." --cache .agent2/response_cache.sqlite --no-cache-for "Technology Specialist"
+
+Write a span per model call (tokens, cached tokens, latency, estimated cost) plus Prometheus metrics:
+    uv run multi_agent.py --prompt "..." --telemetry .agent2/spans.jsonl
+
+Record and replay model calls (modes: record, replay, auto):
+    uv run multi_agent.py --prompt "..." --cassette agent2.cassette.jsonl --cassette-mode replay
 """
 
 import os
+import re
 import sys
+import json
+import math
+import time
 import asyncio
 import argparse
-from typing import List, Optional
+import atexit
+import weakref
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-from openai import AzureOpenAI
+import httpx
+from openai import AsyncAzureOpenAI
 from rich.console import Console
 from rich.panel import Panel
 
+from batch import run_batch
+from cassettes import cassette_http_client
+from response_cache import ResponseCache
+from telemetry import Telemetry, add_usage, report_telemetry, trace, use_telemetry
+
 console = Console()
 
-def get_client() -> AzureOpenAI:
-    """Create and return an Azure OpenAI client."""
+# Shared clients per event loop (httpx connection pools can't cross loops), keyed by configuration
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[tuple, AsyncAzureOpenAI]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def get_client() -> AsyncAzureOpenAI:
+    """
+    Return the shared Azure OpenAI client for the running event loop.
+
+    Clients are keyed by endpoint, API version and key, so the coordinator and
+    every specialist reuse one keep-alive connection pool instead of paying a
+    new connection and TLS handshake on each handoff.
+    """
+    if os.getenv("LLM_CASSETTE") and os.getenv("LLM_CASSETTE_MODE") == "replay":
+        # Replays never reach Azure, so placeholder credentials will do
+        os.environ.setdefault("AZURE_API_KEY", "replay")
+        os.environ.setdefault("AZURE_API_BASE", "https://replay.invalid/")
+
     api_base = os.getenv("AZURE_API_BASE")
     api_key = os.getenv("AZURE_API_KEY")
     api_version = os.getenv("AZURE_API_VERSION", "2024-02-01")
@@ -44,11 +98,21 @@ def get_client() -> AzureOpenAI:
     if not api_base or not api_key:
         raise ValueError("AZURE_API_BASE and AZURE_API_KEY environment variables are required")
 
-    return AzureOpenAI(
-        api_key=api_key,
-        api_version=api_version,
-        azure_endpoint=api_base
-    )
+    loop_clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (api_base, api_version, api_key, os.getenv("LLM_CASSETTE"), os.getenv("LLM_CASSETTE_MODE"))
+    if key not in loop_clients:
+        loop_clients[key] = AsyncAzureOpenAI(
+            api_key=api_key,
+            api_version=api_version,
+            azure_endpoint=api_base,
+            http_client=cassette_http_client()
+        )
+    return loop_clients[key]
+
+async def close_clients():
+    """Close the shared clients of the running event loop."""
+    for client in _clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.close()
 
 @dataclass
 class Handoff:
@@ -56,6 +120,26 @@ class Handoff:
     agent: 'Agent'
     description: Optional[str] = None
 
+# Token usage of the model calls made by the current task, when something is counting it
+_token_usage: ContextVar[Optional[Counter]] = ContextVar("token_usage", default=None)
+
+@dataclass
+class SpeculationStats:
+    """Outcomes of speculative delegation, for tuning how many specialists to start."""
+    hits: int = 0  # The coordinator picked a specialist that was already running
+    misses: int = 0  # It picked one that wasn't started
+    direct: int = 0  # It answered without delegating
+    wasted_tokens: int = 0  # Spent by speculative runs that were discarded (estimated if cancelled mid-call)
+
+    def summary(self) -> str:
+        total = self.hits + self.misses + self.direct
+        rate = self.hits / total * 100 if total else 0.0
+        return f"Speculation: {self.hits}/{total} hits ({rate:.0f}%), {self.wasted_tokens} wasted tokens"
+
+SYNTHESIS_INSTRUCTIONS = """You combine answers from several specialists into one response to the user's question.
+    Keep every relevant fact, merge overlapping points, and resolve or flag any disagreements.
+    Answer in prose and do not mention the specialists."""
+
 class Agent:
     """Base class for all agents."""
     def __init__(
@@ -64,16 +148,45 @@ class Agent:
         instructions: str,
         model: str = "gpt-4o",
         handoffs: List[Handoff] = None,
-        handoff_description: Optional[str] = None
+        handoff_description: Optional[str] = None,
+        router: Optional["Router"] = None,
+        speculate: int = 0,
+        fan_out: bool = False,
+        cache: Optional[ResponseCache] = None
     ):
         self.name = name
         self.instructions = instructions
         self.model = model
         self.handoffs = handoffs or []
         self.handoff_description = handoff_description
+        self.router = router
+        # Number of likely specialists to start while the coordinator model decides
+        self.speculate = speculate
+        self.speculation = SpeculationStats()
+        # Run every specialist the coordinator names, concurrently, and synthesize their answers
+        self.fan_out = fan_out
+        # Caches answers, or routing decisions for agents with handoffs; None opts this agent out
+        self.cache = cache
 
     async def run(self, prompt: str) -> str:
         """Process a prompt and return a response."""
+        # Skip the coordinator model when the local router is confident; fan-out
+        # needs the coordinator to name every specialist a question spans
+        if self.router and not self.fan_out:
+            name = self.router.route(prompt)
+            for handoff in self.handoffs:
+                if handoff.agent.name == name:
+                    console.print(Panel(
+                        f"[yellow]Router delegating to {handoff.agent.name}[/yellow]"
+                    ))
+                    return await handoff.agent.run(prompt)
+
+        # A coordinator caches its routing decision; a specialist caches its answer
+        namespace = "route" if self.handoffs else "response"
+        cached = self.cache.get(namespace, self, prompt) if self.cache else None
+        if cached is not None:
+            return await self.handle_reply(prompt, cached, {}, from_cache=True)
+
         client = get_client()
 
         # Build full instructions including handoff options
@@ -88,28 +201,253 @@ class Agent:
             {"role": "user", "content": prompt}
         ]
 
-        response = client.chat.completions.create(
-            model=self.model,
-            messages=messages
-        )
+        speculative = self.start_speculation(prompt)
+        try:
+            with trace("llm", self.name, model=self.model) as span:
+                response = await client.chat.completions.create(
+                    model=self.model,
+                    messages=messages
+                )
+                add_usage(span, response.usage)
+        except BaseException:
+            await self.discard_speculation(speculative, prompt)
+            raise
+        record_usage(response.usage)
 
         content = response.choices[0].message.content
+        if self.cache and content:
+            self.cache.put(namespace, self, prompt, content)
+        return await self.handle_reply(prompt, content, speculative)
 
-        # Check for delegation directives
-        if self.handoffs:
-            for handoff in self.handoffs:
-                if f"DELEGATE TO {handoff.agent.name}" in content:
-                    console.print(Panel(
-                        f"[yellow]Coordinator delegating to {handoff.agent.name}[/yellow]"
-                    ))
-                    return await handoff.agent.run(prompt)
-
-        return content
+    async def handle_reply(
+        self,
+        prompt: str,
+        content: str,
+        speculative: Dict[str, Tuple[asyncio.Task, Counter]],
+        from_cache: bool = False
+    ) -> str:
+        """Follow the delegation directives in a model reply, or return it as the answer."""
+        selected = [handoff.agent for handoff in self.handoffs if f"DELEGATE TO {handoff.agent.name}" in content]
+        if not self.fan_out:
+            selected = selected[:1]
+        if not selected:
+            if speculative:
+                self.speculation.direct += 1
+            await self.discard_speculation(speculative, prompt)
+            return content
+
+        console.print(Panel(
+            f"[yellow]Coordinator delegating to {', '.join(agent.name for agent in selected)}[/yellow]"
+        ))
+        # A multi-specialist decision isn't a single-label example for the router, and a cached one is already logged
+        if self.router and len(selected) == 1 and not from_cache:
+            self.router.record(prompt, selected[0].name)
+
+        running = [speculative.pop(agent.name, (None, None))[0] for agent in selected]
+        if self.speculate:
+            if all(running):
+                self.speculation.hits += 1
+            else:
+                self.speculation.misses += 1
+        await self.discard_speculation(speculative, prompt)
+
+        tasks = [task or asyncio.create_task(agent.run(prompt)) for task, agent in zip(running, selected)]
+        try:
+            answers = await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        if len(answers) == 1:
+            return answers[0]
+        return await self.synthesize(prompt, selected, answers)
+
+    async def synthesize(self, prompt: str, agents: List["Agent"], answers: List[str]) -> str:
+        """Merge several specialists' answers into one response."""
+        client = get_client()
+        sections = "\n\n".join(f"## {agent.name}\n{answer}" for agent, answer in zip(agents, answers))
+        with trace("llm", f"{self.name} synthesis", model=self.model) as span:
+            response = await client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": SYNTHESIS_INSTRUCTIONS},
+                    {"role": "user", "content": f"Question:\n{prompt}\n\nSpecialist answers:\n\n{sections}"}
+                ]
+            )
+            add_usage(span, response.usage)
+        record_usage(response.usage)
+        return response.choices[0].message.content
+
+    def start_speculation(self, prompt: str) -> Dict[str, Tuple[asyncio.Task, Counter]]:
+        """Start the most likely specialists on the prompt; returns their tasks and token counters by name."""
+        if not self.speculate or not self.handoffs:
+            return {}
+        candidates = [handoff.agent for handoff in self.handoffs]
+        if self.router:
+            scores = self.router.scores(prompt)
+            candidates.sort(key=lambda agent: scores.get(agent.name, 0.0), reverse=True)
+
+        async def run_counted(agent: Agent, usage: Counter) -> str:
+            # Tasks run in a copy of the context, so this only counts this specialist's calls
+            _token_usage.set(usage)
+            return await agent.run(prompt)
+
+        speculative = {}
+        for agent in candidates[:self.speculate]:
+            usage = Counter()
+            speculative[agent.name] = (asyncio.create_task(run_counted(agent, usage)), usage)
+        return speculative
+
+    async def discard_speculation(self, speculative: Dict[str, Tuple[asyncio.Task, Counter]], prompt: str):
+        """Cancel speculative runs that are no longer needed and count the tokens they spent."""
+        for name, (task, usage) in speculative.items():
+            task.cancel()
+            if usage:
+                self.speculation.wasted_tokens += usage["total_tokens"]
+            else:
+                # Cancelled mid-call: the prompt was sent, so estimate its tokens (about 4 characters each)
+                agent = next(handoff.agent for handoff in self.handoffs if handoff.agent.name == name)
+                self.speculation.wasted_tokens += (len(agent.instructions) + len(prompt)) // 4
+        await asyncio.gather(*(task for task, _ in speculative.values()), return_exceptions=True)
+
+def record_usage(usage):
+    """Add a response's token usage to the current task's counter, if one is set."""
+    counter = _token_usage.get()
+    if counter is not None and usage is not None:
+        counter["prompt_tokens"] += usage.prompt_tokens
+        counter["completion_tokens"] += usage.completion_tokens
+        counter["total_tokens"] += usage.total_tokens
 
 def handoff(agent: Agent, description: Optional[str] = None) -> Handoff:
     """Create a handoff to the specified agent."""
     return Handoff(agent=agent, description=description or agent.handoff_description)
 
+STOPWORDS = {
+    "a", "about", "an", "and", "are", "as", "at", "be", "but", "by", "can", "do", "does", "explain", "for",
+    "from", "how", "i", "in", "is", "it", "its", "me", "my", "of", "on", "or", "please", "tell", "that",
+    "the", "their", "this", "to", "us", "was", "what", "when", "where", "which", "who", "why", "with", "you",
+    "your",
+}
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase words without stopwords, with common suffixes stripped (computing -> comput)."""
+    tokens = []
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        if word in STOPWORDS:
+            continue
+        for suffix in ("ations", "ation", "ings", "ing", "ies", "ers", "er", "es", "s"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        tokens.append(word)
+    return tokens
+
+class Router:
+    """
+    Local TF-IDF router that picks a specialist without a coordinator round-trip.
+
+    Each specialist is described by its name and handoff description, plus every
+    prompt the coordinator model has delegated to it, read from and appended to the
+    routing log. A prompt is scored by cosine similarity against each specialist's
+    centroid and routed locally only when the best score, and its margin over the
+    runner-up, clear the thresholds; otherwise the coordinator decides.
+    """
+    def __init__(
+        self,
+        specialists: List[Agent],
+        log_path: Optional[str] = None,
+        min_score: float = 0.15,
+        min_margin: float = 0.1
+    ):
+        self.specialists = [agent.name for agent in specialists]
+        self.log_path = log_path
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.local = 0
+        self.fallbacks = 0
+        self.examples: List[Tuple[str, List[str]]] = [
+            (agent.name, tokenize(f"{agent.name} {agent.handoff_description or ''}"))
+            for agent in specialists
+        ]
+        if log_path and os.path.exists(log_path):
+            with open(log_path, encoding="utf-8") as f:
+                for line in f:
+                    entry = json.loads(line)
+                    # Only the coordinator's decisions are ground truth; the router's own aren't
+                    if entry.get("source") == "llm" and entry.get("agent") in self.specialists:
+                        self.examples.append((entry["agent"], tokenize(entry["prompt"])))
+        self.centroids = None
+
+    def fit(self):
+        document_frequency = Counter()
+        for _, tokens in self.examples:
+            document_frequency.update(set(tokens))
+        count = len(self.examples)
+        self.idf = {token: math.log((1 + count) / (1 + df)) + 1 for token, df in document_frequency.items()}
+        # Words never seen in training weigh most, so unfamiliar prompts score low
+        self.unseen_idf = math.log(1 + count) + 1
+
+        centroids = {name: Counter() for name in self.specialists}
+        for name, tokens in self.examples:
+            for token, weight in self.vectorize(tokens).items():
+                centroids[name][token] += weight
+        self.centroids = {name: self.normalize(vector) for name, vector in centroids.items()}
+
+    def vectorize(self, tokens: List[str]) -> Dict[str, float]:
+        counts = Counter(tokens)
+        return self.normalize({token: tf * self.idf.get(token, self.unseen_idf) for token, tf in counts.items()})
+
+    @staticmethod
+    def normalize(vector: Dict[str, float]) -> Dict[str, float]:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {token: weight / norm for token, weight in vector.items()} if norm else {}
+
+    def scores(self, prompt: str) -> Dict[str, float]:
+        """Cosine similarity of the prompt to each specialist."""
+        if self.centroids is None:
+            self.fit()
+        vector = self.vectorize(tokenize(prompt))
+        return {
+            name: sum(weight * centroid.get(token, 0.0) for token, weight in vector.items())
+            for name, centroid in self.centroids.items()
+        }
+
+    def route(self, prompt: str) -> Optional[str]:
+        """Return the name of the specialist for the prompt, or None when the coordinator should decide."""
+        scores = self.scores(prompt)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        if not ranked:
+            return None
+        name, best = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if best < self.min_score or best - runner_up < self.min_margin:
+            self.fallbacks += 1
+            return None
+        self.local += 1
+        self.log(prompt, name, "router", scores)
+        return name
+
+    def record(self, prompt: str, name: str):
+        """Learn from a delegation made by the coordinator model."""
+        self.examples.append((name, tokenize(prompt)))
+        self.centroids = None
+        self.log(prompt, name, "llm")
+
+    def log(self, prompt: str, name: str, source: str, scores: Optional[Dict[str, float]] = None):
+        if not self.log_path:
+            return
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        entry = {"ts": time.time(), "prompt": prompt, "agent": name, "source": source}
+        if scores:
+            entry["scores"] = {key: round(value, 4) for key, value in scores.items()}
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def summary(self) -> str:
+        total = self.local + self.fallbacks
+        rate = self.local / total * 100 if total else 0.0
+        return f"Routing: {self.local} local, {self.fallbacks} via coordinator ({rate:.0f}% local)"
+
 def create_science_agent() -> Agent:
     """Create and return the science specialist agent."""
     instructions = """You are a science specialist with deep knowledge of physics, chemistry, biology, and related fields.
@@ -136,29 +474,60 @@ def create_tech_agent() -> Agent:
         handoff_description="Expert in computer science, programming, AI, and digital technologies"
     )
 
-def create_coordinator_agent(specialists: List[Agent]) -> Agent:
+def create_coordinator_agent(
+    specialists: List[Agent],
+    router: Optional[Router] = None,
+    speculate: int = 0,
+    fan_out: bool = False
+) -> Agent:
     """Create and return the coordinator agent."""
-    instructions = """You are a coordinator who determines which specialist should handle a user's question.
+    if fan_out:
+        span = """For questions that span multiple domains, delegate to every specialist whose domain the question needs.
+    For single-domain questions, delegate to just that specialist."""
+    else:
+        span = "For questions that span multiple domains, choose the specialist most relevant to the core of the question."
+    instructions = f"""You are a coordinator who determines which specialist should handle a user's question.
     Analyze the user's query and decide which specialist would be best suited to respond.
-    For questions that span multiple domains, choose the specialist most relevant to the core of the question.
-    To delegate, include the exact text 'DELEGATE TO <specialist name>' in your response."""
+    {span}
+    To delegate, include the exact text 'DELEGATE TO <specialist name>' in your response, once per specialist."""
 
     handoffs = [handoff(specialist) for specialist in specialists]
 
     return Agent(
         name="Coordinator",
         instructions=instructions,
-        handoffs=handoffs
+        handoffs=handoffs,
+        router=router,
+        speculate=speculate,
+        fan_out=fan_out
     )
 
-async def run_multi_agent_system(prompt: str) -> str:
-    """Run the multi-agent system with the given prompt."""
-    specialists = [
-        create_science_agent(),
-        create_tech_agent()
-    ]
-
-    coordinator = create_coordinator_agent(specialists)
+def create_router(log_path: Optional[str] = None) -> Router:
+    """Create a router over the standard specialists, trained from the routing log if given."""
+    return Router([create_science_agent(), create_tech_agent()], log_path=log_path)
+
+async def run_multi_agent_system(
+    prompt: str,
+    router: Optional[Router] = None,
+    speculate: int = 0,
+    speculation: Optional[SpeculationStats] = None,
+    fan_out: bool = False,
+    cache: Optional[ResponseCache] = None,
+    no_cache: Tuple[str, ...] = ()
+) -> str:
+    """
+    Run the multi-agent system with the given prompt.
+
+    Args:
+        prompt: The user's query
+        router: Optional local router, tried before the coordinator model
+        speculate: Number of likely specialists to start while the coordinator decides
+        speculation: Optional stats to accumulate speculation outcomes into across calls
+        fan_out: Let the coordinator consult several specialists concurrently and merge their answers
+        cache: Optional cache for specialist answers and coordinator routing decisions
+        no_cache: Names of agents that never use the cache
+    """
+    coordinator = create_multi_agent_system(router, speculate, speculation, fan_out, cache, no_cache)
 
     try:
         response = await coordinator.run(prompt)
@@ -167,15 +536,113 @@ async def run_multi_agent_system(prompt: str) -> str:
         console.print(f"[red]Error: {str(e)}[/red]")
         return f"Error processing request: {str(e)}"
 
+def create_multi_agent_system(
+    router: Optional[Router] = None,
+    speculate: int = 0,
+    speculation: Optional[SpeculationStats] = None,
+    fan_out: bool = False,
+    cache: Optional[ResponseCache] = None,
+    no_cache: Tuple[str, ...] = ()
+) -> Agent:
+    """Create the specialists and return the coordinator in front of them; see run_multi_agent_system."""
+    specialists = [
+        create_science_agent(),
+        create_tech_agent()
+    ]
+
+    coordinator = create_coordinator_agent(specialists, router, speculate, fan_out)
+    if speculation is not None:
+        coordinator.speculation = speculation
+    for agent in [coordinator, *specialists]:
+        agent.cache = cache if agent.name not in no_cache else None
+    return coordinator
+
 def main() -> None:
     """Main entry point for the script."""
     parser = argparse.ArgumentParser(description="Multi-agent system using Azure OpenAI")
-    parser.add_argument("--prompt", required=True, help="The prompt to process")
+    parser.add_argument("--prompt", help="The prompt to process")
+    parser.add_argument("--input", help="JSONL file of prompts to run as a batch instead of --prompt")
+    parser.add_argument("--output", help="JSONL file the batch results are appended to (default: <input>.results.jsonl)")
+    parser.add_argument("--prompt-field", default="prompt", help="Field of each input record holding the prompt")
+    parser.add_argument("--id-field", default="id", help="Field of each input record holding its id")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum number of prompts in flight in a batch")
+    parser.add_argument("--timeout", type=float, default=None, help="Per-prompt timeout in seconds in a batch")
+    parser.add_argument("--cassette", help="Record model calls to, or replay them from, this cassette file")
+    parser.add_argument("--cassette-mode", choices=["record", "replay", "auto"], default="auto",
+                        help="record: always call the models; replay: offline, recorded responses only; auto: both")
+    parser.add_argument("--router", action="store_true",
+                        help="Route confident queries to a specialist locally instead of asking the coordinator model")
+    parser.add_argument("--routing-log",
+                        help="Routing decisions to learn from and append to; implies --router (none kept by default)")
+    parser.add_argument("--speculate", type=int, default=0,
+                        help="Start this many likely specialists while the coordinator decides (0 disables)")
+    parser.add_argument("--fan-out", action="store_true",
+                        help="Consult every specialist a cross-domain question needs, concurrently, and merge the answers")
+    parser.add_argument("--cache", nargs="?", const=".agent2/response_cache.sqlite",
+                        help="Cache answers and routing decisions in this SQLite file (default path if no value)")
+    parser.add_argument("--cache-ttl", type=float, default=24 * 3600,
+                        help="Seconds before a cached answer or routing decision expires")
+    parser.add_argument("--no-cache-for", action="append", default=[], metavar="AGENT",
+                        help="Never cache this agent's replies (repeatable), e.g. \"Coordinator\"")
+    parser.add_argument("--telemetry", nargs="?", const=".agent2/spans.jsonl",
+                        help="Append a span per model call to this JSONL file and write Prometheus metrics beside it")
     args = parser.parse_args()
-
+    if not args.prompt and not args.input:
+        parser.error("one of --prompt or --input is required")
+
+    if args.cassette:
+        os.environ["LLM_CASSETTE"] = args.cassette
+        os.environ["LLM_CASSETTE_MODE"] = args.cassette_mode
+
+    router = create_router(args.routing_log) if args.router or args.routing_log else None
+    speculation = SpeculationStats()
+    cache = ResponseCache(args.cache, ttl_seconds=args.cache_ttl) if args.cache else None
+    if args.telemetry:
+        use_telemetry(Telemetry(args.telemetry))
+        # Runs on every exit path, after the response has been printed
+        atexit.register(report_telemetry, lambda message: console.print(f"[dim]{message}[/dim]"))
+
+    async def run_and_close() -> str:
+        try:
+            return await run_multi_agent_system(
+                args.prompt, router, args.speculate, speculation, args.fan_out, cache, tuple(args.no_cache_for)
+            )
+        finally:
+            await close_clients()
+
+    async def run_file_and_close() -> Counter:
+        coordinator = create_multi_agent_system(
+            router, args.speculate, speculation, args.fan_out, cache, tuple(args.no_cache_for)
+        )
+        # Per-prompt delegation panels would drown the summary
+        console.quiet = True
+        try:
+            return await run_batch(
+                coordinator.run, args.input, output, args.concurrency, args.timeout, args.prompt_field, args.id_field
+            )
+        finally:
+            console.quiet = False
+            await close_clients()
+
+    output = args.output or (os.path.splitext(args.input)[0] + ".results.jsonl" if args.input else None)
     try:
-        response = asyncio.run(run_multi_agent_system(args.prompt))
-        console.print(Panel(response, title="Response"))
+        if args.input:
+            counts = asyncio.run(run_file_and_close())
+            console.print(
+                f"Batch: {counts['completed']} completed, {counts['failed']} failed, "
+                f"{counts['resumed']} already done -> {output}"
+            )
+        else:
+            response = asyncio.run(run_and_close())
+            console.print(Panel(response, title="Response"))
+        if router:
+            console.print(f"[dim]{router.summary()}[/dim]")
+        if args.speculate:
+            console.print(f"[dim]{speculation.summary()}[/dim]")
+        if cache:
+            console.print(f"[dim]{cache.summary()}[/dim]")
+        if args.input and counts["failed"]:
+            sys.exit(1)
     except KeyboardInterrupt:
         console.print("\n[yellow]Operation cancelled by user[/yellow]")
         sys.exit(1)
@@ -184,6 +651,24 @@ def main() -> None:
         sys.exit(1)
 
 # Tests
+def completion(content: str, usage: Optional[dict] = None) -> httpx.Response:
+    body = {
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+    }
+    if usage:
+        body["usage"] = usage
+    return httpx.Response(200, json=body)
+
+def mock_client(service) -> AsyncAzureOpenAI:
+    return AsyncAzureOpenAI(
+        api_key="test",
+        api_version="2024-02-01",
+        azure_endpoint="https://example.invalid/",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(service)),
+        max_retries=0
+    )
+
 def test_create_specialist_agents():
     """Test specialist agent creation."""
     science_agent = create_science_agent()
@@ -217,5 +702,167 @@ def test_run_multi_agent_system():
     assert isinstance(response, str)
     assert len(response) > 0
 
+def test_cassette_replays_delegation(tmp_path, monkeypatch):
+    """Test that the coordinator and specialist calls are replayed from a cassette."""
+    import cassettes
+
+    calls = []
+
+    def service(request):
+        calls.append(request)
+        system_prompt = json.loads(request.content)["messages"][0]["content"]
+        content = "DELEGATE TO Science Specialist" if "coordinator" in system_prompt else "Qubits in superposition."
+        return completion(content)
+
+    cassette = str(tmp_path / "agent2.cassette.jsonl")
+    monkeypatch.setenv("LLM_CASSETTE", cassette)
+    monkeypatch.setenv("AZURE_API_KEY", "test")
+    monkeypatch.setenv("AZURE_API_BASE", "https://example.invalid/")
+    transport = cassettes.async_cassette_transport(cassettes.Cassette(cassette, "record"), httpx.MockTransport(service))
+    monkeypatch.setitem(cassettes._cassette_transports, (os.path.abspath(cassette), "record"), transport)
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "record")
+    assert asyncio.run(run_multi_agent_system("What is quantum computing?")) == "Qubits in superposition."
+
+    monkeypatch.setenv("LLM_CASSETTE_MODE", "replay")
+    assert asyncio.run(run_multi_agent_system("What is quantum computing?")) == "Qubits in superposition."
+    assert len(calls) == 2
+
+def test_agents_share_one_client(monkeypatch):
+    """Test that the coordinator and specialists reuse one pooled client per configuration."""
+    async def clients():
+        first, second = get_client(), get_client()
+        await close_clients()
+        return first, second
+
+    monkeypatch.setenv("AZURE_API_KEY", "test")
+    monkeypatch.setenv("AZURE_API_BASE", "https://example.invalid/")
+    first, second = asyncio.run(clients())
+    assert first is second
+    assert first.is_closed()
+
+def test_router_learns_from_coordinator_decisions(tmp_path):
+    """Test that the router defers when unsure and routes locally once it has seen similar prompts."""
+    log_path = str(tmp_path / "routing_log.jsonl")
+    router = create_router(log_path)
+
+    assert router.route("Tell me something interesting") is None
+    assert router.route("What is AI?") == "Technology Specialist"
+    assert router.route("How do vaccines work?") is None
+
+    router.record("How do vaccines work?", "Science Specialist")
+    assert router.route("How do mRNA vaccines work?") == "Science Specialist"
+
+    # A new router picks up the coordinator's decisions from the log
+    assert create_router(log_path).route("How do mRNA vaccines work?") == "Science Specialist"
+    assert (router.local, router.fallbacks) == (2, 2)
+
+def test_router_skips_the_coordinator(monkeypatch):
+    """Test that a confident local route sends a single request, straight to the specialist."""
+    calls = []
+
+    async def service(request):
+        calls.append(json.loads(request.content)["messages"][0]["content"])
+        return completion("AI is...")
+
+    client = mock_client(service)
+    monkeypatch.setitem(globals(), "get_client", lambda: client)
+
+    assert asyncio.run(run_multi_agent_system("What is AI?", create_router())) == "AI is..."
+    assert len(calls) == 1
+    assert "technology specialist" in calls[0]
+
+def test_speculation_overlaps_coordinator_and_specialist(monkeypatch):
+    """Test that speculative specialists run during the coordinator call and losers are discarded."""
+    in_flight = 0
+    peak = 0
+
+    async def service(request):
+        nonlocal in_flight, peak
+        system_prompt = json.loads(request.content)["messages"][0]["content"]
+        content = "DELEGATE TO Science Specialist" if "coordinator" in system_prompt else "Specialist answer."
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.2 if "coordinator" in system_prompt or "physics" in system_prompt else 0.05)
+        in_flight -= 1
+        return completion(content, usage={"prompt_tokens": 40, "completion_tokens": 10, "total_tokens": 50})
+
+    client = mock_client(service)
+    monkeypatch.setitem(globals(), "get_client", lambda: client)
+    stats = SpeculationStats()
+
+    response = asyncio.run(run_multi_agent_system("What is quantum computing?", speculate=2, speculation=stats))
+
+    assert response == "Specialist answer."
+    # Both speculative specialists were in flight alongside the coordinator
+    assert peak == 3
+    assert (stats.hits, stats.misses, stats.direct) == (1, 0, 0)
+    # The technology specialist finished first and its answer was thrown away
+    assert stats.wasted_tokens == 50
+
+def test_fan_out_runs_specialists_concurrently_and_synthesizes(monkeypatch):
+    """Test that a cross-domain question asks its specialists concurrently, then merges, with a span per call."""
+    synthesis_inputs = []
+    in_flight = 0
+    peak = 0
+
+    async def service(request):
+        nonlocal in_flight, peak
+        messages = json.loads(request.content)["messages"]
+        system_prompt = messages[0]["content"]
+        if "coordinator" in system_prompt:
+            content = "DELEGATE TO Science Specialist\nDELEGATE TO Technology Specialist"
+        elif "combine answers" in system_prompt:
+            synthesis_inputs.append(messages[1]["content"])
+            content = "Merged answer."
+        else:
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.2)
+            in_flight -= 1
+            content = "Physics answer." if "physics" in system_prompt else "Computing answer."
+        return completion(content)
+
+    client = mock_client(service)
+    monkeypatch.setitem(globals(), "get_client", lambda: client)
+    telemetry = Telemetry()
+    monkeypatch.setattr("telemetry._telemetry", telemetry)
+
+    response = asyncio.run(run_multi_agent_system("How do quantum computers run AI?", fan_out=True))
+
+    assert response == "Merged answer."
+    # Both specialists were asked at the same time
+    assert peak == 2
+    assert "Physics answer." in synthesis_inputs[0] and "Computing answer." in synthesis_inputs[0]
+    assert sorted(name for _, name, _ in telemetry.totals) == [
+        "Coordinator", "Coordinator synthesis", "Science Specialist", "Technology Specialist"
+    ]
+    assert telemetry.totals[("llm", "Science Specialist", "gpt-4o")]["seconds"] >= 0.2
+
+def test_cache_separates_routing_decisions_from_answers(tmp_path, monkeypatch):
+    """Test that a repeated query skips every model call, and opted-out agents are still asked."""
+    calls = []
+
+    async def service(request):
+        system_prompt = json.loads(request.content)["messages"][0]["content"]
+        calls.append("coordinator" if "coordinator" in system_prompt else "specialist")
+        content = "DELEGATE TO Science Specialist" if "coordinator" in system_prompt else "Specialist answer."
+        return completion(content)
+
+    client = mock_client(service)
+    monkeypatch.setitem(globals(), "get_client", lambda: client)
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+
+    for _ in range(2):
+        assert asyncio.run(run_multi_agent_system("What is quantum computing?", cache=cache)) == "Specialist answer."
+    assert calls == ["coordinator", "specialist"]
+    assert (cache.hits["route"], cache.hits["response"]) == (1, 1)
+
+    # With specialists opted out, the cached routing decision still skips the coordinator
+    assert asyncio.run(run_multi_agent_system(
+        "What is quantum computing?", cache=cache, no_cache=("Science Specialist",)
+    )) == "Specialist answer."
+    assert calls == ["coordinator", "specialist", "specialist"]
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+"""
+Batch runner shared by the agents
+
+Runs a JSONL file of prompts with bounded concurrency, appending each result
+to an output file that doubles as the checkpoint for resuming.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Iterator, Optional, Tuple
+
+def completed_ids(output_path: str) -> set:
+    """Return the ids that already have a response in the output file, so a rerun can skip them."""
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A line cut short when the previous run died
+                continue
+            if "response" in record:
+                done.add(record["id"])
+    return done
+
+def read_batch(
+    input_path: str, prompt_field: str, id_field: str, done: set
+) -> Iterator[Tuple[str, Optional[str], Optional[str]]]:
+    """
+    Lazily yield (id, prompt, error) for each input record not in done; ids default
+    to the line number. A line that is not a JSON object with a prompt yields an
+    error instead of a prompt, so one bad line doesn't abort the batch.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                record = e
+            if not isinstance(record, dict):
+                if str(line_number) not in done:
+                    yield str(line_number), None, f"{input_path}:{line_number}: not a JSON object: {record}"
+                continue
+            record_id = str(record.get(id_field, line_number))
+            if record_id in done:
+                continue
+            if prompt_field not in record:
+                yield record_id, None, f"{input_path}:{line_number}: no '{prompt_field}' field"
+                continue
+            yield record_id, record[prompt_field], None
+
+async def run_batch(
+    run_prompt: Callable[[str], Awaitable[str]],
+    input_path: str,
+    output_path: str,
+    concurrency: int = 8,
+    timeout: Optional[float] = None,
+    prompt_field: str = "prompt",
+    id_field: str = "id"
+) -> Counter:
+    """
+    Run every prompt in a JSONL file, appending one result line per prompt as it completes.
+
+    The output file doubles as the checkpoint: records that already have a response
+    there are skipped, so rerunning after a crash picks up where the last run stopped.
+    Failed prompts and malformed input lines are written with an "error"; the next
+    run retries them.
+
+    Returns:
+        Counts of "completed", "failed" and "resumed" (already done) prompts.
+    """
+    done = completed_ids(output_path)
+    records = read_batch(input_path, prompt_field, id_field, done)
+    counts = Counter(resumed=len(done))
+
+    with open(output_path, "a+", encoding="utf-8") as output:
+        # Start on a fresh line if the previous run died mid-write
+        if output.tell():
+            output.seek(output.tell() - 1)
+            if output.read(1) != "\n":
+                output.write("\n")
+
+        async def worker():
+            # Workers share the one lazy reader, so at most `concurrency` prompts are in memory
+            for record_id, prompt, error in records:
+                start = time.perf_counter()
+                result = {"id": record_id}
+                if error:
+                    result["error"] = error
+                    counts["failed"] += 1
+                else:
+                    try:
+                        result["response"] = await asyncio.wait_for(run_prompt(prompt), timeout)
+                        counts["completed"] += 1
+                    except Exception as e:
+                        result["error"] = str(e) or type(e).__name__
+                        counts["failed"] += 1
+                    result["latency"] = round(time.perf_counter() - start, 3)
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return counts
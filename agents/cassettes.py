@@ -0,0 +1,287 @@
+"""
+Cassettes shared by the agents and director.py
+
+Recorded model request/response pairs for offline, deterministic replays. The
+Director wraps its evaluator and coder calls in a Cassette; the agents wrap
+their async HTTP client with async_cassette_transport(). Both use the same
+record format and request keys.
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows; cassette writes are then only serialized within a process
+    fcntl = None
+
+
+def normalize_text(text: str) -> str:
+    """Normalize line endings, trailing whitespace, test timings and spool paths."""
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    text = "\n".join(line.rstrip() for line in text.split("\n")).strip()
+    # pytest reports wall-clock durations ("in 0.42s") that differ on every run
+    text = re.sub(r"\bin \d+(?:\.\d+)?s\b", "in <t>s", text)
+    # Likewise the duration and memory lines of the Director's execution summary
+    text = re.sub(r"^- (Duration|Peak memory \(RSS\)): .*$", r"- \1: <m>", text, flags=re.M)
+    # Truncated output names its spool file, which lives under the per-run directory
+    return re.sub(r"(bytes omitted, full output in ).*?(\] \.\.\.)$", r"\1<spool>\2", text, flags=re.M)
+
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode when a request has no recorded response."""
+
+
+class Cassette:
+    """
+    Recorded model request/response pairs for offline, deterministic replays.
+
+    Records are appended to a JSONL file, one per line, keyed by a hash of the
+    normalized request. A sidecar index (<cassette>.idx) maps each key to the
+    offset of its latest record, so replay reads one line per request instead
+    of parsing the whole file. In "record" mode every call goes to the model
+    and is appended, in "replay" mode only recorded responses are served and
+    anything else raises CassetteMiss, and "auto" replays what it can and
+    records the rest.
+    """
+
+    MODES = ("record", "replay", "auto")
+    # Top-level request fields that don't change the response
+    IGNORED_FIELDS = {"timeout", "stream", "stream_options", "user", "metadata"}
+
+    def __init__(self, path: Path, mode: str = "auto"):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}', expected one of {', '.join(self.MODES)}")
+        self.path = Path(path).resolve()
+        self.index_path = self.path.with_name(self.path.name + ".idx")
+        self.mode = mode
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.load_index()
+
+    @classmethod
+    def make_key(cls, kind: str, request: Dict[str, Any]) -> str:
+        def normalize(value):
+            if isinstance(value, str):
+                return normalize_text(value)
+            if isinstance(value, dict):
+                return {k: normalize(v) for k, v in value.items()}
+            if isinstance(value, (list, tuple)):
+                return [normalize(v) for v in value]
+            return value
+
+        request = {k: v for k, v in request.items() if k not in cls.IGNORED_FIELDS}
+        payload = json.dumps([kind, normalize(request)], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def load_index(self):
+        try:
+            saved = json.loads(self.index_path.read_text(encoding="utf-8"))
+            self.index, self.indexed_size = saved["entries"], saved["size"]
+        except (OSError, ValueError, KeyError):
+            self.index, self.indexed_size = {}, 0
+        self.refresh()
+
+    def refresh(self):
+        """Index records appended since the index was last updated, e.g. by other processes."""
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size < self.indexed_size:
+            # The cassette was replaced or truncated; the saved index is useless
+            self.index, self.indexed_size = {}, 0
+        if size == self.indexed_size:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.indexed_size)
+            offset = self.indexed_size
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # A record still being written by another process
+                    break
+                try:
+                    self.index[json.loads(line)["key"]] = [offset, len(line)]
+                except (ValueError, KeyError):
+                    pass
+                offset += len(line)
+        self.indexed_size = offset
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if key not in self.index:
+                self.refresh()
+            if key not in self.index:
+                return None
+            offset, length = self.index[key]
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.read(length))["response"]
+
+    def put(self, key: str, request: Dict[str, Any], response: Dict[str, Any]):
+        line = json.dumps({"key": key, "request": request, "response": response}, separators=(",", ":"))
+        data = (line + "\n").encode("utf-8")
+        with self.lock:
+            with open(self.path, "ab") as f:
+                # Keep records from concurrent runs sharing a cassette from interleaving
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX)
+                try:
+                    offset = f.seek(0, os.SEEK_END)
+                    f.write(data)
+                    f.flush()
+                finally:
+                    if fcntl:
+                        fcntl.flock(f, fcntl.LOCK_UN)
+            self.index[key] = [offset, len(data)]
+            if offset == self.indexed_size:
+                self.indexed_size += len(data)
+            self.recorded += 1
+
+    def play(
+        self,
+        kind: str,
+        request: Dict[str, Any],
+        call: Callable[[], Any],
+        dump: Callable[[Any], Optional[Dict[str, Any]]],
+        load: Callable[[Dict[str, Any]], Any],
+    ) -> Any:
+        """Serve request from the cassette, or make the call and record it (dump returning None skips it)."""
+        key = self.make_key(kind, request)
+        if self.mode != "record":
+            response = self.get(key)
+            if response is not None:
+                self.hits += 1
+                return load(response)
+            self.misses += 1
+            if self.mode == "replay":
+                raise CassetteMiss(f"No recorded {kind} response for request {key[:12]} in {self.path}")
+        result = call()
+        response = dump(result)
+        if response is not None:
+            self.put(key, {"kind": kind, "model": request.get("model")}, response)
+        return result
+
+    def save_index(self):
+        with self.lock:
+            if not self.recorded:
+                return
+            tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+            tmp_path.write_text(json.dumps({"size": self.indexed_size, "entries": self.index}), encoding="utf-8")
+            os.replace(tmp_path, self.index_path)
+
+    def summary(self) -> str:
+        return f"{self.path.name} ({self.mode}): {self.hits} replayed, {self.misses} missed, {self.recorded} recorded"
+
+
+def async_cassette_transport(cassette: Cassette, transport: Optional[Any] = None):
+    """
+    Wrap an async httpx transport (a new connection pool by default) so POSTs are
+    served from or recorded to the cassette.
+
+    Requests are keyed like the Director's "http" calls, without the host, so a
+    replay doesn't depend on the endpoint configured. Streamed requests are kept
+    apart as "http-stream", since their recorded body is a server-sent event
+    stream. Responses pass through as they arrive, keeping streamed timing, and
+    are recorded once read in full.
+    """
+    import httpx
+
+    transport = transport or httpx.AsyncHTTPTransport()
+
+    class RecordingStream(httpx.AsyncByteStream):
+        """Decoded response body that is handed to a callback once it has been read in full."""
+        def __init__(self, response: httpx.Response, on_complete: Callable[[bytes], None]):
+            self.response = response
+            self.on_complete = on_complete
+
+        async def __aiter__(self):
+            content = bytearray()
+            async for chunk in self.response.aiter_bytes():
+                content.extend(chunk)
+                yield chunk
+            self.on_complete(bytes(content))
+
+        async def aclose(self):
+            await self.response.aclose()
+
+    class CassetteTransport(httpx.AsyncBaseTransport):
+        async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+            if request.method != "POST":
+                return await transport.handle_async_request(request)
+
+            body = json.loads(request.content or b"{}")
+            kind = "http-stream" if body.get("stream") else "http"
+            key = cassette.make_key(kind, {"path": request.url.path, **body})
+            if cassette.mode != "record":
+                recorded = cassette.get(key)
+                if recorded is not None:
+                    cassette.hits += 1
+                    return httpx.Response(
+                        recorded["status"],
+                        headers={"content-type": recorded["content_type"] or "application/json"},
+                        content=recorded["body"].encode("utf-8"),
+                        request=request,
+                    )
+                cassette.misses += 1
+                if cassette.mode == "replay":
+                    raise CassetteMiss(f"No recorded {kind} response for request {key[:12]} in {cassette.path}")
+
+            response = await transport.handle_async_request(request)
+            # Errors aren't recorded, so a replay never serves a stale 429
+            if response.status_code >= 400:
+                return response
+
+            def record(content: bytes):
+                cassette.put(key, {"kind": kind, "model": body.get("model")}, {
+                    "status": response.status_code,
+                    "content_type": response.headers.get("content-type"),
+                    "body": content.decode("utf-8"),
+                })
+
+            headers = [(name, value) for name, value in response.headers.items()
+                       if name.lower() not in ("content-encoding", "content-length")]
+            return httpx.Response(
+                response.status_code,
+                headers=headers,
+                stream=RecordingStream(response, record),
+                request=request,
+            )
+
+        async def aclose(self):
+            await transport.aclose()
+
+    return CassetteTransport()
+
+
+# One transport per cassette file and mode, shared by every client in the process
+_cassette_transports: Dict[tuple, Any] = {}
+
+
+def cassette_http_client():
+    """
+    Return an httpx.AsyncClient bound to the cassette in LLM_CASSETTE (mode
+    LLM_CASSETTE_MODE, default "auto"), or None when no cassette is configured.
+    """
+    path = os.environ.get("LLM_CASSETTE")
+    if not path:
+        return None
+    import httpx
+
+    mode = os.environ.get("LLM_CASSETTE_MODE", "auto")
+    key = (os.path.abspath(path), mode)
+    if key not in _cassette_transports:
+        cassette = Cassette(Path(path), mode)
+        atexit.register(cassette.save_index)
+        _cassette_transports[key] = async_cassette_transport(cassette)
+    return httpx.AsyncClient(transport=_cassette_transports[key])
@@ -0,0 +1,103 @@
+"""
+Response cache shared by the agents
+
+Answers repeated prompts from an in-memory LRU backed by a SQLite file, so
+entries survive across runs.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Optional, Tuple
+
+class ResponseCache:
+    """
+    Two-tier cache of model replies: an in-memory LRU in front of an optional SQLite file.
+
+    Entries are keyed by agent name, model, a hash of the agent's instructions and
+    the normalized prompt, and expire after ttl_seconds. Each entry belongs to a
+    namespace ("response" for answers, "route" for coordinator decisions), and hits
+    and misses are counted per namespace. A max_entries of 0 disables the memory
+    tier. An agent is anything with a name, model and instructions.
+    """
+    def __init__(self, path: Optional[str] = None, max_entries: int = 1024, ttl_seconds: float = 24 * 3600):
+        if max_entries < 0:
+            raise ValueError(f"max_entries must be 0 or more, got {max_entries}")
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.hits = Counter()
+        self.misses = Counter()
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path)
+            with self.db:
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS entries "
+                    "(key TEXT PRIMARY KEY, namespace TEXT, created_at REAL, value TEXT)"
+                )
+                self.db.execute("DELETE FROM entries WHERE created_at < ?", (time.time() - ttl_seconds,))
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        """Collapse whitespace and case, so trivially different phrasings share an entry."""
+        return " ".join(prompt.split()).casefold()
+
+    @classmethod
+    def make_key(cls, namespace: str, agent: Any, prompt: str) -> str:
+        instructions = hashlib.sha256(agent.instructions.encode("utf-8")).hexdigest()
+        payload = json.dumps([namespace, agent.name, agent.model, instructions, cls.normalize(prompt)])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, namespace: str, agent: Any, prompt: str) -> Optional[str]:
+        key = self.make_key(namespace, agent, prompt)
+        entry = self.memory.get(key)
+        if entry is None and self.db is not None:
+            row = self.db.execute("SELECT created_at, value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row:
+                entry = self.remember(key, row[0], row[1])
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            self.memory.pop(key, None)
+            self.misses[namespace] += 1
+            return None
+        if key in self.memory:
+            self.memory.move_to_end(key)
+        self.hits[namespace] += 1
+        return entry[1]
+
+    def put(self, namespace: str, agent: Any, prompt: str, value: str):
+        key = self.make_key(namespace, agent, prompt)
+        created_at = time.time()
+        self.remember(key, created_at, value)
+        if self.db is not None:
+            with self.db:
+                self.db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)", (key, namespace, created_at, value)
+                )
+
+    def remember(self, key: str, created_at: float, value: str) -> Tuple[float, str]:
+        """Add an entry to the memory tier, evicting the least recently used past max_entries."""
+        entry = (created_at, value)
+        if self.max_entries:
+            self.memory[key] = entry
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.max_entries:
+                self.memory.popitem(last=False)
+        return entry
+
+    def summary(self) -> str:
+        parts = []
+        for namespace in sorted(set(self.hits) | set(self.misses)):
+            total = self.hits[namespace] + self.misses[namespace]
+            parts.append(f"{namespace} {self.hits[namespace]}/{total} hits ({self.hits[namespace] / total * 100:.0f}%)")
+        return "Cache: " + (", ".join(parts) or "unused")
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
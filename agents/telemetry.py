@@ -0,0 +1,173 @@
+"""
+Telemetry shared by the agents and director.py
+
+Spans for model calls and run phases, appended to a JSONL file, with running
+totals rendered as Prometheus metrics. A plain module beside the agents, so
+`uv run` scripts import it as `telemetry` and director.py as `agents.telemetry`.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Union
+
+# USD per million tokens as (input, cached input, output), matched by the longest
+# model-name prefix. Azure deployments are priced when named after their model.
+MODEL_PRICES = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1-nano": (0.10, 0.025, 0.40),
+    "o1": (15.00, 7.50, 60.00),
+    "o3-mini": (1.10, 0.55, 4.40),
+    "o4-mini": (1.10, 0.275, 4.40),
+}
+
+def model_cost(model: Optional[str], prompt_tokens: int, cached_tokens: int, completion_tokens: int) -> Optional[float]:
+    """Estimate a call's cost in USD, or None for a model without a known price."""
+    name = (model or "").split("/")[-1]
+    prefixes = [prefix for prefix in MODEL_PRICES if name.startswith(prefix)]
+    if not prefixes:
+        return None
+    input_price, cached_price, output_price = MODEL_PRICES[max(prefixes, key=len)]
+    return (
+        (prompt_tokens - cached_tokens) * input_price + cached_tokens * cached_price + completion_tokens * output_price
+    ) / 1e6
+
+def add_usage(span: Dict[str, Any], usage: Any):
+    """Copy the token counts of a completion's usage (object or dict) onto a span."""
+    if not usage:
+        return
+    if not isinstance(usage, dict):
+        usage = usage.model_dump() if hasattr(usage, "model_dump") else vars(usage)
+    details = usage.get("prompt_tokens_details") or {}
+    span["prompt_tokens"] = usage.get("prompt_tokens") or 0
+    span["completion_tokens"] = usage.get("completion_tokens") or 0
+    span["cached_tokens"] = details.get("cached_tokens") or usage.get("cache_read_input_tokens") or 0
+
+class Telemetry:
+    """
+    Spans for model calls and run phases, with running totals.
+
+    A span is a dict of kind ("llm" or "phase"), name, start, duration and, for
+    model calls, model, token counts and estimated cost. Each finished span is
+    appended to a JSONL file, and totals per kind, name and model are rendered
+    in the Prometheus text format by prometheus().
+    """
+
+    # (metric, help, total, span kind)
+    METRICS = [
+        ("llm_calls_total", "Model calls", "count", "llm"),
+        ("llm_call_errors_total", "Model calls that raised", "errors", "llm"),
+        ("llm_call_seconds_total", "Seconds spent in model calls", "seconds", "llm"),
+        ("llm_prompt_tokens_total", "Prompt tokens sent, cached ones included", "prompt_tokens", "llm"),
+        ("llm_cached_tokens_total", "Prompt tokens served from the provider's prompt cache", "cached_tokens", "llm"),
+        ("llm_completion_tokens_total", "Completion tokens received", "completion_tokens", "llm"),
+        ("llm_cost_usd_total", "Estimated cost in USD", "cost", "llm"),
+        ("phase_runs_total", "Runs of each phase", "count", "phase"),
+        ("phase_seconds_total", "Seconds spent in each phase", "seconds", "phase"),
+    ]
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, run_id: Optional[str] = None):
+        self.path = Path(path) if path else None
+        self.run_id = run_id
+        self.totals: Dict[Tuple[str, str, str], Counter] = {}
+        self.lock = threading.Lock()
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def start(self, kind: str, name: str, **attributes) -> Dict[str, Any]:
+        return {"kind": kind, "name": name, **attributes, "start": time.time(), "_started": time.perf_counter()}
+
+    def finish(self, span: Dict[str, Any]):
+        span["duration"] = time.perf_counter() - span.pop("_started")
+        if "prompt_tokens" in span:
+            span["cost"] = model_cost(
+                span.get("model"), span["prompt_tokens"], span["cached_tokens"], span["completion_tokens"]
+            )
+        if self.run_id:
+            span["run_id"] = self.run_id
+        with self.lock:
+            totals = self.totals.setdefault((span["kind"], span["name"], span.get("model") or ""), Counter())
+            totals["count"] += 1
+            totals["errors"] += "error" in span
+            totals["seconds"] += span["duration"]
+            for field in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                totals[field] += span.get(field, 0)
+            totals["cost"] += span.get("cost") or 0.0
+            if self.path:
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(span, default=str) + "\n")
+
+    @contextmanager
+    def span(self, kind: str, name: str, **attributes):
+        """Time the body as a span; callers may add fields (e.g. with add_usage) to the yielded dict."""
+        span = self.start(kind, name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            # A closed generator isn't a failure, the consumer just stopped reading
+            if not isinstance(e, GeneratorExit):
+                span["error"] = type(e).__name__
+            raise
+        finally:
+            self.finish(span)
+
+    def prometheus(self) -> str:
+        def label(value: str) -> str:
+            return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+        lines = []
+        with self.lock:
+            for metric, help_text, field, kind in self.METRICS:
+                lines += [f"# HELP {metric} {help_text}.", f"# TYPE {metric} counter"]
+                for (span_kind, name, model), totals in sorted(self.totals.items()):
+                    if span_kind != kind:
+                        continue
+                    labels = f'name="{label(name)}"' + (f',model="{label(model)}"' if kind == "llm" else "")
+                    lines.append(f"{metric}{{{labels}}} {totals[field]}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        llm = Counter()
+        with self.lock:
+            for (kind, _, _), totals in self.totals.items():
+                if kind == "llm":
+                    llm.update(totals)
+        return (
+            f"{llm['count']} model calls, {llm['prompt_tokens']} tokens in ({llm['cached_tokens']} cached), "
+            f"{llm['completion_tokens']} out, ${llm['cost']:.4f} estimated, {llm['seconds']:.1f}s in model calls"
+        )
+
+_telemetry: Optional[Telemetry] = None
+
+def use_telemetry(telemetry: Optional[Telemetry]) -> Optional[Telemetry]:
+    """Make telemetry the destination of every span in this process (None turns spans off)."""
+    global _telemetry
+    _telemetry = telemetry
+    return telemetry
+
+def get_telemetry() -> Optional[Telemetry]:
+    """The active telemetry, or None when spans are off."""
+    return _telemetry
+
+@contextmanager
+def trace(kind: str, name: str, **attributes):
+    """Record the body as a span on the active telemetry; without one the span is discarded."""
+    if _telemetry is None:
+        yield {}
+        return
+    with _telemetry.span(kind, name, **attributes) as span:
+        yield span
+
+def report_telemetry(echo: Callable[[str], Any] = print):
+    """Write the active telemetry's Prometheus metrics next to its spans and echo its summary."""
+    if _telemetry is None or _telemetry.path is None:
+        return
+    metrics_path = _telemetry.path.with_suffix(".prom")
+    metrics_path.write_text(_telemetry.prometheus(), encoding="utf-8")
+    echo(f"Telemetry: {_telemetry.summary()} (spans in {_telemetry.path}, metrics in {metrics_path})")
@@ -0,0 +1,127 @@
+"""
+Handoff latency benchmark for agents/agent2.py
+
+Runs delegated queries (coordinator, then one specialist) twice: once with the
+shared client registry, and once with a new AsyncAzureOpenAI client per call
+(the old get_client() behaviour). Reports query and handoff latency and how
+many connections each approach opened. The mock server charges --connect-delay
+on every new connection to stand in for the TCP and TLS handshakes of a remote
+endpoint; use --live to measure a real Azure endpoint instead.
+
+Run with:
+    uv run python benchmarks/bench_handoff.py
+    uv run python benchmarks/bench_handoff.py --queries 50 --ttft 0.1 --connect-delay 0.08
+    uv run python benchmarks/bench_handoff.py --live --queries 10
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "benchmarks"))
+
+from bench_latency import load_agent, percentile, point_clients_at  # noqa: E402
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+
+def fresh_client(module, created: List):
+    """get_client() replacement that builds a new client, and connection pool, on every call."""
+    def get_client():
+        client = module.AsyncAzureOpenAI(
+            api_key=os.environ["AZURE_API_KEY"],
+            api_version=os.getenv("AZURE_API_VERSION", "2024-02-01"),
+            azure_endpoint=os.environ["AZURE_API_BASE"],
+        )
+        created.append(client)
+        return client
+    return get_client
+
+
+async def run_queries(module, queries: int, per_call: bool) -> Dict[str, List[float]]:
+    """Run delegated queries one after another, timing each query and its specialist hop."""
+    created = []
+    shared = module.get_client
+    if per_call:
+        module.get_client = fresh_client(module, created)
+    hops = []
+    run = module.Agent.run
+
+    async def timed_run(agent, prompt):
+        start = time.perf_counter()
+        try:
+            return await run(agent, prompt)
+        finally:
+            if not agent.handoffs:
+                hops.append(time.perf_counter() - start)
+
+    module.Agent.run = timed_run
+    latencies = []
+    try:
+        for _ in range(queries):
+            start = time.perf_counter()
+            await module.run_multi_agent_system("What is quantum computing?")
+            latencies.append(time.perf_counter() - start)
+    finally:
+        module.Agent.run = run
+        module.get_client = shared
+        await module.close_clients()
+        # Closed here, on their own event loop, rather than by the garbage collector
+        for client in created:
+            await client.close()
+    return {"query": latencies, "handoff": hops}
+
+
+def bench(module, mode: str, queries: int, server: Optional[MockOpenAIServer]) -> Dict:
+    # Warm up imports outside the measurement
+    asyncio.run(run_queries(module, 1, mode == "per_call"))
+    if server:
+        server.reset_stats()
+    samples = asyncio.run(run_queries(module, queries, mode == "per_call"))
+
+    result = {
+        name: {"p50": percentile(values, 50), "p95": percentile(values, 95)}
+        for name, values in samples.items()
+    }
+    if server:
+        result["connections"] = server.connections
+        result["model_requests"] = len(server.requests)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent2 handoff latency with shared vs. per-call clients")
+    parser.add_argument("--queries", type=int, default=30, help="Delegated queries per mode")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Mock time-to-first-token in seconds")
+    parser.add_argument("--connect-delay", type=float, default=0.05,
+                        help="Mock cost of opening a connection (TCP + TLS handshake) in seconds")
+    parser.add_argument("--live", action="store_true", help="Use the AZURE_* endpoint instead of the mock server")
+    args = parser.parse_args()
+
+    server = None if args.live else MockOpenAIServer(ttft=args.ttft, connect_delay=args.connect_delay, seed=0).start()
+    try:
+        if server:
+            point_clients_at(server)
+        module = load_agent("agent2")
+        results = {mode: bench(module, mode, args.queries, server) for mode in ("per_call", "shared")}
+    finally:
+        if server:
+            server.stop()
+
+    print(f"\n{'Client':<10} {'query p50':>10} {'query p95':>10} {'handoff p50':>12} {'handoff p95':>12} {'connections':>12}")
+    for mode, result in results.items():
+        print(
+            f"{mode:<10} {result['query']['p50'] * 1000:>8.1f}ms {result['query']['p95'] * 1000:>8.1f}ms "
+            f"{result['handoff']['p50'] * 1000:>10.1f}ms {result['handoff']['p95'] * 1000:>10.1f}ms "
+            f"{result.get('connections', '-'):>12}"
+        )
+    gained = results["per_call"]["handoff"]["p50"] - results["shared"]["handoff"]["p50"]
+    print(f"\nLatency gained per handoff (p50): {gained * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
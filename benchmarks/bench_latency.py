@@ -0,0 +1,305 @@
+"""
+End-to-end latency benchmark
+
+Drives Director.direct, run_basic_agent (agents/agent1.py) and
+run_multi_agent_system (agents/agent2.py) against the local mock server, so no
+Azure or OpenAI credentials or network access are needed. Reports p50/p95/p99
+latency, throughput and a per-phase breakdown for each scenario, and saves the
+results to benchmarks/results/ for comparison across commits.
+
+Run with:
+    uv run python benchmarks/bench_latency.py
+    uv run python benchmarks/bench_latency.py --scenarios basic_agent multi_agent --runs 50 --concurrency 10
+    uv run python benchmarks/bench_latency.py --compare latest
+"""
+
+import argparse
+import asyncio
+import contextlib
+import importlib.util
+import io
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "benchmarks"))
+# The agent scripts import their shared modules (telemetry, ...) as siblings
+sys.path.insert(0, str(ROOT / "agents"))
+
+from mock_openai_server import MockOpenAIServer  # noqa: E402
+
+SCENARIOS = ["basic_agent", "multi_agent", "director"]
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Nearest-rank percentile."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(samples),
+        "mean": statistics.fmean(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "min": min(samples),
+        "max": max(samples),
+    }
+
+
+def git_commit() -> str:
+    result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    return result.stdout.strip() or "unknown"
+
+
+def load_agent(name: str):
+    """Import a single-file agent script as a module."""
+    spec = importlib.util.spec_from_file_location(name, ROOT / "agents" / f"{name}.py")
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    # Keep the benchmark output readable
+    module.console.quiet = True
+    return module
+
+
+def point_clients_at(server: MockOpenAIServer):
+    """Route every client used by the Director, aider and the agents to the mock server."""
+    os.environ.update({
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": server.openai_base_url,
+        "OPENAI_API_BASE": server.openai_base_url,
+        "AZURE_API_KEY": "mock",
+        "AZURE_API_BASE": server.url,
+        "AZURE_API_VERSION": "2024-12-01-preview",
+        "AZURE_OPENAI_API_KEY": "mock",
+        "AZURE_OPENAI_ENDPOINT": server.url,
+        "AZURE_OPENAI_VERSION": "2024-12-01-preview",
+        # Keep litellm from fetching its model cost map over the network
+        "LITELLM_LOCAL_MODEL_COST_MAP": "True",
+    })
+
+
+async def run_concurrently(make_call, runs: int, concurrency: int) -> List[float]:
+    """Run make_call() runs times with at most concurrency in flight; return latencies."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call()
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one() for _ in range(runs)))
+    return latencies
+
+
+def bench_agent(name: str, server: MockOpenAIServer, runs: int, concurrency: int, warmup: int) -> Dict:
+    if name == "basic_agent":
+        module = load_agent("agent1")
+        make_call = lambda: module.run_basic_agent("What is 2+2?")  # noqa: E731
+    else:
+        module = load_agent("agent2")
+        make_call = lambda: module.run_multi_agent_system("What is quantum computing?")  # noqa: E731
+
+    if warmup:
+        asyncio.run(run_concurrently(make_call, warmup, 1))
+
+    server.reset_stats()
+    start = time.perf_counter()
+    latencies = asyncio.run(run_concurrently(make_call, runs, concurrency))
+    wall = time.perf_counter() - start
+
+    model_seconds = sum(request["duration"] for request in server.requests)
+    total_seconds = sum(latencies)
+    return {
+        "latency": summarize(latencies),
+        "throughput_per_second": runs / wall,
+        "wall_seconds": wall,
+        "model_requests": len(server.requests),
+        # Mock-server time vs. everything else (client setup, serialization, agent logic)
+        "phases": {
+            "model": model_seconds / runs,
+            "client_overhead": max(0.0, total_seconds - model_seconds) / runs,
+        },
+    }
+
+
+def bench_director(server: MockOpenAIServer, runs: int, warmup: int) -> Dict:
+    import director
+
+    class TimedDirector(director.Director):
+        """Director that records the time spent in each phase of direct()."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.phase_seconds = {"prompt": 0.0, "code": 0.0, "execute": 0.0, "evaluate": 0.0}
+
+        def timed(self, phase, fn, *args):
+            start = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                self.phase_seconds[phase] += time.perf_counter() - start
+
+        def create_new_ai_coding_prompt(self, *args):
+            return self.timed("prompt", super().create_new_ai_coding_prompt, *args)
+
+        def ai_code(self, prompt):
+            return self.timed("code", super().ai_code, prompt)
+
+        def execute(self):
+            return self.timed("execute", super().execute)
+
+        def evaluate(self, execution):
+            return self.timed("evaluate", super().evaluate, execution)
+
+    workdir = Path(tempfile.mkdtemp(prefix="director-bench-"))
+    (workdir / "app.py").write_text("def add(a, b):\n    return a + b\n")
+    (workdir / "spec.yaml").write_text(
+        "prompt: Add a subtract(a, b) function to app.py\n"
+        "coder_model: gpt-4o\n"
+        "evaluator_model: gpt-4o\n"
+        "max_iterations: 1\n"
+        f"execution_command: {sys.executable} -c \"print('1 passed in 0.01s')\"\n"
+        "context_editable: [app.py]\n"
+        "context_read_only: []\n"
+        "evaluator: default\n"
+    )
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    latencies = []
+    phases: Dict[str, List[float]] = {}
+    try:
+        for index in range(warmup + runs):
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+                start = time.perf_counter()
+                run = TimedDirector("spec.yaml", log_file="director_log.jsonl", eval_cache=False)
+                run.direct()
+                elapsed = time.perf_counter() - start
+            if index < warmup:
+                continue
+            latencies.append(elapsed)
+            for phase, seconds in run.phase_seconds.items():
+                phases.setdefault(phase, []).append(seconds)
+    finally:
+        os.chdir(cwd)
+
+    wall = sum(latencies)
+    return {
+        "latency": summarize(latencies),
+        "throughput_per_second": runs / wall,
+        "wall_seconds": wall,
+        "phases": {phase: statistics.fmean(samples) for phase, samples in phases.items()},
+    }
+
+
+def print_report(results: Dict, previous: Optional[Dict]):
+    print(f"\n{'Scenario':<14} {'p50':>9} {'p95':>9} {'p99':>9} {'tput/s':>8}   phases (mean per run)")
+    for name, result in results["scenarios"].items():
+        latency = result["latency"]
+        phases = ", ".join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in result["phases"].items())
+        print(
+            f"{name:<14} {latency['p50'] * 1000:>7.0f}ms {latency['p95'] * 1000:>7.0f}ms "
+            f"{latency['p99'] * 1000:>7.0f}ms {result['throughput_per_second']:>8.2f}   {phases}"
+        )
+
+    if not previous:
+        return
+    print(f"\nCompared with {previous['commit']} ({previous['timestamp']}):")
+    for name, result in results["scenarios"].items():
+        before = previous["scenarios"].get(name)
+        if not before:
+            continue
+        deltas = []
+        for stat in ("p50", "p95", "p99"):
+            old, new = before["latency"][stat], result["latency"][stat]
+            deltas.append(f"{stat} {(new - old) * 1000:+.0f}ms ({(new - old) / old * 100:+.1f}%)")
+        print(f"  {name:<14} " + ", ".join(deltas))
+
+
+def load_previous(compare: Optional[str]) -> Optional[Dict]:
+    if not compare:
+        return None
+    if compare == "latest":
+        history = sorted(RESULTS_DIR.glob("latency-*.json"))
+        if not history:
+            return None
+        return json.loads(history[-1].read_text())
+    return json.loads(Path(compare).read_text())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end latency benchmark against a local mock server")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--runs", type=int, default=20, help="Measured runs per agent scenario")
+    parser.add_argument("--director-runs", type=int, default=3, help="Measured runs of Director.direct")
+    parser.add_argument("--concurrency", type=int, default=1, help="Concurrent agent runs")
+    parser.add_argument("--warmup", type=int, default=1, help="Unmeasured warm-up runs per scenario")
+    parser.add_argument("--ttft", type=float, default=0.05, help="Mock time-to-first-token in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Mock ttft jitter in seconds")
+    parser.add_argument("--tps", type=float, default=0.0, help="Mock completion tokens per second (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock requests that fail")
+    parser.add_argument("--compare", nargs="?", const="latest", help="Results file to compare with (default: latest)")
+    parser.add_argument("--no-save", action="store_true", help="Do not save the results")
+    args = parser.parse_args()
+
+    previous = load_previous(args.compare)
+    server = MockOpenAIServer(
+        ttft=args.ttft, jitter=args.jitter, tokens_per_second=args.tps, error_rate=args.error_rate, seed=0
+    )
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "mock": {"ttft": args.ttft, "jitter": args.jitter, "tps": args.tps, "error_rate": args.error_rate},
+        "runs": args.runs,
+        "concurrency": args.concurrency,
+        "scenarios": {},
+    }
+
+    with server:
+        point_clients_at(server)
+        for name in args.scenarios:
+            print(f"Running {name}...")
+            if name == "director":
+                results["scenarios"][name] = bench_director(server, args.director_runs, args.warmup)
+            else:
+                results["scenarios"][name] = bench_agent(name, server, args.runs, args.concurrency, args.warmup)
+
+    print_report(results, previous)
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"latency-{time.strftime('%Y%m%d-%H%M%S')}-{results['commit']}.json"
+        path.write_text(json.dumps(results, indent=2))
+        print(f"\nResults saved to {path.relative_to(ROOT)}")
+
+
+def test_percentile_is_nearest_rank():
+    """Test that percentiles pick the ceil(p * n)-th smallest sample, clamped to the samples."""
+    samples = [float(value) for value in range(100, 0, -1)]
+    assert [percentile(samples, pct) for pct in (50, 95, 99, 100)] == [50.0, 95.0, 99.0, 100.0]
+    assert percentile([3.0, 1.0, 2.0], 50) == 2.0
+    assert percentile([3.0, 1.0, 2.0], 0) == 1.0
+    assert percentile([7.0], 99) == 7.0
+
+
+if __name__ == "__main__":
+    main()
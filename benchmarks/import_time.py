@@ -0,0 +1,112 @@
+"""
+Cold-start benchmark for director.py
+
+Measures how long a fresh interpreter takes to import the director module,
+print --help and validate every spec, and lists the slowest imports. Results
+are appended to benchmarks/results/import_time.jsonl, tagged with the current
+git commit, so cold-start regressions can be compared across commits.
+
+Run with:
+    uv run python benchmarks/import_time.py
+    uv run python benchmarks/import_time.py --runs 20 --config 'specs/*.yaml'
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+RESULTS_FILE = ROOT / "benchmarks" / "results" / "import_time.jsonl"
+
+
+def git_commit() -> str:
+    result = subprocess.run(
+        ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True
+    )
+    return result.stdout.strip() or "unknown"
+
+
+def time_command(argv: list, runs: int) -> dict:
+    """Run a command runs times in fresh interpreters and summarize wall-clock time."""
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(argv, cwd=ROOT, capture_output=True)
+        samples.append(time.perf_counter() - start)
+    return {
+        "runs": runs,
+        "median_seconds": statistics.median(samples),
+        "min_seconds": min(samples),
+        "max_seconds": max(samples),
+    }
+
+
+def slowest_imports(limit: int) -> list:
+    """Parse `python -X importtime` output and return the top cumulative imports."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import director"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    imports = []
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:       303 |     250713 |       openai.resources"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        imports.append({"module": name.strip(), "cumulative_ms": int(cumulative_us) / 1000})
+    return sorted(imports, key=lambda item: item["cumulative_ms"], reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark director.py cold-start time")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters per measurement")
+    parser.add_argument("--config", type=str, default="specs/*.yaml", help="Configs for the --validate-only measurement")
+    parser.add_argument("--top", type=int, default=10, help="Number of slowest imports to report")
+    parser.add_argument("--no-save", action="store_true", help="Do not append the results to the history file")
+    args = parser.parse_args()
+
+    measurements = {
+        "import": time_command([sys.executable, "-c", "import director"], args.runs),
+        "help": time_command([sys.executable, "director.py", "--help"], args.runs),
+        "validate_only": time_command(
+            [sys.executable, "director.py", "--validate-only", "--config", args.config], args.runs
+        ),
+    }
+
+    print(f"{'Measurement':<15} {'Median':>9} {'Min':>9} {'Max':>9}")
+    for name, result in measurements.items():
+        print(
+            f"{name:<15} {result['median_seconds'] * 1000:>7.0f}ms "
+            f"{result['min_seconds'] * 1000:>7.0f}ms {result['max_seconds'] * 1000:>7.0f}ms"
+        )
+
+    imports = slowest_imports(args.top)
+    print("\nSlowest imports (cumulative):")
+    for item in imports:
+        print(f"  {item['cumulative_ms']:>8.1f}ms  {item['module']}")
+
+    if not args.no_save:
+        RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        record = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": sys.platform,
+            "cpu_count": os.cpu_count(),
+            "measurements": measurements,
+            "slowest_imports": imports,
+        }
+        with open(RESULTS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record) + "\n")
+        print(f"\nResults appended to {RESULTS_FILE.relative_to(ROOT)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+Local OpenAI-compatible mock server
+
+A stand-in for the chat-completions API, for benchmarking the Director and the
+agents without live Azure or OpenAI endpoints. It serves both the OpenAI route
+(/v1/chat/completions) and the Azure deployment route
+(/openai/deployments/<deployment>/chat/completions), with or without streaming.
+
+Latency is modelled as a time-to-first-token plus completion tokens divided by
+a token throughput, and a configurable share of requests fails with an HTTP
+error. A connect delay charged on each new connection stands in for the TCP
+and TLS handshakes of a remote endpoint.
+
+Responses come from a script of regex rules matched against the request
+messages, falling back to sensible defaults for the Director's evaluator and
+the agent2 coordinator.
+
+Run standalone with:
+    uv run python benchmarks/mock_openai_server.py --port 8765 --ttft 0.2 --tps 80
+
+or in-process:
+    with MockOpenAIServer(ttft=0.05) as server:
+        os.environ["OPENAI_BASE_URL"] = server.openai_base_url
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+
+# Responses used when no script rule matches, checked in order
+DEFAULT_RULES = [
+    # Director evaluator prompt
+    {"match": r"You must respond with valid JSON only", "response": '{"success": true, "feedback": null}'},
+    # agent2 coordinator
+    {"match": r"You are a coordinator", "response": "DELEGATE TO Science Specialist"},
+    {"match": r".*", "response": "This is a mock response from the local benchmark server. " * 4},
+]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class MockOpenAIServer:
+    """Threaded mock chat-completions server, usable as a context manager."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        ttft: float = 0.05,
+        jitter: float = 0.0,
+        tokens_per_second: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 429,
+        connect_delay: float = 0.0,
+        rules: Optional[List[Dict[str, Any]]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.ttft = ttft
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.connect_delay = connect_delay
+        self.rules = [dict(rule) for rule in (rules or [])] + DEFAULT_RULES
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests: List[Dict[str, Any]] = []
+        self.connections = 0
+
+        handler = type("MockHandler", (MockHandler,), {"mock": self})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.url}/v1"
+
+    def start(self) -> "MockOpenAIServer":
+        self.thread = threading.Thread(target=self.httpd.serve_forever, name="mock-openai", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset_stats(self):
+        with self.lock:
+            self.requests = []
+            self.connections = 0
+
+    def record(self, entry: Dict[str, Any]):
+        with self.lock:
+            self.requests.append(entry)
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def first_token_delay(self) -> float:
+        with self.lock:
+            return max(0.0, self.ttft + self.random.uniform(-self.jitter, self.jitter))
+
+    def pick_response(self, messages: List[Dict[str, Any]]) -> str:
+        """Return the response of the first rule whose pattern matches any message."""
+        text = "\n".join(
+            message["content"] if isinstance(message.get("content"), str) else json.dumps(message.get("content"))
+            for message in messages
+        )
+        with self.lock:
+            for rule in self.rules:
+                if rule.get("times") == 0 or not re.search(rule["match"], text, re.S):
+                    continue
+                if "times" in rule:
+                    rule["times"] -= 1
+                responses = rule.get("responses")
+                if responses:
+                    # Cycle through a scripted sequence of responses
+                    rule["_index"] = rule.get("_index", -1) + 1
+                    return responses[rule["_index"] % len(responses)]
+                return rule["response"]
+        return ""
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    mock: MockOpenAIServer = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        # One handler per accepted connection, so this counts new connections
+        with self.mock.lock:
+            self.mock.connections += 1
+        if self.mock.connect_delay:
+            time.sleep(self.mock.connect_delay)
+
+    def send_json(self, status: int, payload: Dict[str, Any]):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self.send_json(200, {"object": "list", "data": [{"id": "gpt-4o", "object": "model"}]})
+        else:
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+
+    def do_POST(self):
+        received = time.perf_counter()
+        path = self.path.split("?", 1)[0]
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+
+        if not path.endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {path}"}})
+            return
+
+        deployment = re.search(r"/deployments/([^/]+)/", path)
+        model = body.get("model") or (deployment.group(1) if deployment else "gpt-4o")
+        messages = body.get("messages", [])
+        stream = bool(body.get("stream"))
+
+        if self.mock.should_fail():
+            time.sleep(self.mock.first_token_delay())
+            self.mock.record({"model": model, "status": self.mock.error_status, "stream": stream,
+                              "duration": time.perf_counter() - received})
+            self.send_json(self.mock.error_status, {
+                "error": {"message": "Injected failure from mock server", "type": "mock_error"}
+            })
+            return
+
+        content = self.mock.pick_response(messages)
+        prompt_tokens = sum(estimate_tokens(str(message.get("content", ""))) for message in messages)
+        completion_tokens = estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        time.sleep(self.mock.first_token_delay())
+        if stream:
+            self.stream_response(completion_id, created, model, content, usage, body)
+        else:
+            if self.mock.tokens_per_second:
+                time.sleep(completion_tokens / self.mock.tokens_per_second)
+            self.send_json(200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }],
+                "usage": usage,
+            })
+
+        self.mock.record({"model": model, "status": 200, "stream": stream, "usage": usage,
+                          "duration": time.perf_counter() - received})
+
+    def stream_response(self, completion_id, created, model, content, usage, body):
+        """Send the content as server-sent events, paced by the token throughput."""
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        def event(delta, finish_reason=None, **extra):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                **extra,
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        event({"role": "assistant", "content": ""})
+        pieces = re.findall(r"\S+\s*|\s+", content) or [""]
+        delay = 1.0 / self.mock.tokens_per_second if self.mock.tokens_per_second else 0.0
+        for piece in pieces:
+            event({"content": piece})
+            if delay:
+                time.sleep(delay)
+        event({}, finish_reason="stop")
+        if (body.get("stream_options") or {}).get("include_usage"):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                     "model": model, "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OpenAI-compatible mock server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on ttft in seconds")
+    parser.add_argument("--tps", type=float, default=0.0, help="Completion tokens per second (0 = instant)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests that fail (0-1)")
+    parser.add_argument("--error-status", type=int, default=429, help="HTTP status of injected failures")
+    parser.add_argument("--connect-delay", type=float, default=0.0,
+                        help="Seconds charged on each new connection, standing in for TCP/TLS handshakes")
+    parser.add_argument("--script", type=str, help='JSON file with rules: [{"match": regex, "response": text}]')
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    rules = None
+    if args.script:
+        with open(args.script) as f:
+            rules = json.load(f)
+
+    server = MockOpenAIServer(
+        host=args.host,
+        port=args.port,
+        ttft=args.ttft,
+        jitter=args.jitter,
+        tokens_per_second=args.tps,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        connect_delay=args.connect_delay,
+        rules=rules,
+        seed=args.seed,
+    )
+    print(f"Mock OpenAI server listening on {server.url}")
+    print(f"  OpenAI: export OPENAI_BASE_URL={server.openai_base_url} OPENAI_API_KEY=mock")
+    print(f"  Azure:  export AZURE_API_BASE={server.url} AZURE_API_KEY=mock")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,23 +4,59 @@
 ## Director is a LLM as a judge pattern.  https://www.evidentlyai.com/llm-guide/llm-as-a-judge
 
 import shlex
+import xml.etree.ElementTree as ET
 from pydantic import BaseModel
-from typing import Optional, List, Literal
+from typing import Optional, List, Literal, Dict, Any, Tuple, TYPE_CHECKING
 from pathlib import Path
-from aider.coders import Coder
-from aider.models import Model
-from aider.io import InputOutput
 import sys
 import yaml
 import argparse
-from openai import OpenAI, AzureOpenAI
+import atexit
 import subprocess
 import os
-
-
-class EvaluationResult(BaseModel):
-    success: bool
-    feedback: Optional[str]
+from contextlib import contextmanager
+import json
+import queue
+import uuid
+import time
+import shutil
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.cassettes import Cassette
+from agents.telemetry import Telemetry, trace, use_telemetry
+from director_cache import EvaluationCache
+from director_clients import get_cassette, get_client_manager, record_litellm_completions, use_cassette
+from director_evaluators import EVALUATORS, EvaluationResult, evaluator_spec
+from director_execution import (
+    ExecutionResult,
+    collect_pytest_ids,
+    failed_test_ids,
+    junit_key,
+    merge_junit_reports,
+    merge_shard_results,
+    pytest_option_value,
+    run_streaming,
+    shard_tests,
+    split_pytest_command,
+    without_pytest_options,
+)
+from director_logger import RunLogger
+from director_runner import (
+    CandidateResult,
+    expand_config_paths,
+    git_toplevel,
+    prepare_workspace,
+    print_run_summary,
+    remove_workspace,
+    run_candidate,
+    run_many,
+)
+
+# aider and openai take over a second to import, so they are loaded on first
+# use by the coder and evaluator; config validation and --help stay fast
+if TYPE_CHECKING:
+    from openai import OpenAI, AzureOpenAI
 
 
 class DirectorConfig(BaseModel):
@@ -32,9 +68,36 @@ class DirectorConfig(BaseModel):
     ]
     max_iterations: int
     execution_command: str
+    execution_timeout_seconds: Optional[float] = None
+    execution_shards: int = 1
+    execution_output_head_bytes: int = 32 * 1024
+    execution_output_tail_bytes: int = 32 * 1024
     context_editable: List[str]
     context_read_only: List[str]
-    evaluator: Literal["default"]
+    evaluator: str = "default"
+    evaluator_options: Dict[str, Any] = {}
+    coder_session: bool = False
+    candidates: int = 1
+    eval_cache: bool = True
+    failures_first: bool = False
+    eval_cache_ttl_seconds: int = 7 * 24 * 60 * 60
+    eval_cache_max_bytes: int = 64 * 1024 * 1024
+
+
+def relative_file_path(fname: str) -> Path:
+    """
+    Where a context file is stored inside a snapshot: relative paths as they
+    are, absolute ones relative to the current directory, or under "_absolute/"
+    with their full path when they are outside it.
+    """
+    path = Path(fname)
+    if not path.is_absolute():
+        return path
+    path = path.resolve()
+    try:
+        return path.relative_to(Path.cwd().resolve())
+    except ValueError:
+        return Path("_absolute", *path.parts[1:])
 
 
 class Director:
@@ -42,12 +105,78 @@ class Director:
     Self Directed AI Coding Assistant
     """
 
-    def __init__(self, config_path: str):
+    def __init__(
+        self,
+        config_path: str,
+        log_file: str = "director_log.jsonl",
+        log_blob_threshold: int = 0,
+        eval_cache: bool = True,
+        eval_cache_dir: str = ".director/cache/evaluations",
+        coder_session: bool = False,
+        candidates: Optional[int] = None,
+        cassette: Optional[str] = None,
+        cassette_mode: str = "auto",
+        telemetry: bool = True,
+        telemetry_path: Optional[str] = None,
+        resume: Optional[str] = None,
+        failures_first: bool = False,
+        shards: Optional[int] = None,
+    ):
+        self.config_path = config_path
+        self.log_file = log_file
+        # Resuming continues the interrupted run's id, log records and checkpoint
+        self.checkpoint_state = self.load_checkpoint(resume) if resume else {}
+        self.run_id = resume or f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        self.logger = RunLogger(log_file, self.run_id, blob_threshold=log_blob_threshold)
+        atexit.register(self.logger.close)
+        self.iteration = None
+        self.phase = "setup"
+        self.iterations_run = 0
         self.config = self.validate_config(Path(config_path))
-        self.llm_client = self.initialize_llm_client()
-
-    def initialize_llm_client(self) -> OpenAI:
-        """Initialize the appropriate OpenAI client based on model prefix"""
+        if candidates:
+            self.config.candidates = candidates
+        if shards:
+            self.config.execution_shards = shards
+        self.use_coder_session = coder_session or self.config.coder_session
+        self.coder_session = None
+        self.coder_session_files = {}
+        self.coder_timings = []
+        self.failures_first = failures_first or self.config.failures_first
+        # Node ids that failed in the last execution, rerun first in failures-first mode
+        self.failing_tests: List[str] = []
+        self.test_durations: Optional[Dict[str, float]] = None
+        self.llm_client = None
+        self.eval_cache = None
+        if eval_cache and self.config.eval_cache:
+            self.eval_cache = EvaluationCache(
+                Path(eval_cache_dir),
+                ttl_seconds=self.config.eval_cache_ttl_seconds,
+                max_bytes=self.config.eval_cache_max_bytes,
+            )
+        if cassette:
+            use_cassette(cassette, cassette_mode)
+        self.cassette = get_cassette()
+        # Spans of every model call and phase, next to the run's execution logs by default
+        spans_path = telemetry_path or self.RUNS_DIR / self.run_id / "spans.jsonl"
+        self.telemetry = use_telemetry(Telemetry(spans_path, self.run_id) if telemetry else None)
+        if self.cassette and self.cassette.mode == "replay":
+            # Replays never reach a service, but client setup still insists on credentials
+            for key, placeholder in self.REPLAY_CREDENTIALS.items():
+                os.environ.setdefault(key, placeholder)
+
+    # Credentials filled in with placeholders when replaying a cassette
+    REPLAY_CREDENTIALS = {
+        "OPENAI_API_KEY": "replay",
+        "AZURE_API_KEY": "replay",
+        "AZURE_API_BASE": "https://replay.invalid/",
+        "AZURE_API_VERSION": "2024-12-01-preview",
+        "AZURE_OPENAI_API_KEY": "replay",
+        "AZURE_OPENAI_ENDPOINT": "https://replay.invalid/",
+        "AZURE_OPENAI_VERSION": "2024-12-01-preview",
+    }
+
+    def initialize_llm_client(self) -> "OpenAI":
+        """Get the shared OpenAI client for the evaluator model based on its prefix"""
         if self.config.evaluator_model.startswith("azure/"):
             # Get deployment name by removing 'azure/' prefix
             deployment = self.get_model_name(self.config.evaluator_model)
@@ -75,15 +204,87 @@ class Director:
                 os.environ["AZURE_OPENAI_ENDPOINT"] = azure_endpoint  # Update the original variable too
             
             self.file_log(f"Using Azure OpenAI with deployment: {deployment}, version: {azure_version}")
-            
-            return AzureOpenAI(
+
+            self.evaluator_endpoint = f"azure:{azure_endpoint}{deployment}"
+            return get_client_manager().azure_client(
+                endpoint=azure_endpoint,
                 api_version=azure_version,
-                azure_endpoint=azure_endpoint,
                 api_key=azure_api_key,
-                azure_deployment=deployment,
+                deployment=deployment,
             )
         else:
-            return OpenAI()
+            self.evaluator_endpoint = f"openai:{self.config.evaluator_model}"
+            return get_client_manager().openai_client()
+
+    RUNS_DIR = Path(".director/runs")
+    # Per-test durations from earlier sharded runs, shared by every run in this directory
+    TEST_DURATIONS = Path(".director/test_durations.json")
+    # Phases of one iteration, in order; a checkpoint records the last one completed
+    PHASES = ["prompt", "code", "execute", "evaluate"]
+
+    @classmethod
+    def load_checkpoint(cls, run_id: str) -> Dict[str, Any]:
+        """Return the saved state of a run, for resuming it."""
+        path = cls.RUNS_DIR / run_id / "checkpoint.json"
+        try:
+            return json.loads(path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise ValueError(f"No checkpoint for run '{run_id}' (expected {path})")
+
+    def checkpoint(self, phase: str, **state):
+        """
+        Record that phase of the current iteration completed, with what is needed
+        to resume after it. Once code has been written, the editable files are
+        snapshotted too, so a resume starts from the files that phase produced.
+        """
+        self.checkpoint_state.update(
+            state, run_id=self.run_id, config_path=self.config_path, iteration=self.iteration, phase=phase
+        )
+        if phase in ("code", "candidates"):
+            snapshot = self.RUNS_DIR / self.run_id / f"iteration-{self.iteration}" / "files"
+            files = []
+            for fname in self.config.context_editable:
+                if Path(fname).exists():
+                    target = snapshot / relative_file_path(fname)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(fname, target)
+                    files.append(fname)
+            self.checkpoint_state["files"] = {"snapshot": str(snapshot), "names": files}
+
+        path = self.RUNS_DIR / self.run_id / "checkpoint.json"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(self.checkpoint_state, indent=2), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    def resume_point(self) -> Tuple[int, Optional[str]]:
+        """
+        Return the index of the iteration to continue from and the last phase of it
+        that completed, or (0, None) for a fresh run.
+        """
+        state = self.checkpoint_state
+        if not state:
+            return 0, None
+        if state["phase"] in ("evaluate", "candidates"):
+            # That iteration finished; carry on with the next one
+            return state["iteration"], None
+        return state["iteration"] - 1, state["phase"]
+
+    def restore_checkpoint_files(self):
+        """Put the editable files back as the checkpointed phase left them."""
+        files = self.checkpoint_state.get("files")
+        if not files:
+            return
+        for fname in files["names"]:
+            Path(fname).parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(Path(files["snapshot"]) / relative_file_path(fname), fname)
+        self.file_log(f"♻️  Restored {len(files['names'])} files from {files['snapshot']}", print_message=False)
+
+    def get_llm_client(self) -> "OpenAI":
+        """Return the evaluator client, creating it on first use."""
+        if self.llm_client is None:
+            self.llm_client = self.initialize_llm_client()
+        return self.llm_client
 
     def get_model_name(self, model: str) -> str:
         """Convert model name to appropriate format based on service"""
@@ -121,6 +322,20 @@ class Director:
                 f"got {config.evaluator_model}"
             )
 
+        # Validate the evaluator, and the tiers of a tiered evaluator
+        if config.evaluator not in EVALUATORS:
+            raise ValueError(
+                f"evaluator must be one of {sorted(EVALUATORS)}, got {config.evaluator}"
+            )
+        if config.evaluator == "tiered":
+            for tier in config.evaluator_options.get("tiers", []):
+                name, _ = evaluator_spec(tier)
+                if name not in EVALUATORS or name == "tiered":
+                    raise ValueError(f"Unknown tier evaluator: {name}")
+            judge = config.evaluator_options.get("judge", "llm")
+            if judge is not None and judge not in EVALUATORS:
+                raise ValueError(f"Unknown tiered judge evaluator: {judge}")
+
         # Validate coder_model if it's an Azure model
         if config.coder_model.startswith("azure/"):
             allowed_azure_coder_models = {"azure/gpt-4o"}
@@ -145,6 +360,18 @@ class Director:
 
         return config
 
+    @classmethod
+    def workspace_files(cls, config_path: str) -> List[str]:
+        """Return the config, prompt and context files a run of config_path reads."""
+        config = cls.validate_config(Path(config_path))
+        files = [config_path] + config.context_editable + config.context_read_only
+        # validate_config inlines a .md prompt, so look at the raw value
+        with open(config_path) as f:
+            prompt = yaml.safe_load(f).get("prompt", "")
+        if prompt.endswith(".md"):
+            files.append(prompt)
+        return files
+
     def parse_llm_json_response(self, str) -> str:
         """
         Parse and fix the response from an LLM that is expected to return JSON.
@@ -170,8 +397,12 @@ class Director:
     def file_log(self, message: str, print_message: bool = True):
         if print_message:
             print(message)
-        with open("director_log.txt", "a+", encoding="utf-8") as f:
-            f.write(message + "\n")
+        self.logger.log(
+            message,
+            iteration=self.iteration,
+            phase=self.phase,
+            console=print_message,
+        )
 
     # ------------- Key Director Methods -------------
 
@@ -201,132 +432,299 @@ class Director:
 ## Here's feedback on your previous attempt:
 {evaluation.feedback}"""
 
-    def ai_code(self, prompt: str):
-        # If using Azure model, set the API version in environment for aider
-        original_vars = {}
+    # Environment variables aider reads for Azure, saved and restored around coder use
+    AIDER_AZURE_ENV_VARS = [
+        "AZURE_API_VERSION",
+        "AZURE_API_KEY",
+        "AZURE_API_BASE",
+        "OPENAI_API_TYPE",
+        "OPENAI_API_VERSION",
+        "OPENAI_API_BASE",
+        "OPENAI_API_KEY",
+        "OPENAI_DEPLOYMENT_NAME",
+        "OPENAI_MODEL_NAME",
+    ]
+
+    @contextmanager
+    def coder_environment(self):
+        """Set up the environment aider needs for the coder model, restoring it on exit."""
+        if not self.config.coder_model.startswith("azure/"):
+            self.file_log(f"Using model: {self.config.coder_model}")
+            yield
+            return
+
+        # Store original environment variables
+        original_vars = {key: os.getenv(key) for key in self.AIDER_AZURE_ENV_VARS}
         try:
-            if self.config.coder_model.startswith("azure/"):
-                # Store original environment variables
-                original_vars = {
-                    'azure_api_version': os.getenv("AZURE_API_VERSION"),
-                    'azure_api_key': os.getenv("AZURE_API_KEY"),
-                    'azure_api_base': os.getenv("AZURE_API_BASE"),
-                    'api_type': os.getenv("OPENAI_API_TYPE"),
-                    'api_version': os.getenv("OPENAI_API_VERSION"),
-                    'api_base': os.getenv("OPENAI_API_BASE"),
-                    'api_key': os.getenv("OPENAI_API_KEY"),
-                    'deployment': os.getenv("OPENAI_DEPLOYMENT_NAME"),
-                    'model': os.getenv("OPENAI_MODEL_NAME")
-                }
-
-                # Get deployment name (model name without azure/ prefix)
-                deployment = self.get_model_name(self.config.coder_model)
-
-                # Check for required AZURE_API_* variables (required by Aider)
-                azure_api_key = os.getenv("AZURE_API_KEY")
-                azure_endpoint = os.getenv("AZURE_API_BASE")
-                azure_version = os.getenv("AZURE_API_VERSION")
-
-                # Check if we have the required variables
-                if not azure_api_key:
-                    raise ValueError("AZURE_API_KEY environment variable is required for Azure OpenAI with Aider")
-                if not azure_endpoint:
-                    raise ValueError("AZURE_API_BASE environment variable is required for Azure OpenAI with Aider")
-                if not azure_version:
-                    raise ValueError("AZURE_API_VERSION environment variable is required for Azure OpenAI with Aider")
-
-                # Ensure endpoint has trailing slash
-                if not azure_endpoint.endswith('/'):
-                    azure_endpoint = azure_endpoint + '/'
-
-                self.file_log(f"Using Azure OpenAI with deployment: {deployment}, version: {azure_version}")
-                
-                # Set OpenAI variables as fallback
-                os.environ["OPENAI_API_TYPE"] = "azure"
-                os.environ["OPENAI_API_VERSION"] = azure_version
-                os.environ["OPENAI_API_BASE"] = azure_endpoint
-                os.environ["AZURE_API_BASE"] = azure_endpoint  # Update the original variable too
-                
-                model = Model(self.config.coder_model)
-                coder = Coder.create(
-                    main_model=model,
-                    io=InputOutput(yes=True),
-                    fnames=self.config.context_editable,
-                    read_only_fnames=self.config.context_read_only,
-                    auto_commits=False,
-                    suggest_shell_commands=False,
-                    detect_urls=False,
-                )
-                try:
-                    coder.run(prompt)
-                finally:
-                    # Clean up resources
-                    if hasattr(coder, 'cleanup'):
-                        coder.cleanup()
-                    # Force close any remaining event loops
-                    if hasattr(model, 'close'):
-                        model.close()
-            else:
-                # Non-Azure model
-                self.file_log(f"Using model: {self.config.coder_model}")
-                model = Model(self.config.coder_model)
-                coder = Coder.create(
-                    main_model=model,
-                    io=InputOutput(yes=True),
-                    fnames=self.config.context_editable,
-                    read_only_fnames=self.config.context_read_only,
-                    auto_commits=False,
-                    suggest_shell_commands=False,
-                    detect_urls=False,
-                )
+            # Get deployment name (model name without azure/ prefix)
+            deployment = self.get_model_name(self.config.coder_model)
+
+            # Check for required AZURE_API_* variables (required by Aider)
+            azure_api_key = os.getenv("AZURE_API_KEY")
+            azure_endpoint = os.getenv("AZURE_API_BASE")
+            azure_version = os.getenv("AZURE_API_VERSION")
+
+            # Check if we have the required variables
+            if not azure_api_key:
+                raise ValueError("AZURE_API_KEY environment variable is required for Azure OpenAI with Aider")
+            if not azure_endpoint:
+                raise ValueError("AZURE_API_BASE environment variable is required for Azure OpenAI with Aider")
+            if not azure_version:
+                raise ValueError("AZURE_API_VERSION environment variable is required for Azure OpenAI with Aider")
+
+            # Ensure endpoint has trailing slash
+            if not azure_endpoint.endswith('/'):
+                azure_endpoint = azure_endpoint + '/'
+
+            self.file_log(f"Using Azure OpenAI with deployment: {deployment}, version: {azure_version}")
+
+            # Set OpenAI variables as fallback
+            os.environ["OPENAI_API_TYPE"] = "azure"
+            os.environ["OPENAI_API_VERSION"] = azure_version
+            os.environ["OPENAI_API_BASE"] = azure_endpoint
+            os.environ["AZURE_API_BASE"] = azure_endpoint  # Update the original variable too
+
+            yield
+        finally:
+            # Restore original environment variables
+            for key, value in original_vars.items():
+                if value is not None:
+                    os.environ[key] = value
+                else:
+                    os.environ.pop(key, None)
+
+    def create_coder(self):
+        """Create the aider model and coder for the configured context files."""
+        from aider.coders import Coder
+        from aider.models import Model
+        from aider.io import InputOutput
+
+        # Passes calls straight through when neither a cassette nor telemetry is active
+        record_litellm_completions()
+
+        model = Model(self.config.coder_model)
+        coder = Coder.create(
+            main_model=model,
+            io=InputOutput(yes=True),
+            fnames=self.config.context_editable,
+            read_only_fnames=self.config.context_read_only,
+            auto_commits=False,
+            suggest_shell_commands=False,
+            detect_urls=False,
+            # Streamed completions can't be recorded, so cassette runs ask for whole responses
+            stream=self.cassette is None,
+        )
+        return model, coder
+
+    def close_coder(self, model, coder):
+        # Clean up resources
+        if hasattr(coder, 'cleanup'):
+            coder.cleanup()
+        # Force close any remaining event loops
+        if hasattr(model, 'close'):
+            model.close()
+
+    def snapshot_context_files(self) -> dict:
+        """Return (mtime, size) for every context file, used to spot on-disk changes."""
+        state = {}
+        for fname in self.config.context_editable + self.config.context_read_only:
+            try:
+                stat = os.stat(fname)
+                state[fname] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                state[fname] = None
+        return state
+
+    def start_coder_session(self):
+        """Create the warm coder once; it is reused until close_coder_session()."""
+        self.coder_session = self.create_coder()
+        self.coder_session_files = self.snapshot_context_files()
+
+    def refresh_coder_session(self):
+        """Reset chat history and pick up context files that changed on disk."""
+        _, coder = self.coder_session
+
+        # Each Director prompt already carries the previous output and feedback,
+        # so start from a clean chat like a freshly created coder would
+        coder.done_messages = []
+        coder.cur_messages = []
+
+        current = self.snapshot_context_files()
+        changed = [
+            fname for fname, state in current.items()
+            if state != self.coder_session_files.get(fname)
+        ]
+        for fname in changed:
+            abs_fname = str(Path(fname).resolve())
+            if fname in self.config.context_editable and abs_fname not in coder.abs_fnames:
+                coder.add_rel_fname(fname)
+        if changed:
+            self.file_log(f"Refreshing changed files in coder session: {', '.join(changed)}", print_message=False)
+        self.coder_session_files = current
+
+    def close_coder_session(self):
+        if self.coder_session is not None:
+            self.close_coder(*self.coder_session)
+            self.coder_session = None
+
+    def ai_code(self, prompt: str):
+        setup_start = time.perf_counter()
+
+        if self.use_coder_session:
+            # The coder's environment is only set while it works, so it never
+            # leaks into the execution command or the evaluator
+            with self.coder_environment():
+                if self.coder_session is None:
+                    self.start_coder_session()
+                else:
+                    self.refresh_coder_session()
+                _, coder = self.coder_session
+                setup_seconds = time.perf_counter() - setup_start
+
+                run_start = time.perf_counter()
+                coder.run(prompt)
+            # Files edited by the coder are already in sync with the session
+            self.coder_session_files = self.snapshot_context_files()
+        else:
+            with self.coder_environment():
+                model, coder = self.create_coder()
+                setup_seconds = time.perf_counter() - setup_start
+                run_start = time.perf_counter()
                 try:
                     coder.run(prompt)
                 finally:
-                    # Clean up resources
-                    if hasattr(coder, 'cleanup'):
-                        coder.cleanup()
-                    # Force close any remaining event loops
-                    if hasattr(model, 'close'):
-                        model.close()
-        finally:
-            # Restore original environment variables
-            if self.config.coder_model.startswith("azure/"):
-                for key, value in original_vars.items():
-                    env_key = {
-                        'azure_api_version': "AZURE_API_VERSION",
-                        'azure_api_key': "AZURE_API_KEY",
-                        'azure_api_base': "AZURE_API_BASE",
-                        'api_type': "OPENAI_API_TYPE",
-                        'api_version': "OPENAI_API_VERSION",
-                        'api_base': "OPENAI_API_BASE",
-                        'api_key': "OPENAI_API_KEY",
-                        'deployment': "OPENAI_DEPLOYMENT_NAME",
-                        'model': "OPENAI_MODEL_NAME"
-                    }[key]
-                    if value is not None:
-                        os.environ[env_key] = value
-                    else:
-                        os.environ.pop(env_key, None)
-
-    def execute(self) -> str:
-        """Execute the tests and return the output as a string."""
-        result = subprocess.run(
-            shlex.split(self.config.execution_command),
-            capture_output=True,
-            text=True,
+                    self.close_coder(model, coder)
+
+        run_seconds = time.perf_counter() - run_start
+        self.coder_timings.append({"setup_seconds": setup_seconds, "run_seconds": run_seconds})
+        self.file_log(f"⏱️  Coder setup {setup_seconds:.2f}s, run {run_seconds:.2f}s")
+
+    def execute(self) -> ExecutionResult:
+        """
+        Execute the tests, streaming output to the run directory. In failures-first
+        mode the tests that failed last time run on their own first, and the full
+        command only runs once they pass, to confirm nothing else broke.
+        """
+        if self.failures_first and self.failing_tests:
+            command = self.failing_tests_command()
+            if command:
+                self.file_log(f"🎯 Rerunning {len(self.failing_tests)} previously failing tests first...")
+                result = self.run_execution(command, suffix="-failures")
+                failing = failed_test_ids(result.output)
+                if result.timed_out or (result.exit_code == 1 and failing):
+                    self.file_log(f"🎯 {len(failing)} still failing, skipping the full run")
+                    self.failing_tests = failing or self.failing_tests
+                    return result
+                self.file_log("🎯 Previously failing tests pass, running the full command...")
+
+        result = self.run_execution(self.config.execution_command)
+        self.failing_tests = failed_test_ids(result.output)
+        return result
+
+    def failing_tests_command(self) -> Optional[str]:
+        """The execution command with its test paths replaced by the failing node ids."""
+        split = split_pytest_command(self.config.execution_command)
+        if split is None:
+            return None
+        args, _ = split
+        return shlex.join(args + self.failing_tests)
+
+    def run_execution(self, command: str, suffix: str = "") -> ExecutionResult:
+        """Run one execution command, sharded when configured, and log its result."""
+        result = None
+        if self.config.execution_shards > 1:
+            result = self.run_sharded(command, suffix)
+        if result is None:
+            spool_path = self.RUNS_DIR / self.run_id / f"execution-{self.iteration or 0}{suffix}.log"
+            result = run_streaming(
+                command,
+                timeout=self.config.execution_timeout_seconds,
+                spool_path=spool_path,
+                head_bytes=self.config.execution_output_head_bytes,
+                tail_bytes=self.config.execution_output_tail_bytes,
+            )
+        self.file_log(
+            f"Execution result:\n{result.summary()}",
+            print_message=result.timed_out,
         )
         self.file_log(
-            f"Execution output: \n{result.stdout + result.stderr}",
+            f"Execution output: \n{result.output}",
             print_message=False,
         )
-        return result.stdout + result.stderr
+        return result
 
-    def evaluate(self, execution_output: str) -> EvaluationResult:
-        if self.config.evaluator != "default":
-            raise ValueError(
-                f"Custom evaluator {self.config.evaluator} not implemented"
+    def run_sharded(self, command: str, suffix: str = "") -> Optional[ExecutionResult]:
+        """
+        Run a pytest command as parallel shards of its collected tests, balanced by
+        the durations of earlier runs, each with the execution timeout. None when
+        the command does not run pytest or its tests cannot be collected, so the
+        caller falls back to a single process.
+        """
+        split = split_pytest_command(command)
+        if split is None:
+            return None
+        args, paths = split
+        node_ids = collect_pytest_ids(args + paths, timeout=self.config.execution_timeout_seconds)
+        if not node_ids or len(node_ids) < 2:
+            return None
+
+        shards = shard_tests(node_ids, self.load_test_durations(), self.config.execution_shards)
+        junit_path = pytest_option_value(args, "--junitxml") or pytest_option_value(args, "--junit-xml")
+        shard_args = without_pytest_options(args, {"--junitxml", "--junit-xml"}, takes_value=True)
+        name = self.RUNS_DIR / self.run_id / f"execution-{self.iteration or 0}{suffix}"
+        reports = [Path(f"{name}-shard-{index}.xml") for index in range(len(shards))]
+        self.file_log(f"🧩 Running {len(node_ids)} tests in {len(shards)} shards", print_message=False)
+
+        def run_shard(index: int) -> ExecutionResult:
+            return run_streaming(
+                shlex.join(shard_args + [f"--junitxml={reports[index]}"] + shards[index]),
+                timeout=self.config.execution_timeout_seconds,
+                spool_path=Path(f"{name}-shard-{index}.log"),
+                head_bytes=self.config.execution_output_head_bytes // len(shards),
+                tail_bytes=self.config.execution_output_tail_bytes // len(shards),
             )
 
+        start = time.perf_counter()
+        with ThreadPoolExecutor(len(shards), thread_name_prefix="director-shard") as pool:
+            results = list(pool.map(run_shard, range(len(shards))))
+        duration = time.perf_counter() - start
+
+        self.record_test_durations(reports, node_ids)
+        if junit_path:
+            # Keep the report a junit evaluator expects, covering every shard
+            merge_junit_reports(reports, Path(junit_path))
+        return merge_shard_results(command, results, shards, duration, Path(f"{name}.log"))
+
+    def load_test_durations(self) -> Dict[str, float]:
+        """Recorded test durations by node id, read on first use."""
+        if self.test_durations is None:
+            try:
+                self.test_durations = json.loads(self.TEST_DURATIONS.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                self.test_durations = {}
+        return self.test_durations
+
+    def record_test_durations(self, reports: List[Path], node_ids: List[str]):
+        """Update the recorded durations from the shards' JUnit reports."""
+        durations = self.load_test_durations()
+        node_ids_by_key = {junit_key(node_id): node_id for node_id in node_ids}
+        for report in reports:
+            try:
+                root = ET.parse(report).getroot()
+            except (OSError, ET.ParseError):
+                continue
+            for testcase in root.iter("testcase"):
+                node_id = node_ids_by_key.get((testcase.get("classname", ""), testcase.get("name", "")))
+                if node_id:
+                    durations[node_id] = float(testcase.get("time") or 0.0)
+
+        self.TEST_DURATIONS.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.TEST_DURATIONS.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(durations, sort_keys=True), encoding="utf-8")
+        os.replace(tmp_path, self.TEST_DURATIONS)
+
+    def build_evaluation_prompt(self, execution: ExecutionResult) -> str:
+        """Build the LLM judge prompt from the current files and execution output."""
         map_editable_fname_to_files = {
             Path(fname).name: Path(fname).read_text()
             for fname in self.config.context_editable
@@ -366,8 +764,11 @@ The JSON must match this structure exactly:
 ## Execution Command:
 {self.config.execution_command}
 
+## Execution Result:
+{execution.summary()}
+
 ## Execution Output:
-{execution_output}
+{execution.output}
 
 ## Response Format:
 > Be 100% sure to output JSON.parse compatible JSON.
@@ -377,41 +778,94 @@ Return a structured JSON response with the following structure: {{
     success: bool - true if the execution output generated by the execution command matches the Users Desired Result
     feedback: str | None - if unsuccessful, provide detailed feedback explaining what failed and how to fix it, or None if successful
 }}"""
+        return evaluation_prompt
+
+    def evaluate(self, execution: ExecutionResult) -> EvaluationResult:
+        """Run the configured evaluator, using the LLM judge when it cannot decide."""
+        evaluator = EVALUATORS[self.config.evaluator]
+        evaluation = evaluator(self, execution, self.config.evaluator_options)
+        if evaluation is None:
+            self.file_log(
+                f"Evaluator '{self.config.evaluator}' could not decide, asking the LLM judge",
+                print_message=False,
+            )
+            evaluation = self.llm_evaluate(execution)
+        return evaluation
+
+    def evaluator_uses_judge(self) -> bool:
+        """Whether the configured evaluator asks the LLM judge even when its own checks pass."""
+        if self.config.evaluator in ("default", "llm"):
+            return True
+        if self.config.evaluator == "tiered":
+            return self.config.evaluator_options.get("judge", "llm") in ("default", "llm")
+        return False
+
+    def llm_evaluate(self, execution: ExecutionResult) -> EvaluationResult:
+        """Evaluate with the LLM judge, reusing cached judgments for identical inputs."""
+        evaluation_prompt = self.build_evaluation_prompt(execution)
 
         self.file_log(
             f"Evaluation prompt: ({self.config.evaluator_model}):\n{evaluation_prompt}",
             print_message=False,
         )
 
-        try:
-            model_name = self.get_model_name(self.config.evaluator_model)
-            
-            # Create the completion - response_format is only supported by certain models
-            # For now, we'll use it only in the fallback case with gpt-4o
-            completion = self.llm_client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": evaluation_prompt}]
-            )
+        cache_key = None
+        if self.eval_cache:
+            cache_key = self.eval_cache.make_key(self.config.evaluator_model, evaluation_prompt)
+            cached = self.eval_cache.get(cache_key)
+            if cached is not None:
+                self.file_log(f"📦 Evaluation cache hit ({cache_key[:12]}), skipping LLM judge call")
+                return cached
+
+        evaluation = self.judge(evaluation_prompt)
+        if self.eval_cache:
+            self.eval_cache.put(cache_key, self.config.evaluator_model, evaluation)
+        return evaluation
+
+    def judge(self, evaluation_prompt: str) -> EvaluationResult:
+        """Ask the evaluator model for a verdict, falling back to gpt-4o structured output."""
+        manager = get_client_manager()
+        client = self.get_llm_client()
+        if manager.is_available(self.evaluator_endpoint):
+            try:
+                model_name = self.get_model_name(self.config.evaluator_model)
+
+                # Create the completion - response_format is only supported by certain models
+                # For now, we'll use it only in the fallback case with gpt-4o
+                completion = manager.call(
+                    self.evaluator_endpoint,
+                    lambda: client.chat.completions.create(
+                        model=model_name,
+                        messages=[{"role": "user", "content": evaluation_prompt}]
+                    ),
+                )
 
-            self.file_log(
-                f"Evaluation response: ({self.config.evaluator_model}):\n{completion.choices[0].message.content}",
-                print_message=False,
-            )
+                self.file_log(
+                    f"Evaluation response: ({self.config.evaluator_model}):\n{completion.choices[0].message.content}",
+                    print_message=False,
+                )
 
-            evaluation = EvaluationResult.model_validate_json(
-                self.parse_llm_json_response(completion.choices[0].message.content)
-            )
+                evaluation = EvaluationResult.model_validate_json(
+                    self.parse_llm_json_response(completion.choices[0].message.content)
+                )
 
-            return evaluation
-        except Exception as e:
+                return evaluation
+            except Exception as e:
+                primary_error = e
+                self.file_log(
+                    f"Error evaluating execution output for '{self.config.evaluator_model}'. Error: {e}. Falling back to gpt-4o & structured output."
+                )
+        else:
+            primary_error = f"circuit breaker open for {self.evaluator_endpoint}"
             self.file_log(
-                f"Error evaluating execution output for '{self.config.evaluator_model}'. Error: {e}. Falling back to gpt-4o & structured output."
+                f"Circuit breaker open for '{self.config.evaluator_model}', routing straight to gpt-4o & structured output."
             )
 
-            ## Fallback using standard OpenAI client with gpt-4o which supports response_format
-            fallback_client = OpenAI()  # Create new standard OpenAI client for fallback
-            try:
-                completion = fallback_client.beta.chat.completions.parse(
+        ## Fallback using the shared OpenAI client with gpt-4o which supports response_format
+        try:
+            completion = manager.call(
+                "openai:gpt-4o",
+                lambda: manager.openai_client().beta.chat.completions.parse(
                     model="gpt-4o",
                     messages=[
                         {
@@ -420,40 +874,228 @@ Return a structured JSON response with the following structure: {{
                         },
                     ],
                     response_format=EvaluationResult,
-                )
+                ),
+            )
 
-                message = completion.choices[0].message
-                if message.parsed:
-                    return message.parsed
+            message = completion.choices[0].message
+            if message.parsed:
+                return message.parsed
+            else:
+                raise ValueError("Failed to parse the response")
+        except Exception as fallback_error:
+            raise ValueError(f"Both primary and fallback evaluation failed. Primary error: {primary_error}, Fallback error: {fallback_error}")
+
+    def run_candidates(self, prompt: str) -> Tuple[ExecutionResult, EvaluationResult]:
+        """
+        Run N coder candidates concurrently, each in its own sandbox copy, and
+        promote the first one that succeeds (or the best-scoring one) into the
+        working tree. Candidates still running when a winner is found are killed.
+        """
+        count = self.config.candidates
+        batch = (Path(".director/runs") / self.run_id / f"candidates-{self.iteration}").resolve()
+        isolation = "worktree" if git_toplevel(Path.cwd()) else "copy"
+
+        workspaces = []
+        run_dirs = []
+        for index in range(count):
+            workspace = batch / f"candidate-{index}"
+            workspaces.append(workspace)
+            run_dirs.append(prepare_workspace(workspace, isolation, self.workspace_files(self.config_path)))
+
+        # Candidates honour the same overrides this Director was built with
+        director_kwargs = {
+            "log_blob_threshold": self.logger.blob_threshold,
+            "telemetry": self.telemetry is not None,
+            "eval_cache": self.eval_cache is not None,
+            "eval_cache_dir": str(self.eval_cache.cache_dir) if self.eval_cache else ".director/cache/evaluations",
+            "coder_session": self.use_coder_session,
+            "failures_first": self.failures_first,
+            "shards": self.config.execution_shards,
+        }
+        if self.cassette:
+            director_kwargs["cassette"] = str(self.cassette.path)
+            director_kwargs["cassette_mode"] = self.cassette.mode
+        context = multiprocessing.get_context("spawn")
+        results_queue = context.Queue()
+        processes = [
+            context.Process(
+                target=run_candidate,
+                args=(
+                    type(self),
+                    index,
+                    self.config_path,
+                    str(run_dirs[index]),
+                    str(batch / f"candidate-{index}"),
+                    prompt,
+                    self.iteration,
+                    self.failing_tests,
+                    director_kwargs,
+                    results_queue,
+                ),
+            )
+            for index in range(count)
+        ]
+        for process in processes:
+            process.start()
+
+        results: Dict[int, CandidateResult] = {}
+        winner = None
+        dead_since: Dict[int, float] = {}
+        try:
+            while len(results) < count:
+                try:
+                    result = CandidateResult(**results_queue.get(timeout=0.5))
+                except queue.Empty:
+                    # A candidate that died without reporting (e.g. segfault) counts as failed
+                    for index, process in enumerate(processes):
+                        if index in results or process.is_alive():
+                            continue
+                        dead_since.setdefault(index, time.monotonic())
+                        if time.monotonic() - dead_since[index] > 2.0:
+                            results[index] = CandidateResult(
+                                index=index, error=f"Candidate process exited with code {process.exitcode}"
+                            )
+                    continue
+
+                results[result.index] = result
+                if result.error:
+                    self.file_log(f"🏁 Candidate {result.index}: 💥 {result.error}")
                 else:
-                    raise ValueError("Failed to parse the response")
-            except Exception as fallback_error:
-                raise ValueError(f"Both primary and fallback evaluation failed. Primary error: {e}, Fallback error: {fallback_error}")
+                    self.file_log(
+                        f"🏁 Candidate {result.index}: "
+                        f"{'✅' if result.evaluation.success else '❌'} score {result.score:.2f} "
+                        f"({result.duration_seconds:.1f}s)"
+                    )
+                if result.evaluation and result.evaluation.success:
+                    winner = result
+                    break
+        finally:
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.kill()
+                    process.join()
+            results_queue.close()
+
+        cancelled = count - len(results)
+        if winner is None:
+            scored = [result for result in results.values() if result.evaluation]
+            if not scored:
+                errors = "; ".join(result.error or "" for result in results.values())
+                raise RuntimeError(f"All {count} coder candidates failed: {errors}")
+            winner = max(scored, key=lambda result: result.score)
 
-    def direct(self):
+        self.file_log(
+            f"🏆 Promoting candidate {winner.index} (score {winner.score:.2f})"
+            + (f", cancelled {cancelled} still running" if cancelled else "")
+        )
+        for fname in self.config.context_editable:
+            if Path(fname).is_absolute():
+                # Candidates edit absolute paths in place, not in their sandbox
+                continue
+            source = run_dirs[winner.index] / fname
+            if source.exists():
+                Path(fname).parent.mkdir(parents=True, exist_ok=True)
+                shutil.copy2(source, fname)
+
+        for workspace in workspaces:
+            remove_workspace(workspace)
+
+        return winner.execution, winner.evaluation
+
+    def direct(self) -> bool:
+        """Run the code / execute / evaluate loop. Returns True on success."""
         try:
+            # Fail fast on missing evaluator credentials, before any coder call, but
+            # only when the judge will be asked; deterministic evaluators never need it
+            if self.evaluator_uses_judge():
+                self.get_llm_client()
+
             evaluation = EvaluationResult(success=False, feedback=None)
             execution_output = ""
             success = False
-
-            for i in range(self.config.max_iterations):
-                self.file_log(f"\nIteration {i+1}/{self.config.max_iterations}")
-
-                self.file_log("🧠 Creating new prompt...")
-                new_prompt = self.create_new_ai_coding_prompt(
-                    i, self.config.prompt, execution_output, evaluation
+            first_iteration, resume_after = self.resume_point()
+            self.iterations_run = first_iteration
+            if self.checkpoint_state:
+                self.file_log(
+                    f"⏯️  Resuming run {self.run_id} after the {self.checkpoint_state['phase']} phase "
+                    f"of iteration {self.checkpoint_state['iteration']}"
                 )
+                self.restore_checkpoint_files()
+            if self.checkpoint_state.get("execution"):
+                self.failing_tests = failed_test_ids(ExecutionResult(**self.checkpoint_state["execution"]).output)
+            if self.checkpoint_state.get("evaluation"):
+                evaluation = EvaluationResult(**self.checkpoint_state["evaluation"])
+                execution_output = self.checkpoint_state.get("execution_output", "")
+                success = resume_after is None and evaluation.success
+                if success:
+                    self.file_log(f"\n🎉 Run already succeeded at iteration {first_iteration}.")
+
+            for i in range(first_iteration, self.config.max_iterations if not success else first_iteration):
+                self.iterations_run = i + 1
+                self.iteration = i + 1
+                self.phase = "iteration"
+                self.file_log(f"\nIteration {i+1}/{self.config.max_iterations}")
+                # Phases of this iteration an interrupted run already completed
+                done = self.PHASES.index(resume_after) + 1 if i == first_iteration and resume_after else 0
 
-                self.file_log("🤖 Generating AI code...")
-                self.ai_code(new_prompt)
-
-                self.file_log(f"💻 Executing code... '{self.config.execution_command}'")
-                execution_output = self.execute()
+                self.phase = "prompt"
+                if done > 0:
+                    new_prompt = self.checkpoint_state["prompt"]
+                    self.file_log("🧠 Reusing checkpointed prompt")
+                else:
+                    self.file_log("🧠 Creating new prompt...")
+                    with trace("phase", self.phase, iteration=self.iteration):
+                        new_prompt = self.create_new_ai_coding_prompt(
+                            i, self.config.prompt, execution_output, evaluation
+                        )
+                    self.checkpoint("prompt", prompt=new_prompt)
+
+                if self.config.candidates > 1:
+                    self.phase = "candidates"
+                    self.file_log(f"🏁 Racing {self.config.candidates} coder candidates...")
+                    with trace("phase", self.phase, iteration=self.iteration):
+                        execution, evaluation = self.run_candidates(new_prompt)
+                    execution_output = execution.output
+                    self.checkpoint(
+                        "candidates",
+                        execution=execution.model_dump(),
+                        evaluation=evaluation.model_dump(),
+                        execution_output=execution_output,
+                    )
+                else:
+                    self.phase = "code"
+                    if done > 1:
+                        self.file_log("🤖 Reusing checkpointed code")
+                    else:
+                        self.file_log("🤖 Generating AI code...")
+                        with trace("phase", self.phase, iteration=self.iteration):
+                            self.ai_code(new_prompt)
+                        self.checkpoint("code")
+
+                    self.phase = "execute"
+                    if done > 2:
+                        execution = ExecutionResult(**self.checkpoint_state["execution"])
+                        self.file_log("💻 Reusing checkpointed execution output")
+                    else:
+                        self.file_log(f"💻 Executing code... '{self.config.execution_command}'")
+                        with trace("phase", self.phase, iteration=self.iteration):
+                            execution = self.execute()
+                        self.checkpoint("execute", execution=execution.model_dump())
+                    execution_output = execution.output
 
-                self.file_log(
-                    f"🔍 Evaluating results... '{self.config.evaluator_model}' + '{self.config.evaluator}'"
-                )
-                evaluation = self.evaluate(execution_output)
+                    self.phase = "evaluate"
+                    self.file_log(
+                        f"🔍 Evaluating results... '{self.config.evaluator_model}' + '{self.config.evaluator}'"
+                    )
+                    with trace("phase", self.phase, iteration=self.iteration):
+                        evaluation = self.evaluate(execution)
+                    self.checkpoint(
+                        "evaluate", evaluation=evaluation.model_dump(), execution_output=execution_output
+                    )
 
                 self.file_log(
                     f"🔍 Evaluation result: {'✅ Success' if evaluation.success else '❌ Failed'}"
@@ -477,23 +1119,828 @@ Return a structured JSON response with the following structure: {{
                     "\n🚫 Failed to achieve success within the maximum number of iterations."
                 )
 
+            self.phase = "summary"
+            if self.coder_timings:
+                total_setup = sum(timing["setup_seconds"] for timing in self.coder_timings)
+                total_run = sum(timing["run_seconds"] for timing in self.coder_timings)
+                self.file_log(
+                    f"⏱️  Coder totals over {len(self.coder_timings)} iterations: "
+                    f"setup {total_setup:.2f}s, run {total_run:.2f}s"
+                    f"{' (warm session)' if self.use_coder_session else ''}"
+                )
+
+            if self.llm_client is not None:
+                for line in get_client_manager().stats_summary():
+                    self.file_log(f"📡 {line}")
+
+            if self.eval_cache and self.eval_cache.hits + self.eval_cache.misses:
+                self.file_log(
+                    f"📦 Evaluation cache: {self.eval_cache.hits} hits, {self.eval_cache.misses} misses"
+                )
+
+            if self.cassette:
+                self.cassette.save_index()
+                self.file_log(f"📼 Cassette {self.cassette.summary()}")
+
+            if self.telemetry:
+                metrics_path = self.telemetry.path.with_name("metrics.prom")
+                metrics_path.write_text(self.telemetry.prometheus(), encoding="utf-8")
+                self.file_log(f"📈 Telemetry: {self.telemetry.summary()} (spans in {self.telemetry.path.parent})")
+
             self.file_log("\nDone.")
+            return success
+        except BaseException:
+            if self.checkpoint_state:
+                self.file_log(f"\n⏸️  Run interrupted; continue it with --resume {self.run_id}")
+            raise
         finally:
             # Clean up any remaining resources
-            if hasattr(self.llm_client, 'close'):
-                self.llm_client.close()
+            self.close_coder_session()
+            self.logger.close()
+
+
+def validate_configs(config_paths: List[str]) -> int:
+    """Validate many configs in one process. Returns a process exit code."""
+    failures = 0
+    for config_path in config_paths:
+        try:
+            Director.validate_config(Path(config_path))
+            print(f"✅ {config_path}")
+        except Exception as e:
+            failures += 1
+            print(f"❌ {config_path}: {type(e).__name__}: {e}")
+    print(f"\n{len(config_paths) - failures}/{len(config_paths)} configs valid.")
+    return 1 if failures else 0
+
+
+# ------------- Tests -------------
+
+
+def test_evaluation_cache_ignores_timings_and_spool_paths():
+    """Test that reruns differing only in timings and run directory share one cache key."""
+    def evaluation_prompt(run_id: str, seconds: float) -> str:
+        execution = ExecutionResult(
+            command="pytest",
+            exit_code=1,
+            duration_seconds=seconds,
+            total_bytes=100_000,
+            head="FAILED test_app.py::test_add - assert 3 == 4\n",
+            tail=f"1 failed in {seconds}s\n",
+            spool_path=f".director/runs/{run_id}/execution-1.log",
+        )
+        return f"{execution.output}\n{execution.summary()}"
+
+    key = EvaluationCache.make_key("gpt-4o", evaluation_prompt("run-1", 0.42))
+    assert key == EvaluationCache.make_key("gpt-4o", evaluation_prompt("run-2", 1.75).replace("\n", "\r\n"))
+    assert key != EvaluationCache.make_key("gpt-4o-mini", evaluation_prompt("run-1", 0.42))
+
+
+def test_evaluation_cache_expires_and_evicts_least_recently_used(tmp_path):
+    """Test that entries are served until their TTL and evicted least-recently-used past max_bytes."""
+    cache = EvaluationCache(tmp_path, ttl_seconds=60, max_bytes=10_000)
+    results = {name: EvaluationResult(success=False, feedback=f"Fix {name}") for name in "abc"}
+    assert cache.get("a") is None
+    cache.put("a", "gpt-4o", results["a"])
+    cache.put("b", "gpt-4o", results["b"])
+    assert cache.get("a") == results["a"]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # b was used before a, so it goes first once the cache outgrows two entries
+    now = time.time()
+    os.utime(tmp_path / "a.json", (now - 5, now - 5))
+    os.utime(tmp_path / "b.json", (now - 10, now - 10))
+    cache.max_bytes = (tmp_path / "a.json").stat().st_size * 5 // 2
+    cache.put("c", "gpt-4o", results["c"])
+    assert sorted(path.name for path in tmp_path.glob("*.json")) == ["a.json", "c.json"]
+
+    cache.ttl_seconds = 0
+    assert cache.get("a") is None
+    assert not (tmp_path / "a.json").exists()
+
+
+def test_run_logger_writes_records_blobs_and_rotates(tmp_path):
+    """Test that queued records reach the log, large payloads go to the blob file and full logs rotate."""
+    path = tmp_path / "director_log.jsonl"
+    logger = RunLogger(str(path), "run-1", max_bytes=600, backup_count=2, blob_threshold=100, flush_interval=0.01)
+    logger.log("short message", phase="code", iteration=1)
+    logger.log("x" * 5000, phase="execute", iteration=1)
+    logger.flush()
+
+    short, large = [json.loads(line) for line in path.read_text().splitlines()]
+    assert (short["message"], short["phase"], short["run_id"]) == ("short message", "code", "run-1")
+    assert "message" not in large and large["size"] == 5000
+    assert RunLogger.read_blob(str(path), large["blob"]) == "x" * 5000
+
+    for index in range(20):
+        logger.log(f"message {index}")
+        logger.flush()
+    logger.close()
+    logs = sorted(tmp_path.glob("director_log.jsonl*"))
+    assert [log.name for log in logs] == ["director_log.jsonl", "director_log.jsonl.1", "director_log.jsonl.2"]
+    assert all(log.stat().st_size <= 600 for log in logs)
+    assert json.loads(path.read_text().splitlines()[-1])["message"] == "message 19"
+
+
+def test_run_streaming_keeps_bounded_head_and_tail(tmp_path):
+    """Test that long output keeps only its head and tail in memory, with the whole of it in the spool file."""
+    script = "import sys; sys.stdout.write(''.join(f'line {i}\\n' for i in range(10000)))"
+    spool_path = tmp_path / "execution.log"
+    result = run_streaming(
+        shlex.join([sys.executable, "-c", script]), spool_path=spool_path, head_bytes=64, tail_bytes=64
+    )
+
+    full = "".join(f"line {i}\n" for i in range(10000))
+    assert result.exit_code == 0 and not result.timed_out
+    assert result.truncated and result.total_bytes == len(full)
+    assert (result.head, result.tail) == (full[:64], full[-64:])
+    assert f"bytes omitted, full output in {spool_path}" in result.output
+    assert spool_path.read_text() == full
+
+
+def test_run_streaming_kills_a_command_that_times_out():
+    """Test that a command running past its timeout is killed and reported as timed out."""
+    script = "import time; print('started', flush=True); time.sleep(60)"
+    result = run_streaming(shlex.join([sys.executable, "-c", script]), timeout=0.5)
+
+    assert result.timed_out and result.exit_code != 0
+    assert result.duration_seconds < 30
+    assert result.output == "started\n"
+    assert "Timed out" in result.summary()
+
+
+def test_exit_code_evaluator_reports_failing_tests_and_output():
+    """Test that a failed command's feedback names the failing tests and ends with the output."""
+    from director_evaluators import exit_code_evaluator
+
+    execution = ExecutionResult(
+        command="pytest",
+        exit_code=1,
+        duration_seconds=1.0,
+        head="test_app.py F.\nFAILED test_app.py::test_add - assert 3 == 4\n1 failed, 1 passed in 0.1s\n",
+    )
+    evaluation = exit_code_evaluator(None, execution, {})
+    assert not evaluation.success
+    assert "Failing tests:\n- test_app.py::test_add" in evaluation.feedback
+    assert evaluation.feedback.endswith("1 failed, 1 passed in 0.1s")
+
+    assert exit_code_evaluator(None, execution, {"success_codes": [0, 1]}).success
+    timed_out = execution.model_copy(update={"timed_out": True, "exit_code": -15})
+    assert "timed out" in exit_code_evaluator(None, timed_out, {}).feedback
+
+
+def test_junit_regex_and_json_evaluators(tmp_path):
+    """Test the deterministic evaluators, including a JUnit report that predates the run."""
+    from director_evaluators import json_evaluator, junit_evaluator, regex_evaluator
+
+    report = tmp_path / "junit.xml"
+    report.write_text(
+        '<testsuite><testcase classname="test_app" name="test_add"><failure message="assert 3 == 4">'
+        'trace</failure></testcase><testcase classname="test_app" name="test_sub"/></testsuite>'
+    )
+    execution = ExecutionResult(
+        command="pytest", exit_code=1, duration_seconds=1.0, started_at=time.time() - 60,
+        head='{"solution": {"Monday": ["9:00"]}}',
+    )
+    evaluation = junit_evaluator(None, execution, {"junit_xml": str(report)})
+    assert not evaluation.success
+    assert evaluation.feedback.startswith("1 of 2 tests failed")
+    assert "test_app::test_add (failure): assert 3 == 4" in evaluation.feedback
+    stale = execution.model_copy(update={"started_at": time.time() + 60})
+    assert junit_evaluator(None, stale, {"junit_xml": str(report)}) is None
+
+    assert regex_evaluator(None, execution, {"must_match": [r"Monday"]}).success
+    assert not regex_evaluator(None, execution, {"must_not_match": [r"9:00"]}).success
+
+    assert json_evaluator(None, execution, {"assertions": [{"path": "solution.Monday", "length": 1}]}).success
+    evaluation = json_evaluator(None, execution, {"assertions": [
+        {"path": "solution.Monday.0", "equals": "10:00"}, {"path": "solution.Tuesday"},
+    ]})
+    assert "- solution.Monday.0 is '9:00', expected '10:00'" in evaluation.feedback
+    assert "- Missing solution.Tuesday" in evaluation.feedback
+
+
+def test_tiered_evaluator_stops_at_the_first_failing_tier(monkeypatch):
+    """Test that the judge only runs once every deterministic tier passed or could not decide."""
+    from types import SimpleNamespace
+    from director_evaluators import tiered_evaluator
+
+    judged = []
+
+    def judge(director, execution, options):
+        judged.append(options)
+        return EvaluationResult(success=True, feedback=None)
+
+    monkeypatch.setitem(EVALUATORS, "judge", judge)
+    director = SimpleNamespace(file_log=lambda *args, **kwargs: None)
+    passed = ExecutionResult(command="pytest", exit_code=0, duration_seconds=1.0, head="3 passed in 0.1s")
+    failed = passed.model_copy(update={"exit_code": 1})
+    options = {
+        "tiers": ["exit_code", {"name": "regex", "must_match": [r"\d+ passed"]}],
+        "judge": "judge",
+        "judge_options": {"strict": True},
+    }
+
+    assert not tiered_evaluator(director, failed, options).success
+    assert judged == []
+    assert tiered_evaluator(director, passed, options).success
+    assert judged == [{"strict": True}]
+    assert tiered_evaluator(director, passed, {**options, "judge": None}).success
+    assert tiered_evaluator(director, passed, {"tiers": [{"name": "junit", "junit_xml": "missing.xml"}],
+                                               "judge": None}) is None
+
+
+def write_test_config(directory: Path, **overrides) -> str:
+    """Write a minimal config with one editable file into directory and return its path."""
+    (directory / "app.py").write_text("def add(a, b):\n    return a - b\n")
+    config = {
+        "prompt": "Make add() return the sum of its arguments.",
+        "coder_model": "gpt-4o",
+        "evaluator_model": "gpt-4o",
+        "max_iterations": 3,
+        "execution_command": "pytest test_app.py",
+        "context_editable": ["app.py"],
+        "context_read_only": [],
+        **overrides,
+    }
+    path = directory / "director.yaml"
+    path.write_text(yaml.safe_dump(config))
+    return str(path)
+
+
+def test_run_candidates_forwards_overrides_and_promotes_the_winner(tmp_path, monkeypatch):
+    """Test that candidates get the parent's overrides and the first successful one is promoted."""
+    from types import SimpleNamespace
+    from director_runner import candidate_score
+
+    monkeypatch.chdir(tmp_path)
+    launched = []
+
+    class CandidateQueue(queue.Queue):
+        def close(self):
+            pass
+
+    class CandidateProcess:
+        """Reports straight away instead of coding in a spawned process; candidate 1 succeeds."""
+        def __init__(self, target, args):
+            self.args = args
+            self.exitcode = 0
+
+        def start(self):
+            director_class, index, _, run_dir, _, _, iteration, failing_tests, director_kwargs, results_queue = self.args
+            launched.append((director_class, iteration, failing_tests, director_kwargs))
+            (Path(run_dir) / "app.py").write_text(f"# candidate {index}\n")
+            execution = ExecutionResult(command="pytest", exit_code=1 - index, duration_seconds=0.1)
+            evaluation = EvaluationResult(success=index == 1, feedback=None)
+            results_queue.put(CandidateResult(
+                index=index, execution=execution, evaluation=evaluation,
+                score=candidate_score(execution, evaluation),
+            ).model_dump())
+
+        def is_alive(self):
+            return False
+
+        def join(self, timeout=None):
+            pass
+
+    monkeypatch.setattr(
+        multiprocessing, "get_context",
+        lambda method: SimpleNamespace(Queue=CandidateQueue, Process=CandidateProcess),
+    )
+    director = Director(
+        write_test_config(tmp_path, candidates=3),
+        telemetry=False, failures_first=True, shards=2, log_blob_threshold=4096,
+    )
+    director.iteration = 1
+    director.failing_tests = ["test_app.py::test_add"]
+    try:
+        execution, evaluation = director.run_candidates("Fix add()")
+    finally:
+        director.logger.close()
+
+    assert evaluation.success and execution.exit_code == 0
+    assert (tmp_path / "app.py").read_text() == "# candidate 1\n"
+    assert len(launched) == 3
+    director_class, iteration, failing_tests, director_kwargs = launched[0]
+    assert (director_class, iteration, failing_tests) == (Director, 1, ["test_app.py::test_add"])
+    assert director_kwargs["failures_first"] and director_kwargs["shards"] == 2
+    assert director_kwargs["log_blob_threshold"] == 4096 and not director_kwargs["telemetry"]
+    # Sandboxes are removed once the winner is promoted
+    assert not any((tmp_path / ".director" / "runs" / director.run_id / "candidates-1").iterdir())
+
+
+def test_circuit_breaker_opens_after_consecutive_failures(monkeypatch):
+    """Test that the breaker opens at the threshold and lets one trial call through after the reset."""
+    from director_clients import CircuitBreaker
+
+    now = [100.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=30)
+
+    breaker.record_failure()
+    assert breaker.state == "closed" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+
+    # One trial call after reset_seconds; a failure re-opens immediately
+    now[0] += 30
+    assert breaker.state == "half-open" and breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    now[0] += 30
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+
+def test_client_manager_retries_transient_errors_and_trips_the_breaker():
+    """Test that 5xx responses are retried, Retry-After is honoured and repeated failures open the breaker."""
+    from types import SimpleNamespace
+    from director_clients import LLMClientManager
+
+    import httpx
+    import openai
+
+    def status_error(status: int, headers=None) -> openai.APIStatusError:
+        request = httpx.Request("POST", "https://example.test/chat/completions")
+        response = httpx.Response(status, request=request, headers=headers)
+        return openai.APIStatusError(f"HTTP {status}", response=response, body=None)
+
+    manager = LLMClientManager(max_retries=2, backoff_base=0, failure_threshold=2)
+    try:
+        assert manager.backoff_seconds(0, status_error(429, {"retry-after": "3"})) == 3
+        assert manager.backoff_seconds(0, status_error(429, {"retry-after": "600"})) == manager.backoff_max
+
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise status_error(503)
+            return SimpleNamespace(model="gpt-4o", usage=None)
+
+        assert manager.call("primary", flaky).model == "gpt-4o"
+        stats = manager.stats["primary"]
+        assert (stats.requests, stats.errors, stats.retries) == (3, 2, 2)
+        assert manager.breakers["primary"].state == "closed"
+
+        def rejected():
+            attempts.append(1)
+            raise status_error(400)
+
+        # Client errors are not retried but still count against the endpoint
+        attempts.clear()
+        for _ in range(2):
+            try:
+                manager.call("primary", rejected)
+            except openai.APIStatusError:
+                pass
+        assert len(attempts) == 2
+        assert not manager.is_available("primary")
+        assert manager.stats_summary()[0].startswith("primary [open]")
+    finally:
+        manager.close()
+
+
+def test_checkpoint_resumes_after_the_last_completed_phase(tmp_path, monkeypatch):
+    """Test that a resumed run restores the snapshotted files and skips the phases it already completed."""
+    import pytest
+
+    monkeypatch.chdir(tmp_path)
+    config_path = write_test_config(tmp_path)
+    director = Director(config_path, telemetry=False, eval_cache=False)
+    director.iteration = 1
+    try:
+        director.checkpoint("prompt", prompt="Return a + b")
+        Path("app.py").write_text("def add(a, b):\n    return a + b\n")
+        director.checkpoint("code")
+    finally:
+        director.logger.close()
+    assert director.resume_point() == (0, "code")
+    with pytest.raises(ValueError, match="No checkpoint"):
+        Director.load_checkpoint("missing")
+
+    # The interruption left the file half-edited
+    Path("app.py").write_text("def add(a, b):\n")
+    resumed = Director(config_path, resume=director.run_id, telemetry=False, eval_cache=False)
+    phases = []
+
+    def skipped(*args):
+        raise AssertionError("completed phase was rerun")
+
+    def execute():
+        phases.append("execute")
+        assert Path("app.py").read_text().endswith("return a + b\n")
+        return ExecutionResult(command="pytest test_app.py", exit_code=0, duration_seconds=0.1, tail="1 passed")
+
+    def evaluate(execution):
+        phases.append("evaluate")
+        return EvaluationResult(success=True, feedback=None)
+
+    monkeypatch.setattr(resumed, "get_llm_client", lambda: None)
+    monkeypatch.setattr(resumed, "create_new_ai_coding_prompt", skipped)
+    monkeypatch.setattr(resumed, "ai_code", skipped)
+    monkeypatch.setattr(resumed, "execute", execute)
+    monkeypatch.setattr(resumed, "evaluate", evaluate)
+
+    assert resumed.direct()
+    assert phases == ["execute", "evaluate"]
+    assert resumed.run_id == director.run_id and resumed.iterations_run == 1
+    state = Director.load_checkpoint(director.run_id)
+    assert (state["iteration"], state["phase"]) == (1, "evaluate")
+    assert resumed.resume_point() == (1, None)
+
+
+def test_checkpoint_snapshots_absolute_context_files(tmp_path, monkeypatch):
+    """Test that absolute editable paths, inside or outside the tree, are snapshotted under the run."""
+    outside = tmp_path / "shared" / "settings.py"
+    outside.parent.mkdir()
+    outside.write_text("DEBUG = False\n")
+    project = tmp_path / "project"
+    project.mkdir()
+    monkeypatch.chdir(project)
+    inside = project / "app.py"
+    director = Director(
+        write_test_config(project, context_editable=[str(inside), str(outside)]),
+        telemetry=False, eval_cache=False,
+    )
+    director.iteration = 1
+    try:
+        director.checkpoint("code")
+        snapshot = Path(director.checkpoint_state["files"]["snapshot"])
+        assert (snapshot / "app.py").read_text() == inside.read_text()
+        assert (snapshot / "_absolute" / outside.relative_to(outside.anchor)).read_text() == "DEBUG = False\n"
+
+        original = inside.read_text()
+        inside.write_text("broken\n")
+        outside.write_text("broken\n")
+        director.restore_checkpoint_files()
+    finally:
+        director.logger.close()
+    assert inside.read_text() == original and outside.read_text() == "DEBUG = False\n"
+
+
+def test_split_pytest_command_separates_test_paths(tmp_path, monkeypatch):
+    """Test that only arguments naming existing tests count as paths, not option values."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_app.py").write_text("")
+    (tmp_path / "pytest.ini").write_text("")
+
+    assert split_pytest_command("python app.py") is None
+    assert split_pytest_command("python -m pytest -q -c pytest.ini test_app.py::test_add -k add") == (
+        ["python", "-m", "pytest", "-q", "-c", "pytest.ini", "-k", "add"],
+        ["test_app.py::test_add"],
+    )
+    assert failed_test_ids(
+        "FAILED test_app.py::test_add - assert -1 == 3\n"
+        "ERROR test_app.py::test_setup\n"
+        "FAILED test_app.py::test_add - assert -1 == 3\n"
+    ) == ["test_app.py::test_add", "test_app.py::test_setup"]
+
+
+def test_failures_first_reruns_failing_tests_before_the_full_command(tmp_path, monkeypatch):
+    """Test that the last failures run alone first, and the full command only once they pass."""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_app.py").write_text(
+        "from app import add\n\n\n"
+        "def test_add():\n    assert add(1, 2) == 3\n\n\n"
+        "def test_zero():\n    assert add(0, 0) == 0\n"
+    )
+    command = shlex.join([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "test_app.py"])
+    director = Director(
+        write_test_config(tmp_path, execution_command=command),
+        telemetry=False, eval_cache=False, failures_first=True,
+    )
+    commands = []
+    run_execution = director.run_execution
+
+    def recorded(command, suffix=""):
+        commands.append(command)
+        return run_execution(command, suffix)
+
+    monkeypatch.setattr(director, "run_execution", recorded)
+    try:
+        director.iteration = 1
+        assert director.execute().exit_code == 1
+        assert director.failing_tests == ["test_app.py::test_add"]
+        assert director.failing_tests_command().endswith("no:cacheprovider test_app.py::test_add")
+
+        # Still failing: the full command is skipped
+        director.iteration = 2
+        assert director.execute().exit_code == 1
+        assert commands == [command, director.failing_tests_command()]
+
+        (tmp_path / "app.py").write_text("def add(a, b):\n    return a + b\n")
+        director.iteration = 3
+        result = director.execute()
+    finally:
+        director.logger.close()
+    assert result.exit_code == 0 and director.failing_tests == []
+    assert commands[2:] == [shlex.join(split_pytest_command(command)[0] + ["test_app.py::test_add"]), command]
+
+
+def test_shard_tests_balances_durations_and_keeps_collection_order():
+    """Test that shards get similar total durations, with unknown tests counted at the mean."""
+    node_ids = ["test_a.py::test_1", "test_a.py::test_2", "test_b.py::test_3", "test_b.py::test_4"]
+    durations = {"test_a.py::test_1": 4.0, "test_a.py::test_2": 1.0, "test_b.py::test_3": 3.0}
+
+    # test_4 counts as the mean, 2.67s, and goes onto the shard with 3s
+    assert shard_tests(node_ids, durations, 2) == [
+        ["test_a.py::test_1", "test_a.py::test_2"],
+        ["test_b.py::test_3", "test_b.py::test_4"],
+    ]
+    assert shard_tests(node_ids[:1], {}, 4) == [["test_a.py::test_1"]]
+    assert junit_key("tests/test_app.py::TestAdd::test_sum[1-2]") == ("tests.test_app.TestAdd", "test_sum[1-2]")
+
+
+def test_merge_shard_results_sums_counts_and_bounds_the_output(tmp_path):
+    """Test that merged shards report the first failure and summed counts, keeping only a head and tail."""
+    from director_execution import parse_pytest_summary
+
+    results = []
+    for index, (exit_code, summary) in enumerate([(0, "3 passed in 0.50s"), (1, "1 failed, 2 passed in 0.70s")]):
+        output = f"{'x' * 100}\n{summary}\n"
+        spool_path = tmp_path / f"shard-{index}.log"
+        spool_path.write_text(output)
+        results.append(ExecutionResult(
+            command="pytest", exit_code=exit_code, duration_seconds=0.5, started_at=10.0 + index,
+            peak_rss_bytes=1000, total_bytes=len(output), tail=output, spool_path=str(spool_path),
+        ))
+    shards = [["test_a.py::test_1"] * 3, ["test_b.py::test_1"] * 3]
+
+    merged = merge_shard_results(
+        "pytest", results, shards, 0.8, tmp_path / "merged.log", head_bytes=64, tail_bytes=64
+    )
+    full_output = (tmp_path / "merged.log").read_text()
+    assert (merged.exit_code, merged.started_at, merged.peak_rss_bytes) == (1, 10.0, 2000)
+    assert merged.total_bytes == len(full_output.encode()) and merged.truncated
+    assert full_output.startswith(merged.head) and full_output.endswith(merged.tail)
+    assert len(merged.head) == len(merged.tail) == 64
+    assert merged.tail.endswith("===== 5 passed, 1 failed in 0.80s (2 shards) =====\n")
+    assert parse_pytest_summary(merged.output) == {"failed": 1, "passed": 5}
+
+    small = merge_shard_results("pytest", results, shards, 0.8, tmp_path / "small.log")
+    assert not small.truncated and small.tail == ""
+    assert small.output == (tmp_path / "small.log").read_text()
+
+
+def test_sharded_execution_merges_reports_and_records_durations(tmp_path, monkeypatch):
+    """Test that a sharded run covers every test once, merges the JUnit reports and records durations."""
+    from director_execution import parse_pytest_summary
+
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_app.py").write_text(
+        "".join(f"def test_{index}():\n    assert {index} != 3\n\n\n" for index in range(4))
+    )
+    command = shlex.join([
+        sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "--junitxml", "report.xml", "test_app.py",
+    ])
+    director = Director(
+        write_test_config(tmp_path, execution_command=command), telemetry=False, eval_cache=False, shards=2,
+    )
+    monkeypatch.setattr(director, "TEST_DURATIONS", tmp_path / "durations.json")
+    director.iteration = 1
+    try:
+        result = director.execute()
+    finally:
+        director.logger.close()
+
+    assert result.exit_code == 1 and "(2 shards)" in result.output
+    assert parse_pytest_summary(result.output) == {"failed": 1, "passed": 3}
+    assert director.failing_tests == ["test_app.py::test_3"]
+    testcases = ET.parse(tmp_path / "report.xml").getroot().iter("testcase")
+    assert sorted(testcase.get("name") for testcase in testcases) == [f"test_{index}" for index in range(4)]
+    durations = json.loads((tmp_path / "durations.json").read_text())
+    assert sorted(durations) == [f"test_app.py::test_{index}" for index in range(4)]
+
+
+def test_deterministic_evaluator_runs_without_evaluator_credentials(tmp_path, monkeypatch):
+    """Test that a run judged by exit code never builds the LLM client, so needs no API key."""
+    for key in ("OPENAI_API_KEY", "AZURE_OPENAI_API_KEY", "AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_VERSION"):
+        monkeypatch.delenv(key, raising=False)
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "test_app.py").write_text("from app import add\n\n\ndef test_add():\n    assert add(1, 2) == 3\n")
+    command = shlex.join([sys.executable, "-m", "pytest", "-q", "-p", "no:cacheprovider", "test_app.py"])
+    director = Director(
+        write_test_config(tmp_path, execution_command=command, evaluator="exit_code"),
+        telemetry=False, eval_cache=False,
+    )
+
+    def ai_code(prompt):
+        (tmp_path / "app.py").write_text("def add(a, b):\n    return a + b\n")
+
+    monkeypatch.setattr(director, "ai_code", ai_code)
+    assert not director.evaluator_uses_judge()
+    assert director.direct()
+    assert director.llm_client is None and director.iterations_run == 1
+
+    director.config.evaluator = "tiered"
+    assert director.evaluator_uses_judge()
+    director.config.evaluator_options = {"tiers": ["exit_code"], "judge": None}
+    assert not director.evaluator_uses_judge()
+
+
+def init_test_repo(directory: Path) -> str:
+    """Commit a config and app into a new git repository in directory and return the config path."""
+    config_path = write_test_config(directory, context_read_only=["notes.md"])
+    (directory / ".gitignore").write_text(".env\n.director/\n")
+    (directory / "notes.md").write_text("committed\n")
+    for command in (["init", "-q"], ["add", "-A"], ["-c", "user.name=test", "-c", "user.email=test@example.com",
+                                                   "commit", "-q", "-m", "init"]):
+        subprocess.run(["git", "-C", str(directory)] + command, check=True)
+    return config_path
+
+
+def test_worktree_workspace_carries_uncommitted_files(tmp_path, monkeypatch):
+    """Test that a worktree gets uncommitted and untracked files but not ignored ones, and is unregistered."""
+    monkeypatch.chdir(tmp_path)
+    config_path = init_test_repo(tmp_path)
+    (tmp_path / "notes.md").write_text("edited\n")
+    (tmp_path / "test_app.py").write_text("# untracked\n")
+    (tmp_path / ".env").write_text("SECRET=1\n")
+    workspace = tmp_path / ".director" / "workspaces" / "00-director"
+
+    run_dir = prepare_workspace(workspace, "worktree", Director.workspace_files(config_path))
+    assert (run_dir / "notes.md").read_text() == "edited\n"
+    assert (run_dir / "test_app.py").exists() and not (run_dir / ".env").exists()
+
+    remove_workspace(workspace)
+    worktrees = subprocess.run(["git", "worktree", "list"], capture_output=True, text=True, check=True).stdout
+    assert not workspace.exists() and str(workspace) not in worktrees
+
+
+def test_run_many_removes_workspaces_and_keeps_their_logs(tmp_path, monkeypatch):
+    """Test that each workspace is removed once its result is in, with its logs moved out first."""
+    import director_runner
+    from director_runner import RunResult
+
+    monkeypatch.chdir(tmp_path)
+    config_path = init_test_repo(tmp_path)
+
+    def run_isolated(director_class, config_path, run_dir, director_kwargs):
+        log_file = Path(run_dir) / director_kwargs["log_file"]
+        log_file.write_text("{}\n")
+        (Path(run_dir) / "director_console.txt").write_text("console\n")
+        return RunResult(config=config_path, success=True, iterations=1, duration_seconds=0.1,
+                         workspace=run_dir, log_file=str(log_file))
+
+    monkeypatch.setattr(director_runner, "run_isolated", run_isolated)
+    monkeypatch.setattr(
+        director_runner, "ProcessPoolExecutor", lambda max_workers, **kwargs: ThreadPoolExecutor(max_workers)
+    )
+
+    results = run_many(Director, [config_path, "missing.yaml"], 2, log_file="director_log.jsonl")
+    assert [result.success for result in results] == [True, False]
+    assert "Workspace setup failed" in results[1].error
+    assert Path(results[0].log_file).read_text() == "{}\n"
+    assert (Path(results[0].workspace) / "director_console.txt").exists()
+    batch_root = Path(results[0].workspace).parent.parent
+    assert sorted(path.name for path in batch_root.iterdir()) == ["logs"]
+    worktrees = subprocess.run(["git", "worktree", "list"], capture_output=True, text=True, check=True).stdout
+    assert len(worktrees.splitlines()) == 1
+
+    kept = run_many(Director, [config_path], 1, keep_workspaces=True, log_file="director_log.jsonl")
+    assert Path(kept[0].workspace, "director_log.jsonl").exists()
+    remove_workspace(Path(kept[0].workspace))
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
-        description="Run the AI Coding Director with a config file"
+        description="Run the AI Coding Director with one or more config files"
     )
     parser.add_argument(
         "--config",
         type=str,
-        default="specs/basic.yaml",
-        help="Path to the YAML config file",
+        nargs="+",
+        default=["specs/basic.yaml"],
+        help="Path(s) or glob(s) of YAML config files",
+    )
+    parser.add_argument(
+        "--parallel",
+        "-j",
+        type=int,
+        default=None,
+        help="Number of configs to run concurrently (default: number of configs, capped at CPU count)",
+    )
+    parser.add_argument(
+        "--isolation",
+        choices=["auto", "worktree", "copy"],
+        default="auto",
+        help="How to isolate concurrent runs: git worktree or a plain copy (default: auto)",
+    )
+    parser.add_argument(
+        "--workspace-root",
+        type=str,
+        default=".director/workspaces",
+        help="Directory where per-run workspaces are created",
+    )
+    parser.add_argument(
+        "--keep-workspaces",
+        action="store_true",
+        help="Keep each run's workspace for inspection instead of removing it once the run finishes",
+    )
+    parser.add_argument(
+        "--no-eval-cache",
+        action="store_true",
+        help="Always call the evaluator model instead of reusing cached judgments",
+    )
+    parser.add_argument(
+        "--coder-session",
+        action="store_true",
+        help="Create the aider coder once per run and reuse it across iterations",
+    )
+    parser.add_argument(
+        "--failures-first",
+        action="store_true",
+        help="Rerun the tests that failed last iteration first, and the full pytest command only once they pass",
+    )
+    parser.add_argument(
+        "--shards",
+        type=int,
+        default=None,
+        help="Split a pytest execution command into this many parallel shards (overrides the config)",
+    )
+    parser.add_argument(
+        "--log-file",
+        type=str,
+        default="director_log.jsonl",
+        help="Structured JSONL log file (per workspace when running multiple configs)",
+    )
+    parser.add_argument(
+        "--log-blob-threshold",
+        type=int,
+        default=0,
+        help="Store log payloads larger than this many bytes in a compressed blob file (0 keeps them inline)",
+    )
+    parser.add_argument(
+        "--candidates",
+        type=int,
+        default=None,
+        help="Race this many coder candidates per iteration in separate sandboxes (overrides the config)",
+    )
+    parser.add_argument(
+        "--cassette",
+        type=str,
+        default=os.getenv("LLM_CASSETTE"),
+        help="Record model calls to, or replay them from, this cassette file (default: $LLM_CASSETTE)",
+    )
+    parser.add_argument(
+        "--cassette-mode",
+        choices=Cassette.MODES,
+        default=os.getenv("LLM_CASSETTE_MODE", "auto"),
+        help="record: always call the models; replay: serve only recorded responses, offline; "
+        "auto: replay when recorded, otherwise record (default)",
+    )
+    parser.add_argument(
+        "--no-telemetry",
+        action="store_true",
+        help="Do not write model-call and phase spans to .director/runs/<run_id>/",
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        metavar="RUN_ID",
+        help="Continue an interrupted run from its last completed phase (its config is taken from the checkpoint)",
+    )
+    parser.add_argument(
+        "--validate-only",
+        action="store_true",
+        help="Validate the config files and exit without running them",
     )
     args = parser.parse_args()
-    director = Director(args.config)
-    director.direct()
+
+    config_paths = expand_config_paths(args.config)
+    if args.validate_only:
+        sys.exit(validate_configs(config_paths))
+
+    director_kwargs = dict(
+        log_file=args.log_file,
+        log_blob_threshold=args.log_blob_threshold,
+        eval_cache=not args.no_eval_cache,
+        coder_session=args.coder_session,
+        failures_first=args.failures_first,
+        shards=args.shards,
+        candidates=args.candidates,
+        cassette=args.cassette,
+        cassette_mode=args.cassette_mode,
+        telemetry=not args.no_telemetry,
+    )
+    if args.resume:
+        config_path = Director.load_checkpoint(args.resume)["config_path"]
+        director = Director(config_path, resume=args.resume, **director_kwargs)
+        director.direct()
+    elif len(config_paths) == 1:
+        director = Director(config_paths[0], **director_kwargs)
+        director.direct()
+    else:
+        max_workers = args.parallel or min(len(config_paths), os.cpu_count() or 1)
+        results = run_many(
+            Director,
+            config_paths,
+            max_workers,
+            args.isolation,
+            args.workspace_root,
+            args.keep_workspaces,
+            **director_kwargs,
+        )
+        print_run_summary(results)
+        sys.exit(0 if all(result.success for result in results) else 1)
@@ -0,0 +1,102 @@
+"""
+Evaluation cache for the Director
+
+Keeps LLM judge verdicts on disk, keyed by the normalized evaluation prompt, so
+a rerun whose output only differs in timings skips the model call.
+"""
+
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+from agents.cassettes import normalize_text
+from director_evaluators import EvaluationResult
+
+
+class EvaluationCache:
+    """
+    On-disk, content-addressed cache of evaluation results.
+
+    Entries are keyed by a hash of the normalized evaluation prompt and the
+    evaluator model, expire after a TTL and are evicted least-recently-used
+    first once the cache grows past max_bytes.
+    """
+
+    # Bump to invalidate every existing entry when the entry format changes
+    VERSION = 1
+
+    def __init__(self, cache_dir: Path, ttl_seconds: int, max_bytes: int):
+        self.cache_dir = Path(cache_dir).resolve()
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Normalize line endings, trailing whitespace, test timings and spool paths."""
+        return normalize_text(text)
+
+    @classmethod
+    def make_key(cls, evaluator_model: str, evaluation_prompt: str) -> str:
+        payload = json.dumps(
+            [cls.VERSION, evaluator_model, cls.normalize(evaluation_prompt)]
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[EvaluationResult]:
+        path = self._path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+
+        if time.time() - entry["created_at"] > self.ttl_seconds:
+            path.unlink(missing_ok=True)
+            self.misses += 1
+            return None
+
+        # Touch the entry so eviction sees it as recently used
+        os.utime(path)
+        self.hits += 1
+        return EvaluationResult(**entry["evaluation"])
+
+    def put(self, key: str, evaluator_model: str, evaluation: EvaluationResult):
+        entry = {
+            "created_at": time.time(),
+            "evaluator_model": evaluator_model,
+            "evaluation": evaluation.model_dump(),
+        }
+        tmp_path = self._path(key).with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps(entry), encoding="utf-8")
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Drop expired entries, then least-recently-used ones until under max_bytes."""
+        now = time.time()
+        entries = []
+        for path in self.cache_dir.glob("*.json"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if now - stat.st_mtime > self.ttl_seconds:
+                path.unlink(missing_ok=True)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
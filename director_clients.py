@@ -0,0 +1,378 @@
+"""
+Model clients for the Director
+
+The evaluator's OpenAI clients share one connection pool and retry transient
+errors behind a circuit breaker per endpoint. The cassette hooks route the
+evaluator's and aider's model calls through the active cassette and record
+them as telemetry spans.
+"""
+
+import atexit
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, TYPE_CHECKING
+
+from agents.cassettes import Cassette, CassetteMiss
+from agents.telemetry import Telemetry, add_usage, get_telemetry, trace
+
+# openai takes over a second to import, so it is loaded on first use
+if TYPE_CHECKING:
+    from openai import OpenAI, AzureOpenAI
+
+
+_cassette: Optional[Cassette] = None
+
+
+def use_cassette(path: Optional[str], mode: str = "auto") -> Optional[Cassette]:
+    """Route this process's evaluator and coder model calls through a cassette; None turns it off."""
+    global _cassette
+    if _cassette is not None:
+        _cassette.save_index()
+    _cassette = Cassette(Path(path), mode) if path else None
+    if _cassette is not None:
+        atexit.register(_cassette.save_index)
+    return _cassette
+
+
+def get_cassette() -> Optional[Cassette]:
+    """Return the active cassette, if any (LLM_CASSETTE / LLM_CASSETTE_MODE set the default)."""
+    global _cassette
+    if _cassette is None and os.getenv("LLM_CASSETTE"):
+        use_cassette(os.environ["LLM_CASSETTE"], os.getenv("LLM_CASSETTE_MODE", "auto"))
+    return _cassette
+
+
+def cassette_transport(transport):
+    """Wrap an httpx transport so POSTs are served from or recorded to the active cassette."""
+    import httpx
+
+    class CassetteTransport(httpx.BaseTransport):
+        def handle_request(self, request: httpx.Request) -> httpx.Response:
+            cassette = get_cassette()
+            if cassette is None or request.method != "POST":
+                return transport.handle_request(request)
+
+            def call():
+                response = transport.handle_request(request)
+                response.read()
+                return response
+
+            def dump(response):
+                # Errors aren't recorded, so a replay never serves a stale 429
+                if response.status_code >= 400:
+                    return None
+                return {
+                    "status": response.status_code,
+                    "content_type": response.headers.get("content-type"),
+                    "body": response.content.decode("utf-8"),
+                }
+
+            def load(data):
+                return httpx.Response(
+                    data["status"],
+                    headers={"content-type": data["content_type"] or "application/json"},
+                    content=data["body"].encode("utf-8"),
+                    request=request,
+                )
+
+            # The host is left out of the key so replays don't depend on the endpoint configured
+            body = json.loads(request.content or b"{}")
+            return cassette.play("http", {"path": request.url.path, **body}, call, dump, load)
+
+        def close(self):
+            transport.close()
+
+    return CassetteTransport()
+
+
+def record_litellm_completions():
+    """
+    Route aider's litellm.completion calls through the active cassette (non-streaming
+    only) and record each one as a telemetry span.
+    """
+    from aider.llm import litellm
+
+    if getattr(litellm, "cassette_completion", None):
+        return
+    completion = litellm.completion
+
+    def play(**kwargs):
+        cassette = get_cassette()
+        if cassette is None or kwargs.get("stream"):
+            return completion(**kwargs)
+        return cassette.play(
+            "litellm",
+            kwargs,
+            lambda: completion(**kwargs),
+            dump=lambda response: response.model_dump(),
+            load=lambda data: litellm.ModelResponse(**data),
+        )
+
+    def cassette_completion(**kwargs):
+        telemetry = get_telemetry()
+        if telemetry is None:
+            return play(**kwargs)
+        span = telemetry.start("llm", "coder", model=kwargs.get("model"), stream=bool(kwargs.get("stream")))
+        try:
+            response = play(**kwargs)
+        except BaseException as e:
+            span["error"] = type(e).__name__
+            telemetry.finish(span)
+            raise
+        if kwargs.get("stream"):
+            # The span ends when aider has read the whole stream
+            def estimate(text: str) -> Dict[str, int]:
+                return {
+                    "prompt_tokens": litellm.token_counter(model=kwargs["model"], messages=kwargs["messages"]),
+                    "completion_tokens": litellm.token_counter(model=kwargs["model"], text=text),
+                }
+
+            return TracedStream(response, span, telemetry, estimate)
+        add_usage(span, getattr(response, "usage", None))
+        telemetry.finish(span)
+        return response
+
+    litellm.cassette_completion = cassette_completion
+    litellm.completion = cassette_completion
+
+
+class TracedStream:
+    """
+    A streamed completion whose telemetry span ends once the stream has been read.
+
+    Streams only carry usage when the request asks for it, so otherwise the
+    tokens are counted locally by estimate(text) and the span is marked estimated.
+    """
+
+    def __init__(self, stream, span: Dict[str, Any], telemetry: Telemetry, estimate: Callable[[str], Dict[str, int]]):
+        self.stream = stream
+        self.span = span
+        self.telemetry = telemetry
+        self.estimate = estimate
+
+    def __iter__(self):
+        text = []
+        try:
+            for chunk in self.stream:
+                add_usage(self.span, getattr(chunk, "usage", None))
+                if chunk.choices and getattr(chunk.choices[0].delta, "content", None):
+                    text.append(chunk.choices[0].delta.content)
+                yield chunk
+        except Exception as e:
+            self.span["error"] = type(e).__name__
+            raise
+        finally:
+            if "prompt_tokens" not in self.span:
+                try:
+                    add_usage(self.span, self.estimate("".join(text)))
+                    self.span["estimated"] = True
+                except Exception:
+                    pass
+            self.telemetry.finish(self.span)
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker. While open, calls are rejected until
+    reset_seconds have passed; then a single trial call is let through.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_seconds: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        return self.state != "open"
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold or self.state == "half-open":
+            self.opened_at = time.monotonic()
+
+
+class EndpointStats:
+    """Request, error and latency counters for one model endpoint."""
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.latencies = deque(maxlen=1000)
+
+    def summary(self) -> str:
+        if not self.latencies:
+            return f"{self.requests} requests, {self.errors} errors, {self.retries} retries"
+        latencies = sorted(self.latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        return (
+            f"{self.requests} requests, {self.errors} errors, {self.retries} retries, "
+            f"latency p50 {statistics.median(latencies):.2f}s p95 {p95:.2f}s max {latencies[-1]:.2f}s"
+        )
+
+
+class LLMClientManager:
+    """
+    Process-wide manager for evaluator clients.
+
+    All clients share one keep-alive HTTP connection pool. Calls made through
+    call() are retried with jittered exponential backoff on 429/5xx and
+    connection errors, and each endpoint has a circuit breaker so callers can
+    route straight to a fallback while it keeps failing.
+    """
+
+    RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        max_retries: int = 4,
+        backoff_base: float = 0.5,
+        backoff_max: float = 20.0,
+        failure_threshold: int = 3,
+        reset_seconds: float = 60.0,
+    ):
+        import httpx
+        import openai
+
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.http_client = openai.DefaultHttpxClient(
+            transport=cassette_transport(httpx.HTTPTransport(
+                limits=httpx.Limits(max_connections=32, max_keepalive_connections=8, keepalive_expiry=120),
+            )),
+        )
+        self.clients: Dict[str, Any] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.stats: Dict[str, EndpointStats] = {}
+        self.lock = threading.Lock()
+
+    def azure_client(self, endpoint: str, api_version: str, api_key: str, deployment: str) -> "AzureOpenAI":
+        from openai import AzureOpenAI
+
+        key = f"azure:{endpoint}{deployment}"
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = AzureOpenAI(
+                    api_version=api_version,
+                    azure_endpoint=endpoint,
+                    api_key=api_key,
+                    azure_deployment=deployment,
+                    http_client=self.http_client,
+                    max_retries=0,
+                )
+            return self.clients[key]
+
+    def openai_client(self) -> "OpenAI":
+        from openai import OpenAI
+
+        key = "openai"
+        with self.lock:
+            if key not in self.clients:
+                self.clients[key] = OpenAI(http_client=self.http_client, max_retries=0)
+            return self.clients[key]
+
+    def breaker(self, endpoint: str) -> CircuitBreaker:
+        with self.lock:
+            if endpoint not in self.breakers:
+                self.breakers[endpoint] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+                self.stats[endpoint] = EndpointStats()
+            return self.breakers[endpoint]
+
+    def is_available(self, endpoint: str) -> bool:
+        return self.breaker(endpoint).allow()
+
+    def is_retryable(self, error: Exception) -> bool:
+        import openai
+
+        if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code in self.RETRYABLE_STATUS or error.status_code >= 500
+        return False
+
+    def backoff_seconds(self, attempt: int, error: Exception) -> float:
+        # Honour Retry-After when the service sends one, otherwise full jitter
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, endpoint: str, request: Callable[[], Any]) -> Any:
+        """Run request() against endpoint with retries, updating stats, the breaker and telemetry."""
+        breaker = self.breaker(endpoint)
+        stats = self.stats[endpoint]
+        with trace("llm", endpoint) as span:
+            for attempt in range(self.max_retries + 1):
+                start = time.perf_counter()
+                stats.requests += 1
+                try:
+                    result = request()
+                except Exception as e:
+                    if isinstance(e.__cause__, CassetteMiss):
+                        # Not a service failure: openai wraps transport errors as connection errors
+                        stats.requests -= 1
+                        raise e.__cause__
+                    stats.errors += 1
+                    if not self.is_retryable(e) or attempt == self.max_retries:
+                        if self.is_retryable(e) or hasattr(e, "status_code"):
+                            breaker.record_failure()
+                        raise
+                    stats.retries += 1
+                    time.sleep(self.backoff_seconds(attempt, e))
+                    continue
+                stats.latencies.append(time.perf_counter() - start)
+                breaker.record_success()
+                span.update(model=getattr(result, "model", None), attempts=attempt + 1)
+                add_usage(span, getattr(result, "usage", None))
+                return result
+
+    def stats_summary(self) -> List[str]:
+        return [
+            f"{endpoint} [{self.breakers[endpoint].state}]: {stats.summary()}"
+            for endpoint, stats in self.stats.items()
+            if stats.requests
+        ]
+
+    def close(self):
+        self.http_client.close()
+
+
+_client_manager: Optional[LLMClientManager] = None
+
+
+def get_client_manager() -> LLMClientManager:
+    """Return this process's LLMClientManager, creating it on first use."""
+    global _client_manager
+    if _client_manager is None:
+        _client_manager = LLMClientManager()
+        atexit.register(_client_manager.close)
+    return _client_manager
@@ -0,0 +1,229 @@
+"""
+Evaluators for the Director
+
+An evaluator turns an execution result into a verdict, or None when it cannot
+decide. "default" asks the LLM judge; the others decide from the exit code, a
+JUnit report, the output or JSON, and "tiered" runs cheap checks before the
+judge. Register more with @register_evaluator.
+"""
+
+import json
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Union, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from director_execution import ExecutionResult, failed_test_ids
+
+if TYPE_CHECKING:
+    from director import Director
+
+
+class EvaluationResult(BaseModel):
+    success: bool
+    feedback: Optional[str]
+
+
+# An evaluator returns a verdict, or None when it cannot decide on its own
+Evaluator = Callable[["Director", ExecutionResult, Dict[str, Any]], Optional[EvaluationResult]]
+
+EVALUATORS: Dict[str, Evaluator] = {}
+
+
+def register_evaluator(*names: str):
+    """Register an evaluator function under one or more names."""
+    def decorator(fn: Evaluator) -> Evaluator:
+        for name in names:
+            EVALUATORS[name] = fn
+        return fn
+    return decorator
+
+
+def evaluator_spec(spec: Union[str, Dict[str, Any]]) -> tuple:
+    """Split a tier entry ("exit_code" or {"name": "junit", ...}) into name and options."""
+    if isinstance(spec, str):
+        return spec, {}
+    options = dict(spec)
+    return options.pop("name"), options
+
+
+@register_evaluator("default", "llm")
+def llm_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """The LLM-as-a-judge evaluator."""
+    return director.llm_evaluate(execution)
+
+
+def failure_details(execution: ExecutionResult, max_bytes: int = 4000) -> str:
+    """The failing pytest node ids, if any, and the last max_bytes of the output."""
+    output = execution.output
+    details = []
+    failed = failed_test_ids(output)
+    if failed:
+        details.append("Failing tests:\n" + "\n".join(f"- {node_id}" for node_id in failed))
+    excerpt = output.encode("utf-8")[-max_bytes:].decode("utf-8", errors="ignore").strip()
+    if excerpt:
+        details.append(f"Output (last {max_bytes} bytes):\n{excerpt}")
+    return "\n\n".join(details)
+
+
+@register_evaluator("exit_code")
+def exit_code_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """Pass when the command exited with one of success_codes (default [0]) in time."""
+    success_codes = options.get("success_codes", [0])
+    output_bytes = options.get("output_bytes", 4000)
+    if execution.timed_out:
+        return EvaluationResult(
+            success=False,
+            feedback=f"The execution command timed out after {execution.duration_seconds:.0f}s. "
+                     f"Look for hangs, infinite loops or blocking calls.\n\n"
+                     f"{failure_details(execution, output_bytes)}",
+        )
+    if execution.exit_code in success_codes:
+        return EvaluationResult(success=True, feedback=None)
+    return EvaluationResult(
+        success=False,
+        feedback=f"The execution command exited with code {execution.exit_code}.\n\n"
+                 f"{failure_details(execution, output_bytes)}",
+    )
+
+
+@register_evaluator("junit")
+def junit_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """
+    Judge from a JUnit XML report (e.g. pytest --junitxml=<junit_xml>).
+    Undecided when the report is missing, stale or contains no tests.
+    """
+    report = Path(options.get("junit_xml", "junit.xml"))
+    try:
+        if report.stat().st_mtime < execution.started_at:
+            return None
+        root = ET.parse(report).getroot()
+    except (OSError, ET.ParseError):
+        return None
+
+    max_failures = options.get("max_failures", 10)
+    total = 0
+    failures = []
+    for testcase in root.iter("testcase"):
+        total += 1
+        for problem in testcase:
+            if problem.tag in ("failure", "error"):
+                node_id = "::".join(filter(None, [testcase.get("classname"), testcase.get("name")]))
+                detail = (problem.text or "").strip()
+                failures.append(
+                    f"- {node_id} ({problem.tag}): {problem.get('message', '')}\n{detail[-1500:]}"
+                )
+                break
+
+    if total == 0:
+        return None
+    if not failures:
+        return EvaluationResult(success=True, feedback=None)
+
+    shown = "\n\n".join(failures[:max_failures])
+    more = f"\n\n... and {len(failures) - max_failures} more" if len(failures) > max_failures else ""
+    return EvaluationResult(
+        success=False,
+        feedback=f"{len(failures)} of {total} tests failed. Fix these failures:\n\n{shown}{more}",
+    )
+
+
+@register_evaluator("regex")
+def regex_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """Pass when every must_match pattern and no must_not_match pattern occurs in the output."""
+    output = execution.output
+    problems = [
+        f"- Expected output to match: {pattern}"
+        for pattern in options.get("must_match", [])
+        if not re.search(pattern, output, re.M)
+    ] + [
+        f"- Expected output not to match: {pattern}"
+        for pattern in options.get("must_not_match", [])
+        if re.search(pattern, output, re.M)
+    ]
+    if problems:
+        return EvaluationResult(
+            success=False,
+            feedback="The execution output did not meet these checks:\n" + "\n".join(problems),
+        )
+    return EvaluationResult(success=True, feedback=None)
+
+
+def json_path_lookup(data: Any, path: str) -> Any:
+    """Resolve a dotted path like "solution.Monday.0"; raises KeyError when missing."""
+    for part in filter(None, path.split(".")):
+        if isinstance(data, list):
+            try:
+                data = data[int(part)]
+            except (ValueError, IndexError):
+                raise KeyError(path)
+        elif isinstance(data, dict) and part in data:
+            data = data[part]
+        else:
+            raise KeyError(path)
+    return data
+
+
+@register_evaluator("json")
+def json_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """
+    Check assertions against JSON read from options["file"], or from the
+    execution output when no file is given. Each assertion has a "path" and
+    one of "equals", "length" or "exists".
+    """
+    try:
+        if options.get("file"):
+            data = json.loads(Path(options["file"]).read_text())
+        else:
+            data = json.loads(execution.output)
+    except (OSError, ValueError) as e:
+        return EvaluationResult(success=False, feedback=f"Expected valid JSON output: {e}")
+
+    problems = []
+    for assertion in options.get("assertions", []):
+        path = assertion["path"]
+        try:
+            value = json_path_lookup(data, path)
+        except KeyError:
+            if assertion.get("exists", True):
+                problems.append(f"- Missing {path}")
+            continue
+        if "equals" in assertion and value != assertion["equals"]:
+            problems.append(f"- {path} is {value!r}, expected {assertion['equals']!r}")
+        if "length" in assertion and (not hasattr(value, "__len__") or len(value) != assertion["length"]):
+            problems.append(f"- {path} should have length {assertion['length']}")
+        if assertion.get("exists") is False:
+            problems.append(f"- {path} should not be present")
+
+    if problems:
+        return EvaluationResult(
+            success=False,
+            feedback="The JSON output did not meet these checks:\n" + "\n".join(problems),
+        )
+    return EvaluationResult(success=True, feedback=None)
+
+
+@register_evaluator("tiered")
+def tiered_evaluator(director: "Director", execution: ExecutionResult, options: Dict[str, Any]) -> Optional[EvaluationResult]:
+    """
+    Run cheap deterministic tiers in order and stop at the first failure.
+    The judge (default: the LLM) only runs when every tier passed or could not
+    decide. Set judge to null to accept the tiers' verdict without an LLM call.
+    """
+    decided = False
+    for tier in options.get("tiers", ["exit_code"]):
+        name, tier_options = evaluator_spec(tier)
+        evaluation = EVALUATORS[name](director, execution, tier_options)
+        if evaluation is None:
+            continue
+        decided = True
+        if not evaluation.success:
+            director.file_log(f"⚡ Tier '{name}' failed, skipping the LLM judge")
+            return evaluation
+
+    judge = options.get("judge", "llm")
+    if judge is None:
+        return EvaluationResult(success=True, feedback=None) if decided else None
+    return EVALUATORS[judge](director, execution, options.get("judge_options", {}))
@@ -0,0 +1,414 @@
+"""
+Execution of the Director's test command
+
+Runs the execution command with bounded in-memory output and a timeout, and
+splits pytest commands into duration-balanced shards whose results are merged
+back into one.
+"""
+
+import heapq
+import os
+import re
+import shlex
+import shutil
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+
+class ExecutionResult(BaseModel):
+    """Outcome of running the execution command, with bounded output."""
+    command: str
+    exit_code: Optional[int]
+    duration_seconds: float
+    started_at: float = 0.0
+    peak_rss_bytes: Optional[int] = None
+    timed_out: bool = False
+    total_bytes: int = 0
+    head: str = ""
+    tail: str = ""
+    spool_path: Optional[str] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.total_bytes > len(self.head.encode("utf-8")) + len(self.tail.encode("utf-8"))
+
+    @property
+    def output(self) -> str:
+        """Combined stdout/stderr, with the middle elided when it exceeded the in-memory bounds."""
+        if not self.truncated:
+            return self.head + self.tail
+        omitted = self.total_bytes - len(self.head.encode("utf-8")) - len(self.tail.encode("utf-8"))
+        return (
+            f"{self.head}\n... [{omitted} bytes omitted, full output in {self.spool_path}] ...\n{self.tail}"
+        )
+
+    def summary(self) -> str:
+        lines = [
+            f"- Exit code: {self.exit_code}",
+            f"- Duration: {self.duration_seconds:.2f}s",
+        ]
+        if self.peak_rss_bytes is not None:
+            lines.append(f"- Peak memory (RSS): {self.peak_rss_bytes / (1024 * 1024):.1f} MB")
+        if self.timed_out:
+            lines.append("- Timed out: the command was killed after exceeding the time limit")
+        return "\n".join(lines)
+
+
+PYTEST_SUMMARY_COUNT = re.compile(r"(\d+) (passed|failed|errors?|skipped|xfailed|xpassed)\b")
+
+
+def parse_pytest_summary(output: str) -> Optional[Dict[str, int]]:
+    """Parse the counts from pytest's final "N failed, M passed in 1.2s" line."""
+    for line in reversed(output.strip().splitlines()):
+        if not re.search(r"\bin \d+(?:\.\d+)?s\b", line):
+            continue
+        counts = {}
+        for number, outcome in PYTEST_SUMMARY_COUNT.findall(line):
+            outcome = "error" if outcome.startswith("error") else outcome
+            counts[outcome] = counts.get(outcome, 0) + int(number)
+        if counts:
+            return counts
+    return None
+
+
+PYTEST_FAILED_LINE = re.compile(r"^(?:FAILED|ERROR) (\S+)", re.M)
+# pytest options whose value is a separate argument that may name an existing path
+PYTEST_VALUE_OPTIONS = {
+    "-c", "-k", "-m", "-o", "-p", "--rootdir", "--basetemp", "--confcutdir", "--ignore",
+    "--ignore-glob", "--deselect", "--junitxml", "--junit-xml", "--cov", "--cov-report",
+    "--log-file", "--durations", "--tb", "--maxfail",
+}
+
+
+def failed_test_ids(output: str) -> List[str]:
+    """Node ids from the FAILED/ERROR lines of pytest's short test summary, in order."""
+    return list(dict.fromkeys(PYTEST_FAILED_LINE.findall(output)))
+
+
+def split_pytest_command(command: str) -> Optional[Tuple[List[str], List[str]]]:
+    """
+    Split a pytest command line into its arguments without the test paths, and
+    the test paths (files, directories or node ids that exist on disk).
+    None when the command does not run pytest.
+    """
+    argv = shlex.split(command)
+    for index, arg in enumerate(argv):
+        if Path(arg).name in ("pytest", "py.test"):
+            break
+    else:
+        return None
+
+    args, paths = argv[:index + 1], []
+    takes_value = False
+    for arg in argv[index + 1:]:
+        if not takes_value and not arg.startswith("-") and Path(arg.split("::")[0]).exists():
+            paths.append(arg)
+        else:
+            args.append(arg)
+        takes_value = arg in PYTEST_VALUE_OPTIONS
+    return args, paths
+
+
+def pytest_option_value(args: List[str], option: str) -> Optional[str]:
+    """The value of a pytest option given as "--opt value" or "--opt=value"."""
+    for index, arg in enumerate(args):
+        if arg == option and index + 1 < len(args):
+            return args[index + 1]
+        if arg.startswith(option + "="):
+            return arg[len(option) + 1:]
+    return None
+
+
+def without_pytest_options(args: List[str], options: set, takes_value: bool = False) -> List[str]:
+    """Drop options (and their separate values when takes_value) from a pytest argument list."""
+    kept = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in options:
+            skip = takes_value
+        elif not any(arg.startswith(option + "=") for option in options):
+            kept.append(arg)
+    return kept
+
+
+def collect_pytest_ids(args: List[str], timeout: Optional[float] = None) -> Optional[List[str]]:
+    """Node ids pytest would run for these arguments, or None when collection fails."""
+    args = without_pytest_options(args, {"--junitxml", "--junit-xml"}, takes_value=True)
+    args = [arg for arg in args if not re.fullmatch(r"-[qv]+|--quiet|--verbose", arg)]
+    try:
+        result = subprocess.run(
+            args + ["--collect-only", "-q"], capture_output=True, text=True, timeout=timeout
+        )
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return [line for line in result.stdout.splitlines() if "::" in line and not line.startswith(" ")]
+
+
+def shard_tests(node_ids: List[str], durations: Dict[str, float], shards: int) -> List[List[str]]:
+    """
+    Split node ids into at most shards groups of similar total duration, longest
+    test first onto the least-loaded shard. Tests without a recorded duration
+    count as the mean of the known ones. Each shard keeps the collection order.
+    """
+    known = [durations[node_id] for node_id in node_ids if node_id in durations]
+    default = statistics.fmean(known) if known else 1.0
+    order = {node_id: index for index, node_id in enumerate(node_ids)}
+    heap = [(0.0, index, []) for index in range(min(shards, len(node_ids)))]
+    for node_id in sorted(node_ids, key=lambda node_id: durations.get(node_id, default), reverse=True):
+        load, index, tests = heapq.heappop(heap)
+        tests.append(node_id)
+        heapq.heappush(heap, (load + durations.get(node_id, default), index, tests))
+    return [sorted(tests, key=order.get) for _, _, tests in sorted(heap, key=lambda item: item[1])]
+
+
+def junit_key(node_id: str) -> Tuple[str, str]:
+    """The (classname, name) pytest writes to JUnit XML for a node id."""
+    parts = node_id.split("::")
+    module = re.sub(r"\.py$", "", parts[0]).replace("/", ".")
+    return ".".join([module] + parts[1:-1]), parts[-1]
+
+
+def merge_junit_reports(reports: List[Path], path: Path):
+    """Write the test suites of several JUnit XML reports into one report."""
+    merged = ET.Element("testsuites")
+    for report in reports:
+        try:
+            root = ET.parse(report).getroot()
+        except (OSError, ET.ParseError):
+            continue
+        merged.extend(list(root) if root.tag == "testsuites" else [root])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    ET.ElementTree(merged).write(path, encoding="utf-8", xml_declaration=True)
+
+
+def merge_shard_results(
+    command: str,
+    results: List[ExecutionResult],
+    shards: List[List[str]],
+    duration_seconds: float,
+    spool_path: Path,
+    head_bytes: int = 32 * 1024,
+    tail_bytes: int = 32 * 1024,
+) -> ExecutionResult:
+    """
+    Combine the results of parallel test shards into one, with each shard's
+    output under a header and a pytest-style summary line of the summed counts.
+    The first failing exit code wins. Like run_streaming, only a bounded head
+    and tail of the combined output are kept in memory.
+    """
+    sections = []
+    counts: Dict[str, int] = {}
+    with open(spool_path, "wb") as spool:
+        for index, (result, tests) in enumerate(zip(results, shards)):
+            header = (
+                f"===== shard {index + 1}/{len(results)}: {len(tests)} tests, exit code {result.exit_code}, "
+                f"{result.duration_seconds:.2f}s{', timed out' if result.timed_out else ''} =====\n"
+            )
+            sections.append(header + result.output)
+            spool.write(header.encode("utf-8"))
+            if result.spool_path:
+                with open(result.spool_path, "rb") as shard_spool:
+                    shutil.copyfileobj(shard_spool, spool)
+            for outcome, number in (parse_pytest_summary(result.output) or {}).items():
+                counts[outcome] = counts.get(outcome, 0) + number
+        summary = ", ".join(f"{number} {outcome}" for outcome, number in counts.items()) or "no tests ran"
+        footer = f"\n===== {summary} in {duration_seconds:.2f}s ({len(results)} shards) =====\n"
+        spool.write(footer.encode("utf-8"))
+    output = ("".join(sections) + footer).encode("utf-8")
+    head = output[:head_bytes]
+    tail = output[len(head):][-tail_bytes:]
+
+    peaks = [result.peak_rss_bytes for result in results if result.peak_rss_bytes is not None]
+    return ExecutionResult(
+        command=command,
+        exit_code=next((result.exit_code for result in results if result.exit_code != 0), 0),
+        duration_seconds=duration_seconds,
+        started_at=min(result.started_at for result in results),
+        # The shards run at the same time, so their peaks add up
+        peak_rss_bytes=sum(peaks) if peaks else None,
+        timed_out=any(result.timed_out for result in results),
+        total_bytes=len(output),
+        head=head.decode("utf-8", errors="replace"),
+        tail=tail.decode("utf-8", errors="replace"),
+        spool_path=str(spool_path),
+    )
+
+
+def kill_process_group(process: subprocess.Popen, sig: int = signal.SIGTERM):
+    """Signal the process and everything it spawned."""
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, sig)
+        elif sig == signal.SIGTERM:
+            process.terminate()
+        else:
+            process.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def process_tree_rss(pid: int) -> Optional[int]:
+    """
+    Resident memory of a process and its descendants, read from /proc (Linux only).
+
+    The direct child's high-water mark is used for the root process, so peaks
+    between samples are not missed for it.
+    """
+    proc = Path("/proc")
+    if not proc.exists():
+        return None
+
+    def status_kb(pid: int, field: str) -> int:
+        try:
+            for line in (proc / str(pid) / "status").read_text().splitlines():
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+        except (OSError, ValueError):
+            pass
+        return 0
+
+    total = status_kb(pid, "VmHWM")
+    pending = [pid]
+    while pending:
+        parent = pending.pop()
+        try:
+            children = (proc / str(parent) / "task" / str(parent) / "children").read_text().split()
+        except OSError:
+            continue
+        for child in map(int, children):
+            total += status_kb(child, "VmRSS")
+            pending.append(child)
+    return total * 1024 if total else None
+
+
+def run_streaming(
+    command: str,
+    timeout: Optional[float] = None,
+    spool_path: Optional[Path] = None,
+    head_bytes: int = 32 * 1024,
+    tail_bytes: int = 32 * 1024,
+    kill_grace_seconds: float = 5.0,
+) -> ExecutionResult:
+    """
+    Run a command, streaming its combined output to a spool file while keeping
+    only a bounded head and tail in memory. The whole process group is killed
+    if the wall-clock timeout is exceeded.
+    """
+    started_at = time.time()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        shlex.split(command),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        stdin=subprocess.DEVNULL,
+        start_new_session=hasattr(os, "killpg"),
+    )
+
+    head = bytearray()
+    tail = bytearray()
+    total_bytes = 0
+
+    def pump():
+        nonlocal total_bytes
+        spool = open(spool_path, "wb") if spool_path else None
+        try:
+            while True:
+                chunk = process.stdout.read1(64 * 1024)
+                if not chunk:
+                    break
+                if spool:
+                    spool.write(chunk)
+                total_bytes += len(chunk)
+                if len(head) < head_bytes:
+                    take = head_bytes - len(head)
+                    head.extend(chunk[:take])
+                    chunk = chunk[take:]
+                tail.extend(chunk)
+                if len(tail) > tail_bytes:
+                    del tail[:len(tail) - tail_bytes]
+        finally:
+            if spool:
+                spool.close()
+
+    if spool_path:
+        Path(spool_path).parent.mkdir(parents=True, exist_ok=True)
+    reader = threading.Thread(target=pump, name="director-exec-output", daemon=True)
+    reader.start()
+
+    exit_code = None
+    rusage = None
+    sampled_rss = None
+    timed_out = False
+    kill_deadline = None
+    poll_interval = 0.001
+    try:
+        while exit_code is None:
+            if hasattr(os, "wait4"):
+                # wait4 reports resource usage for this child (and its reaped descendants)
+                pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+                if pid:
+                    exit_code = os.waitstatus_to_exitcode(status)
+                    process.returncode = exit_code
+                    rusage = usage
+                    break
+            elif process.poll() is not None:
+                exit_code = process.returncode
+                break
+
+            rss = process_tree_rss(process.pid)
+            if rss is not None:
+                sampled_rss = max(sampled_rss or 0, rss)
+
+            now = time.perf_counter()
+            if timeout is not None and not timed_out and now - start >= timeout:
+                timed_out = True
+                kill_process_group(process, signal.SIGTERM)
+                kill_deadline = now + kill_grace_seconds
+            elif kill_deadline is not None and now >= kill_deadline:
+                kill_process_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+                kill_deadline = None
+
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, 0.05)
+    finally:
+        if exit_code is None:
+            # Interrupted (e.g. KeyboardInterrupt); never leave the command running
+            kill_process_group(process, getattr(signal, "SIGKILL", signal.SIGTERM))
+            process.wait()
+
+    # Orphaned grandchildren may keep the pipe open; don't wait on them forever
+    reader.join(timeout=kill_grace_seconds)
+    process.stdout.close()
+
+    # On Linux ru_maxrss also counts the Director's own memory, inherited by the
+    # child at fork, so prefer the /proc samples when they are available
+    peak_rss_bytes = sampled_rss
+    if peak_rss_bytes is None and rusage is not None:
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        peak_rss_bytes = rusage.ru_maxrss if sys.platform == "darwin" else rusage.ru_maxrss * 1024
+
+    return ExecutionResult(
+        command=command,
+        exit_code=exit_code,
+        duration_seconds=time.perf_counter() - start,
+        started_at=started_at,
+        peak_rss_bytes=peak_rss_bytes,
+        timed_out=timed_out,
+        total_bytes=total_bytes,
+        head=bytes(head).decode("utf-8", errors="replace"),
+        tail=bytes(tail).decode("utf-8", errors="replace"),
+        spool_path=str(spool_path) if spool_path else None,
+    )
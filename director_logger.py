@@ -0,0 +1,139 @@
+"""
+Structured run log for the Director
+
+JSONL records written by a background thread, rotated by size, with large
+payloads compressed into a blob file.
+"""
+
+import json
+import os
+import queue
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import List
+
+
+class RunLogger:
+    """
+    Buffered, structured JSONL log for a Director run.
+
+    Records are queued in memory and written by a background thread, so the
+    Director never blocks on file I/O. The log file is rotated by size, and
+    payloads larger than blob_threshold bytes are zlib-compressed into a
+    separate blob file with only a reference kept inline.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        path: str,
+        run_id: str,
+        max_bytes: int = 10 * 1024 * 1024,
+        backup_count: int = 5,
+        blob_threshold: int = 0,
+        flush_interval: float = 0.5,
+    ):
+        self.path = Path(path)
+        self.run_id = run_id
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.blob_threshold = blob_threshold
+        self.blob_path = self.path.with_name(f"{self.path.stem}.{run_id}.blobs")
+        self.flush_interval = flush_interval
+        self.started_at = time.time()
+        self.queue = queue.Queue()
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def log(self, message: str, **fields):
+        """Queue a record; never touches the filesystem on the caller's thread."""
+        now = time.time()
+        record = {
+            "ts": now,
+            "elapsed": round(now - self.started_at, 6),
+            "run_id": self.run_id,
+            **fields,
+            "size": len(message.encode("utf-8")),
+            "message": message,
+        }
+        self._ensure_thread()
+        self.queue.put(record)
+
+    def _ensure_thread(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._writer, name="director-log", daemon=True)
+                self.thread.start()
+
+    def _writer(self):
+        stop = False
+        while not stop:
+            batch = [self.queue.get()]
+            # Drain whatever else arrived so it is written with a single syscall
+            deadline = time.monotonic() + self.flush_interval
+            while batch[-1] is not self._STOP:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is self._STOP:
+                batch.pop()
+                stop = True
+            if batch:
+                self._write(batch)
+            for _ in range(len(batch) + stop):
+                self.queue.task_done()
+
+    def _write(self, records: List[dict]):
+        lines = []
+        for record in records:
+            if self.blob_threshold and record["size"] > self.blob_threshold:
+                record["blob"] = self._write_blob(record.pop("message"))
+            lines.append(json.dumps(record, ensure_ascii=False))
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists() and self.path.stat().st_size + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "ab") as f:
+            f.write(data)
+
+    def _write_blob(self, message: str) -> dict:
+        data = zlib.compress(message.encode("utf-8"))
+        with open(self.blob_path, "ab") as f:
+            offset = f.tell()
+            f.write(data)
+        return {"file": self.blob_path.name, "offset": offset, "length": len(data)}
+
+    def _rotate(self):
+        for index in range(self.backup_count - 1, 0, -1):
+            source = self.path.with_name(f"{self.path.name}.{index}")
+            if source.exists():
+                os.replace(source, self.path.with_name(f"{self.path.name}.{index + 1}"))
+        if self.backup_count > 0:
+            os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+        else:
+            self.path.unlink()
+
+    @staticmethod
+    def read_blob(log_path: str, blob: dict) -> str:
+        """Load a payload that was stored out of line by _write_blob."""
+        with open(Path(log_path).with_name(blob["file"]), "rb") as f:
+            f.seek(blob["offset"])
+            return zlib.decompress(f.read(blob["length"])).decode("utf-8")
+
+    def flush(self):
+        """Block until every queued record has been written."""
+        if self.thread is not None and self.thread.is_alive():
+            self.queue.join()
+
+    def close(self):
+        """Flush and stop the writer thread. Logging again restarts it."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None and thread.is_alive():
+            self.queue.put(self._STOP)
+            thread.join()
@@ -0,0 +1,415 @@
+"""
+Multi-config runner for the Director
+
+Runs several configs at once, or several coder candidates for one iteration,
+each in its own git worktree or copy of the tree and in its own process.
+"""
+
+import glob
+import multiprocessing
+import os
+import shutil
+import signal
+import subprocess
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Type, TYPE_CHECKING
+
+from pydantic import BaseModel
+
+from agents.telemetry import trace
+from director_evaluators import EvaluationResult
+from director_execution import ExecutionResult, parse_pytest_summary
+
+# Runs are given the Director class to build, as director.py imports this module
+if TYPE_CHECKING:
+    from director import Director
+
+
+class RunResult(BaseModel):
+    """Outcome of one Director run, used for the multi-config summary."""
+    config: str
+    success: bool
+    iterations: int
+    duration_seconds: float
+    workspace: Optional[str] = None
+    log_file: Optional[str] = None
+    error: Optional[str] = None
+
+
+class CandidateResult(BaseModel):
+    """Outcome of one speculative coder candidate."""
+    index: int
+    execution: Optional[ExecutionResult] = None
+    evaluation: Optional[EvaluationResult] = None
+    score: float = 0.0
+    duration_seconds: float = 0.0
+    error: Optional[str] = None
+
+
+def candidate_score(execution: ExecutionResult, evaluation: EvaluationResult) -> float:
+    """Rank candidates: success first, then by share of passing tests, then by exit code."""
+    if evaluation.success:
+        return 1.0
+    counts = parse_pytest_summary(execution.output)
+    if counts:
+        ran = counts.get("passed", 0) + counts.get("failed", 0) + counts.get("error", 0)
+        if ran:
+            return 0.9 * counts.get("passed", 0) / ran
+    return 0.1 if execution.exit_code == 0 else 0.0
+
+
+# Never copied into a workspace: version control, Director state, environments and caches
+WORKSPACE_IGNORED_NAMES = (".git", ".director", ".venv", "venv", "__pycache__", ".pytest_cache", "node_modules")
+WORKSPACE_IGNORE = shutil.ignore_patterns(*WORKSPACE_IGNORED_NAMES)
+
+
+def expand_config_paths(patterns: List[str]) -> List[str]:
+    """Expand glob patterns into a de-duplicated, ordered list of config paths."""
+    config_paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            raise FileNotFoundError(f"No config files match: {pattern}")
+        for match in matches:
+            if match not in config_paths:
+                config_paths.append(match)
+    return config_paths
+
+
+def git_toplevel(path: Path) -> Optional[Path]:
+    """Return the git top-level directory containing path, or None."""
+    result = subprocess.run(
+        ["git", "-C", str(path), "rev-parse", "--show-toplevel"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    return Path(result.stdout.strip())
+
+
+def git_uncommitted_files(path: Path) -> List[str]:
+    """
+    Modified and untracked files under path that git does not ignore, relative
+    to path, leaving out Director state, environments and caches.
+    """
+    result = subprocess.run(
+        ["git", "-C", str(path), "ls-files", "-z", "--modified", "--others", "--exclude-standard"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return []
+    return [
+        name for name in result.stdout.split("\0")
+        if name and not set(Path(name).parts) & set(WORKSPACE_IGNORED_NAMES)
+    ]
+
+
+def prepare_workspace(workspace: Path, isolation: str, overlay: List[str]) -> Path:
+    """
+    Create an isolated copy of the current directory for a single run.
+
+    With "worktree" isolation a detached git worktree of HEAD is created and the
+    overlay files (the run's config, prompt and context files) are copied over
+    it from the current tree, along with every modified or untracked file git
+    does not ignore, so that uncommitted edits are picked up. Ignored files such as .env are not copied;
+    use "copy" isolation when a run needs them. With "copy" isolation the
+    current directory is copied wholesale. Returns the directory the run should
+    execute in.
+    """
+    source = Path.cwd()
+    workspace.parent.mkdir(parents=True, exist_ok=True)
+
+    if isolation == "worktree":
+        toplevel = git_toplevel(source)
+        if toplevel is None:
+            raise ValueError(f"Worktree isolation requires a git repository: {source}")
+        subprocess.run(
+            ["git", "-C", str(toplevel), "worktree", "add", "--detach", "--quiet", str(workspace), "HEAD"],
+            check=True,
+        )
+        run_dir = workspace / source.resolve().relative_to(toplevel.resolve())
+
+        for rel_path in dict.fromkeys(overlay + git_uncommitted_files(source)):
+            if Path(rel_path).is_absolute() or not (source / rel_path).is_file():
+                continue
+            target = run_dir / rel_path
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source / rel_path, target)
+        return run_dir
+
+    if isolation == "copy":
+        shutil.copytree(source, workspace, ignore=WORKSPACE_IGNORE, symlinks=True)
+        return workspace
+
+    raise ValueError(f"Unknown isolation mode: {isolation}")
+
+
+def run_isolated(
+    director_class: Type["Director"], config_path: str, run_dir: str, director_kwargs: Dict[str, Any]
+) -> RunResult:
+    """
+    Run a single config inside its workspace. Executed in a fresh worker process,
+    so environment changes made by the Director cannot leak between runs.
+    """
+    start = time.perf_counter()
+    os.chdir(run_dir)
+    os.environ["DIRECTOR_WORKSPACE"] = run_dir
+
+    # Keep each run's console output in its own file instead of interleaving
+    console_path = Path(run_dir) / "director_console.txt"
+    console = open(console_path, "a", encoding="utf-8")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(console.fileno(), 1)
+    os.dup2(console.fileno(), 2)
+
+    director = None
+    try:
+        director = director_class(config_path, **director_kwargs)
+        success = director.direct()
+        error = None
+    except Exception as e:
+        success = False
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        console.close()
+
+    return RunResult(
+        config=config_path,
+        success=success,
+        iterations=director.iterations_run if director else 0,
+        duration_seconds=time.perf_counter() - start,
+        workspace=run_dir,
+        log_file=str(Path(run_dir) / director_kwargs.get("log_file", "director_log.jsonl")),
+        error=error,
+    )
+
+
+def remove_workspace(workspace: Path):
+    """Delete a workspace created by prepare_workspace, unregistering git worktrees."""
+    if (workspace / ".git").is_file():
+        subprocess.run(
+            ["git", "worktree", "remove", "--force", str(workspace)],
+            cwd=workspace.parent,
+            capture_output=True,
+        )
+    shutil.rmtree(workspace, ignore_errors=True)
+
+
+def archive_run_outputs(result: RunResult, run_dir: Path, runs_dir: Path, destination: Path) -> RunResult:
+    """
+    Move a run's log files, console output and run records (under runs_dir) out
+    of its workspace into destination, so they outlive the workspace. Returns the
+    result with its workspace and log file pointing at the archived copies.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    outputs = [run_dir / "director_console.txt", run_dir / runs_dir]
+    if result.log_file:
+        log_file = Path(result.log_file)
+        # Rotated logs and blob files share the log's stem
+        outputs += sorted(log_file.parent.glob(f"{log_file.stem}*"))
+    for path in outputs:
+        if path.exists():
+            shutil.move(str(path), str(destination / path.name))
+    return result.model_copy(update={
+        "workspace": str(destination),
+        "log_file": str(destination / Path(result.log_file).name) if result.log_file else None,
+    })
+
+
+def run_candidate(
+    director_class: Type["Director"],
+    index: int,
+    config_path: str,
+    run_dir: str,
+    output_prefix: str,
+    prompt: str,
+    iteration: int,
+    failing_tests: List[str],
+    director_kwargs: Dict[str, Any],
+    results_queue,
+):
+    """
+    Code, execute and evaluate one speculative candidate inside its sandbox.
+    Executed in a spawned process; SIGTERM unwinds normally so a running
+    execution command is killed with it.
+    """
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(128 + signum))
+    start = time.perf_counter()
+    os.chdir(run_dir)
+
+    console = open(f"{output_prefix}.console.txt", "a", encoding="utf-8")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os.dup2(console.fileno(), 1)
+    os.dup2(console.fileno(), 2)
+
+    try:
+        director = director_class(
+            config_path,
+            log_file=f"{output_prefix}.jsonl",
+            telemetry_path=f"{output_prefix}.spans.jsonl",
+            **director_kwargs,
+        )
+        director.iteration = iteration
+        director.failing_tests = failing_tests
+        try:
+            director.phase = "code"
+            with trace("phase", director.phase, iteration=iteration, candidate=index):
+                director.ai_code(prompt)
+            director.phase = "execute"
+            with trace("phase", director.phase, iteration=iteration, candidate=index):
+                execution = director.execute()
+            director.phase = "evaluate"
+            with trace("phase", director.phase, iteration=iteration, candidate=index):
+                evaluation = director.evaluate(execution)
+        finally:
+            director.close_coder_session()
+            director.logger.close()
+        result = CandidateResult(
+            index=index,
+            execution=execution,
+            evaluation=evaluation,
+            score=candidate_score(execution, evaluation),
+            duration_seconds=time.perf_counter() - start,
+        )
+    except Exception as e:
+        result = CandidateResult(
+            index=index,
+            duration_seconds=time.perf_counter() - start,
+            error=f"{type(e).__name__}: {e}",
+        )
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+
+    results_queue.put(result.model_dump())
+
+
+def run_many(
+    director_class: Type["Director"],
+    config_paths: List[str],
+    max_workers: int,
+    isolation: str = "auto",
+    workspace_root: str = ".director/workspaces",
+    keep_workspaces: bool = False,
+    **director_kwargs,
+) -> List[RunResult]:
+    """
+    Run several configs concurrently, each in its own workspace and process.
+    Each workspace is removed once its result is in, with the run's logs kept
+    under <batch>/logs/, unless keep_workspaces is set. Extra keyword arguments
+    are passed to every director_class instance.
+    """
+    if isolation == "auto":
+        isolation = "worktree" if git_toplevel(Path.cwd()) else "copy"
+
+    # Batches started within the same second must not share workspaces
+    batch_root = Path(workspace_root).resolve() / f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+    # Runs share one evaluation cache, resolved before each worker changes directory
+    director_kwargs["eval_cache_dir"] = str(
+        Path(director_kwargs.get("eval_cache_dir", ".director/cache/evaluations")).resolve()
+    )
+    if director_kwargs.get("cassette"):
+        director_kwargs["cassette"] = str(Path(director_kwargs["cassette"]).resolve())
+    results = []
+    run_dirs = {}
+    workspaces = {}
+    for index, config_path in enumerate(config_paths):
+        workspace = batch_root / f"{index:02d}-{Path(config_path).stem}"
+        workspaces[config_path] = workspace
+        try:
+            overlay = director_class.workspace_files(config_path)
+            run_dirs[config_path] = prepare_workspace(workspace, isolation, overlay)
+        except Exception as e:
+            results.append(RunResult(
+                config=config_path,
+                success=False,
+                iterations=0,
+                duration_seconds=0.0,
+                workspace=str(workspace),
+                error=f"Workspace setup failed: {type(e).__name__}: {e}",
+            ))
+
+    print(f"Running {len(run_dirs)} configs with {max_workers} workers ({isolation} isolation)")
+    print(f"Workspaces: {batch_root}")
+
+    try:
+        # A fresh process per run keeps os.environ and aider state isolated
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            max_tasks_per_child=1,
+        ) as executor:
+            futures = {
+                executor.submit(run_isolated, director_class, config_path, str(run_dir), director_kwargs): config_path
+                for config_path, run_dir in run_dirs.items()
+            }
+            for future in as_completed(futures):
+                config_path = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = RunResult(
+                        config=config_path,
+                        success=False,
+                        iterations=0,
+                        duration_seconds=0.0,
+                        workspace=str(run_dirs[config_path]),
+                        error=f"Worker crashed: {type(e).__name__}: {e}",
+                    )
+                if not keep_workspaces:
+                    workspace = workspaces.pop(config_path)
+                    result = archive_run_outputs(
+                        result, run_dirs[config_path], director_class.RUNS_DIR, batch_root / "logs" / workspace.name
+                    )
+                    remove_workspace(workspace)
+                print(f"{'✅' if result.success else '❌'} {config_path} ({result.duration_seconds:.1f}s)")
+                results.append(result)
+    finally:
+        if not keep_workspaces:
+            # Workspaces whose setup failed or whose result never arrived
+            for workspace in workspaces.values():
+                remove_workspace(workspace)
+            if isolation == "worktree":
+                subprocess.run(["git", "worktree", "prune"], capture_output=True)
+
+    order = {config_path: index for index, config_path in enumerate(config_paths)}
+    return sorted(results, key=lambda result: order[result.config])
+
+
+def print_run_summary(results: List[RunResult]):
+    """Print a combined summary table for a multi-config run."""
+    headers = ["Config", "Status", "Iterations", "Duration", "Workspace"]
+    rows = [
+        [
+            result.config,
+            "success" if result.success else ("error" if result.error else "failed"),
+            str(result.iterations),
+            f"{result.duration_seconds:.1f}s",
+            result.workspace or "",
+        ]
+        for result in results
+    ]
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+
+    print()
+    print("  ".join(header.ljust(width) for header, width in zip(headers, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in rows:
+        print("  ".join(cell.ljust(width) for cell, width in zip(row, widths)))
+
+    for result in results:
+        if result.error:
+            print(f"\n{result.config}: {result.error}")
+
+    succeeded = sum(result.success for result in results)
+    print(f"\n{succeeded}/{len(results)} configs succeeded.")
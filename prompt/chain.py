@@ -0,0 +1,810 @@
+#!/usr/bin/env -S uv run --script
+
+# /// script
+# dependencies = [
+#   "pytest>=7.4.0",
+#   "rich>=13.7.0",
+#   "python-dotenv>=1.0.0",
+#   "openai>=1.65.0,<1.66.0"
+# ]
+# ///
+
+"""
+Prompt Chain Engine
+
+Runs the prompt chaining patterns in this directory as a DAG of prompt nodes.
+Each node's prompt is a template over the chain inputs and the outputs of the
+nodes it depends on. A node starts as soon as its dependencies finish, so
+independent nodes (like the three workers of workers.sh) run concurrently on
+one shared async client. Every model call is memoized by model and rendered
+prompt, so a re-run only calls the model for nodes whose prompt changed.
+
+The bash samples are ported as pipelines: snowball, workers, plan-execute,
+decision, self-correct and fallback. Each run prints a timing table per node.
+
+Models named "azure/<deployment>" use Azure OpenAI (AZURE_API_KEY,
+AZURE_API_BASE); any other model uses OpenAI (OPENAI_API_KEY).
+
+Run with:
+    uv run chain.py workers
+    uv run chain.py decision --set request="How do I set up a secure home network?"
+    uv run chain.py snowball --set topic="Edge AI" --model azure/gpt-4o
+
+Call the models again instead of reusing memoized replies:
+    uv run chain.py workers --fresh
+
+Test with:
+    uv run pytest chain.py
+"""
+
+import os
+import re
+import sys
+import json
+import sqlite3
+import hashlib
+import argparse
+import asyncio
+import time
+import weakref
+from contextvars import ContextVar
+from dataclasses import dataclass
+from string import Template
+from typing import Optional, Dict, List, Tuple, Union, Callable, Awaitable
+from rich.console import Console
+from rich.panel import Panel
+from rich.table import Table
+from dotenv import load_dotenv
+
+import httpx
+from openai import AsyncOpenAI, AsyncAzureOpenAI, OpenAIError
+
+# Initialize console and load environment variables
+console = Console()
+load_dotenv()
+
+# Constants
+MODEL = os.environ.get("CHAIN_MODEL", "gpt-4o-mini")  # Model of nodes that don't name one
+
+# Shared clients per event loop (httpx connection pools can't cross loops), keyed by provider
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, Union[AsyncOpenAI, AsyncAzureOpenAI]]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+def get_client(model: str) -> Union[AsyncOpenAI, AsyncAzureOpenAI]:
+    """
+    Return the shared async client for a model on the running event loop.
+
+    Args:
+        model: Model name; "azure/<deployment>" selects Azure OpenAI
+
+    Returns:
+        An AsyncAzureOpenAI or AsyncOpenAI client instance.
+    """
+    loop_clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    provider = "azure" if model.startswith("azure/") else "openai"
+    if provider in loop_clients:
+        return loop_clients[provider]
+
+    if provider == "azure":
+        if not os.environ.get("AZURE_API_KEY"):
+            raise ValueError("Azure OpenAI API key not found. Set AZURE_API_KEY environment variable.")
+        if not os.environ.get("AZURE_API_BASE"):
+            raise ValueError("Azure OpenAI endpoint not found. Set AZURE_API_BASE environment variable.")
+        loop_clients[provider] = AsyncAzureOpenAI(
+            api_key=os.environ.get("AZURE_API_KEY"),
+            api_version=os.environ.get("AZURE_API_VERSION", "2024-02-15-preview"),
+            azure_endpoint=os.environ.get("AZURE_API_BASE"),
+        )
+    else:
+        if not os.environ.get("OPENAI_API_KEY"):
+            raise ValueError("OpenAI API key not found. Set OPENAI_API_KEY environment variable.")
+        loop_clients[provider] = AsyncOpenAI()
+    return loop_clients[provider]
+
+async def close_clients():
+    """Close the shared clients of the running event loop."""
+    for client in _clients.pop(asyncio.get_running_loop(), {}).values():
+        await client.close()
+
+class ChainCache:
+    """
+    Memoized model replies, keyed by a hash of the model and the rendered prompt.
+
+    Replies are kept in memory and, when a path is given, in a SQLite file, so a
+    later run of the same chain reuses every reply whose prompt did not change.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.memory: Dict[str, str] = {}
+        self.db = None
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.db = sqlite3.connect(path)
+            with self.db:
+                self.db.execute(
+                    "CREATE TABLE IF NOT EXISTS replies (key TEXT PRIMARY KEY, model TEXT, created_at REAL, value TEXT)"
+                )
+
+    @staticmethod
+    def make_key(model: str, prompt: str) -> str:
+        return hashlib.sha256(json.dumps([model, prompt]).encode("utf-8")).hexdigest()
+
+    def get(self, model: str, prompt: str) -> Optional[str]:
+        key = self.make_key(model, prompt)
+        if key not in self.memory and self.db is not None:
+            row = self.db.execute("SELECT value FROM replies WHERE key = ?", (key,)).fetchone()
+            if row:
+                self.memory[key] = row[0]
+        return self.memory.get(key)
+
+    def put(self, model: str, prompt: str, value: str):
+        key = self.make_key(model, prompt)
+        self.memory[key] = value
+        if self.db is not None:
+            with self.db:
+                self.db.execute("INSERT OR REPLACE INTO replies VALUES (?, ?, ?, ?)", (key, model, time.time(), value))
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
+
+@dataclass
+class Node:
+    """
+    One step of a chain.
+
+    prompt is a string.Template over the chain inputs and the outputs of deps
+    ($name); a $ that names neither, as in a price or a shell snippet, is left
+    as it is. A node with run instead calls chain.complete() itself, for steps
+    that validate, loop or fall back. A node is skipped when when(values)
+    returns False or any of its dependencies was skipped.
+    """
+    name: str
+    prompt: str = ""
+    deps: Tuple[str, ...] = ()
+    model: Optional[str] = None
+    run: Optional[Callable[["Chain", Dict[str, str]], Awaitable[str]]] = None
+    when: Optional[Callable[[Dict[str, str]], bool]] = None
+
+@dataclass
+class NodeResult:
+    """Output and timing of one node in a chain run."""
+    name: str
+    model: str
+    output: Optional[str] = None
+    start: float = 0.0
+    duration: float = 0.0
+    calls: int = 0
+    memoized: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def skipped(self) -> bool:
+        return self.output is None
+
+# The result of the node whose code is running, so complete() can account its calls
+_current_node: ContextVar[Optional[NodeResult]] = ContextVar("current_node", default=None)
+
+class Chain:
+    """
+    A DAG of prompt nodes run concurrently on a shared client, with memoized replies.
+
+    Each node runs in its own task once its dependencies are done, and at most
+    concurrency model calls are in flight at a time.
+    """
+    def __init__(
+        self,
+        name: str,
+        nodes: List[Node],
+        inputs: Optional[Dict[str, str]] = None,
+        outputs: Optional[List[str]] = None,
+        model: str = MODEL,
+        cache: Optional[ChainCache] = None,
+        fresh: bool = False,
+        concurrency: int = 8,
+    ):
+        self.name = name
+        self.nodes = {node.name: node for node in nodes}
+        if len(self.nodes) != len(nodes):
+            raise ValueError(f"Chain '{name}' has duplicate node names")
+        self.order = self.topological_order()
+        self.inputs = dict(inputs or {})
+        self.outputs = outputs or [self.order[-1]]
+        self.model = model
+        self.cache = cache if cache is not None else ChainCache()
+        self.fresh = fresh
+        self.concurrency = concurrency
+        self.client: Optional[Union[AsyncOpenAI, AsyncAzureOpenAI]] = None
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.wall_seconds = 0.0
+
+    def topological_order(self) -> List[str]:
+        """Node names with every node after its dependencies; raises ValueError on unknown deps or cycles."""
+        for node in self.nodes.values():
+            for dep in node.deps:
+                if dep not in self.nodes:
+                    raise ValueError(f"Node '{node.name}' depends on unknown node '{dep}'")
+        order: List[str] = []
+        pending = {name: set(node.deps) for name, node in self.nodes.items()}
+        while pending:
+            ready = [name for name, deps in pending.items() if not deps]
+            if not ready:
+                raise ValueError(f"Chain '{self.name}' has a cycle through {sorted(pending)}")
+            for name in ready:
+                order.append(name)
+                del pending[name]
+            for deps in pending.values():
+                deps.difference_update(ready)
+        return order
+
+    async def complete(self, prompt: str, model: Optional[str] = None) -> str:
+        """
+        Return the model's reply to a prompt, memoized by model and prompt.
+
+        Args:
+            prompt: The rendered prompt
+            model: Model to call (default: the chain's model)
+
+        Returns:
+            The reply text.
+        """
+        model = model or self.model
+        result = _current_node.get()
+        if result is not None:
+            result.calls += 1
+
+        if not self.fresh:
+            memoized = self.cache.get(model, prompt)
+            if memoized is not None:
+                if result is not None:
+                    result.memoized += 1
+                return memoized
+
+        async with self.semaphore:
+            response = await (self.client or get_client(model)).chat.completions.create(
+                model=model.removeprefix("azure/"),
+                messages=[{"role": "user", "content": prompt}],
+            )
+        content = response.choices[0].message.content or ""
+        if result is not None and response.usage:
+            result.prompt_tokens += response.usage.prompt_tokens
+            result.completion_tokens += response.usage.completion_tokens
+        self.cache.put(model, prompt, content)
+        return content
+
+    async def run(self, **inputs: str) -> Dict[str, NodeResult]:
+        """
+        Run every node, each as soon as its dependencies are done.
+
+        Args:
+            **inputs: Values for the chain's template inputs, over its defaults
+
+        Returns:
+            The result of each node, by name.
+        """
+        values = {**self.inputs, **inputs}
+        # A fresh semaphore per run, as each asyncio.run() has its own event loop
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, NodeResult] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        start = time.perf_counter()
+
+        async def run_node(node: Node):
+            if node.deps:
+                await asyncio.gather(*(tasks[dep] for dep in node.deps))
+            result = results[node.name] = NodeResult(
+                node.name, node.model or self.model, start=time.perf_counter() - start
+            )
+            if any(results[dep].skipped for dep in node.deps):
+                return
+            # A node sees only the inputs and its own dependencies, so its memo key covers everything it uses
+            node_values = {**values, **{dep: results[dep].output for dep in node.deps}}
+            if node.when and not node.when(node_values):
+                return
+            _current_node.set(result)
+            if node.run:
+                result.output = await node.run(self, node_values)
+            else:
+                result.output = await self.complete(Template(node.prompt).safe_substitute(node_values), node.model)
+            result.duration = time.perf_counter() - start - result.start
+
+        for name in self.order:
+            tasks[name] = asyncio.create_task(run_node(self.nodes[name]), name=f"{self.name}:{name}")
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+        self.wall_seconds = time.perf_counter() - start
+        return {name: results[name] for name in self.order}
+
+def print_timings(chain: Chain, results: Dict[str, NodeResult]):
+    """Print when each node started and how long it took, and the time saved by running nodes concurrently."""
+    table = Table(title=f"{chain.name} timings")
+    for column in ("Node", "Model", "Start", "Time", "Calls", "Tokens in/out", "Source"):
+        table.add_column(column, justify="right" if column in ("Start", "Time", "Calls", "Tokens in/out") else "left")
+    for result in results.values():
+        if result.skipped:
+            source = "skipped"
+        elif result.memoized == result.calls:
+            source = "memoized"
+        else:
+            source = f"model ({result.memoized}/{result.calls} memoized)" if result.memoized else "model"
+        table.add_row(
+            result.name,
+            result.model,
+            f"{result.start:.2f}s",
+            f"{result.duration:.2f}s",
+            str(result.calls),
+            f"{result.prompt_tokens}/{result.completion_tokens}",
+            source,
+        )
+    console.print(table)
+
+    node_seconds = sum(result.duration for result in results.values())
+    calls = sum(result.calls for result in results.values())
+    memoized = sum(result.memoized for result in results.values())
+    console.print(
+        f"Wall time {chain.wall_seconds:.2f}s for {node_seconds:.2f}s of node time "
+        f"({node_seconds / chain.wall_seconds if chain.wall_seconds else 1.0:.1f}x from concurrency); "
+        f"{memoized}/{calls} model calls memoized"
+    )
+
+# ------------- Example pipelines (ports of the bash samples) -------------
+
+def snowball_chain() -> Chain:
+    """snowball.sh: each step grows the previous output, from a title to an HTML page."""
+    return Chain("snowball", [
+        Node("title", "Create a catchy title for a blog post on: $topic"),
+        Node("outline", "Generate a blog post outline for: $title", deps=("title",)),
+        Node("draft", "Write a full blog post based on this outline:\n$outline", deps=("outline",)),
+        Node("html", "Convert this blog post into a nice html page:\n$draft", deps=("draft",)),
+    ], inputs={"topic": "The Impact of AI on Software Development"}, outputs=["title", "html"])
+
+WORKER_PROMPT = """You are a specialized worker focused on this specific task.
+Complete this subtask thoroughly and with expertise:
+
+SUBTASK: $subtask
+
+Provide a comprehensive, high-quality result."""
+
+def workers_chain() -> Chain:
+    """workers.sh: a plan split into three subtasks, worked on concurrently and synthesized."""
+    nodes = [
+        Node("plan", "Create a plan with three subtasks for $task. Each subtask should be specialized and distinct.",
+             model="gpt-4o-mini"),
+        Node("subtasks", "Extract the three subtasks from this plan:\n$plan", deps=("plan",), model="gpt-4o-mini"),
+    ]
+    for index in (1, 2, 3):
+        nodes.append(Node(f"task{index}", f"From the following list, return only subtask {index}:\n$subtasks",
+                          deps=("subtasks",), model="gpt-4o-mini"))
+        nodes.append(Node(f"result{index}", WORKER_PROMPT.replace("$subtask", f"$task{index}"),
+                          deps=(f"task{index}",), model="gpt-4"))
+    nodes.append(Node("final", """You are a synthesis specialist.
+Combine the following results from specialized workers into a cohesive, unified output.
+Ensure the final result is well-structured, comprehensive, and flows naturally.
+
+WORKER 1 RESULT ($task1):
+$result1
+
+WORKER 2 RESULT ($task2):
+$result2
+
+WORKER 3 RESULT ($task3):
+$result3
+
+Format the output in markdown with appropriate headings, lists, and formatting.
+The result should be a complete, professional document about $task.""",
+        deps=("task1", "task2", "task3", "result1", "result2", "result3"), model="gpt-4o"))
+    return Chain("workers", nodes, inputs={"task": "generating a talk on AI"}, outputs=["plan", "final"])
+
+def plan_execute_chain() -> Chain:
+    """plan-execute.sh: a planning prompt, then an execution prompt that follows the plan."""
+    return Chain("plan-execute", [
+        Node("plan", """You are a strategic AI systems architect.
+For the following complex task, develop a detailed, step-by-step plan.
+Focus on creating a comprehensive technical approach that addresses all key aspects.
+Do not implement any part of the plan yet - just create the architectural blueprint.
+
+TASK: $task
+
+Respond with a clear, numbered plan with 5-7 main components.
+For each component, include:
+1. The purpose and functionality of this component
+2. Key technical considerations or requirements
+3. How it interfaces with other components
+4. Success criteria for this component
+
+Format your response as a plan only, without any introduction or conclusion."""),
+        Node("implementation", """You are a technical implementation specialist.
+Using the strategic architectural plan below, provide a detailed technical implementation.
+Follow the system architecture exactly but fill in all necessary technical details for practical execution.
+
+SYSTEM ARCHITECTURE PLAN:
+$plan
+
+TASK: $task
+
+Your implementation should:
+1. Follow each component of the architecture in order
+2. Provide specific, actionable technical details for each component
+3. Include sample code snippets, API specifications, or data schemas where appropriate
+4. Specify technologies, frameworks, and tools to be used
+5. Address potential technical challenges and their solutions
+
+Format your response with clear sections corresponding to each component in the plan.""", deps=("plan",)),
+    ], inputs={
+        "task": "Design a comprehensive AI system that can analyze customer support tickets, categorize issues, "
+                "suggest solutions, and identify emerging patterns to improve product design",
+    }, outputs=["plan", "implementation"])
+
+def category(values: Dict[str, str]) -> str:
+    """The decision prompt's category, GENERAL when it isn't one of the others."""
+    decision = values["decision"].strip().upper()
+    return decision if decision in ("FINANCIAL", "TECHNICAL") else "GENERAL"
+
+def decision_chain() -> Chain:
+    """decision.sh: a classifier prompt picks which specialized prompt runs."""
+    return Chain("decision", [
+        Node("decision", """You are a content classifier.
+Analyze the following request and classify it into exactly ONE category:
+FINANCIAL, TECHNICAL, or GENERAL.
+Return only the category name without explanation or additional text.
+
+REQUEST: $request"""),
+        Node("financial", """You are a financial advisor assistant.
+Provide helpful guidance on the following financial question:
+$request
+
+Keep your response focused on educational financial information.""",
+             deps=("decision",), when=lambda values: category(values) == "FINANCIAL"),
+        Node("technical", """You are a technical support assistant.
+Provide clear technical guidance on the following question:
+$request
+
+Focus on practical steps and technical accuracy.""",
+             deps=("decision",), when=lambda values: category(values) == "TECHNICAL"),
+        Node("general", """You are a helpful assistant.
+Provide general information on the following question:
+$request
+
+Be informative but concise.""",
+             deps=("decision",), when=lambda values: category(values) == "GENERAL"),
+    ], inputs={
+        "request": "I need help understanding how to diversify my investment portfolio",
+    }, outputs=["decision", "financial", "technical", "general"])
+
+VALIDATION_PROMPT = """You are a critical validator.
+Carefully evaluate the following solution based on the specified criteria:
+
+SOLUTION:
+$solution
+
+TASK: $task
+
+VALIDATION CRITERIA: $criteria
+
+Identify any issues, errors, or areas for improvement. Be specific and thorough.
+If the solution is perfect and meets all criteria, respond with only the word 'VALID'.
+Otherwise, list each issue clearly and concisely, one per line."""
+
+CORRECTION_PROMPT = """You are a solution improver.
+Below is a solution and validation feedback identifying issues.
+Revise the solution to fix ALL identified issues while maintaining quality.
+
+ORIGINAL SOLUTION:
+$solution
+
+VALIDATION ISSUES:
+$issues
+
+TASK: $task
+
+VALIDATION CRITERIA: $criteria
+
+Return only the corrected solution without explaining your changes."""
+
+async def correct_until_valid(chain: Chain, values: Dict[str, str], max_attempts: int = 3) -> str:
+    """Generate a solution, then validate and correct it until the validator answers VALID."""
+    solution = await chain.complete(Template("""You are an expert creator.
+Generate a solution for the following task:
+
+TASK: $task
+
+Provide a high-quality, professional solution.
+Be thorough and pay attention to details.""").safe_substitute(values))
+    for _ in range(1, max_attempts):
+        issues = await chain.complete(Template(VALIDATION_PROMPT).safe_substitute(values, solution=solution))
+        if issues.strip() == "VALID":
+            break
+        solution = await chain.complete(Template(CORRECTION_PROMPT).safe_substitute(values, solution=solution, issues=issues))
+    return solution
+
+def self_correct_chain() -> Chain:
+    """self-correct.sh: a generate / validate / correct loop, then the result as JSON."""
+    return Chain("self-correct", [
+        Node("solution", run=correct_until_valid),
+        Node("json", """Convert the following Python solution into a valid JSON structure with the solution code as a string value.
+Format it exactly as:
+{
+  "solution": "<SOLUTION_CODE_HERE>",
+  "task": "<TASK_DESCRIPTION>"
+}
+
+Ensure proper escaping of any quotes or special characters in the code.
+
+CODE:
+$solution
+
+TASK: $task""", deps=("solution",)),
+    ], inputs={
+        "task": "Write a Python function to calculate the Fibonacci sequence up to n terms",
+        "criteria": "Check for correctness, efficiency, edge cases (n=0, n=1), and proper documentation",
+    }, outputs=["json"])
+
+SCHEDULE_PROMPT = """Solve the following simple scheduling problem:
+
+A tech company needs to schedule 4 employees (Alice, Bob, Carlos, and Diana) for a project across Monday through Friday. Each day requires exactly 2 employees to be working.
+
+Given these constraints:
+1. The schedule for Monday MUST be Carlos and Diana.
+2. The schedule for Tuesday MUST be Alice and Carlos.
+3. The schedule for Wednesday MUST be Bob and Diana.
+4. The schedule for Thursday MUST be Alice and Diana.
+5. The schedule for Friday MUST be Alice and Bob.
+
+Provide ONLY a JSON response with the solution, following this exact format with no additional text:
+{
+  "solution": {
+    "Monday": ["Carlos", "Diana"],
+    "Tuesday": ["Alice", "Carlos"],
+    "Wednesday": ["Bob", "Diana"],
+    "Thursday": ["Alice", "Diana"],
+    "Friday": ["Alice", "Bob"]
+  }
+}
+
+Make sure your solution exactly matches the required schedule."""
+
+EXPECTED_SCHEDULE = {
+    "Monday": ["Carlos", "Diana"],
+    "Tuesday": ["Alice", "Carlos"],
+    "Wednesday": ["Bob", "Diana"],
+    "Thursday": ["Alice", "Diana"],
+    "Friday": ["Alice", "Bob"],
+}
+
+FALLBACK_MODELS = ["o1-mini", "gpt-4o-mini", "gpt-4"]
+
+def schedule_problems(reply: str) -> List[str]:
+    """What is wrong with a schedule reply, by the checks of fallback.sh; empty when it is valid."""
+    try:
+        solution = json.loads(re.sub(r"^```(?:json)?\s*|\s*```$", "", reply.strip()))["solution"]
+    except (ValueError, KeyError, TypeError):
+        return ["Invalid JSON or missing solution object"]
+    problems = []
+    for day, expected in EXPECTED_SCHEDULE.items():
+        employees = solution.get(day) if isinstance(solution, dict) else None
+        if not isinstance(employees, list):
+            problems.append(f"Missing day: {day}")
+        elif len(employees) != 2:
+            problems.append(f"Wrong number of employees on {day}")
+        elif sorted(employees) != expected:
+            problems.append(f"Incorrect employee assignment on {day}")
+    return problems
+
+async def first_valid_schedule(chain: Chain, values: Dict[str, str]) -> str:
+    """Try each fallback model in turn and return the first reply that passes validation."""
+    for model in FALLBACK_MODELS:
+        try:
+            reply = await chain.complete(SCHEDULE_PROMPT, model)
+        except OpenAIError as e:
+            console.print(f"[yellow]⚠️ Error calling {model}: {e}[/yellow]")
+            continue
+        problems = schedule_problems(reply)
+        if not problems:
+            return reply
+        console.print(f"[yellow]⚠️ {model} result didn't meet criteria ({'; '.join(problems)}), falling back[/yellow]")
+    raise RuntimeError("All models in the fallback chain failed to produce a valid solution.")
+
+def fallback_chain() -> Chain:
+    """fallback.sh: cheaper models first, falling back until a reply passes validation."""
+    return Chain("fallback", [Node("schedule", run=first_valid_schedule)])
+
+PIPELINES: Dict[str, Callable[[], Chain]] = {
+    "snowball": snowball_chain,
+    "workers": workers_chain,
+    "plan-execute": plan_execute_chain,
+    "decision": decision_chain,
+    "self-correct": self_correct_chain,
+    "fallback": fallback_chain,
+}
+
+def main():
+    """Main function to parse arguments and run a pipeline."""
+    parser = argparse.ArgumentParser(description="Run a prompt chain as a DAG of concurrent, memoized prompt nodes")
+    parser.add_argument("pipeline", choices=list(PIPELINES), help="The example pipeline to run")
+    parser.add_argument("--set", action="append", default=[], metavar="NAME=VALUE",
+                        help="Override a pipeline input, e.g. --set task=\"...\" (repeatable)")
+    parser.add_argument("--model", default=MODEL,
+                        help="Model of the nodes that don't name one (default: $CHAIN_MODEL or gpt-4o-mini)")
+    parser.add_argument("--cache", default=".chain/cache.sqlite",
+                        help="SQLite file of memoized replies shared across runs")
+    parser.add_argument("--fresh", action="store_true",
+                        help="Call the models again instead of reusing memoized replies")
+    parser.add_argument("--concurrency", type=int, default=8,
+                        help="Maximum number of concurrent model calls")
+    args = parser.parse_args()
+
+    inputs = {}
+    for item in args.set:
+        name, sep, value = item.partition("=")
+        if not sep:
+            parser.error(f"--set expects NAME=VALUE, got '{item}'")
+        inputs[name] = value
+
+    chain = PIPELINES[args.pipeline]()
+    unknown = set(inputs) - set(chain.inputs)
+    if unknown:
+        parser.error(f"unknown inputs for {args.pipeline}: {', '.join(sorted(unknown))} "
+                     f"(expected {', '.join(sorted(chain.inputs)) or 'none'})")
+    chain.model = args.model
+    chain.cache = ChainCache(args.cache)
+    chain.fresh = args.fresh
+    chain.concurrency = args.concurrency
+
+    async def run_chain():
+        try:
+            return await chain.run(**inputs)
+        finally:
+            await close_clients()
+
+    try:
+        results = asyncio.run(run_chain())
+    except Exception as e:
+        console.print(Panel(f"[bold red]Error: {str(e)}[/bold red]"))
+        sys.exit(1)
+    finally:
+        chain.cache.close()
+
+    for name in chain.outputs:
+        if not results[name].skipped:
+            console.print(Panel(results[name].output, title=name, border_style="green"))
+    print_timings(chain, results)
+
+# Test functions
+def completion(content: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test", "object": "chat.completion", "created": 0, "model": MODEL,
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+    })
+
+def mock_client(service) -> AsyncOpenAI:
+    return AsyncOpenAI(
+        api_key="test",
+        base_url="https://example.invalid/v1",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(service)),
+        max_retries=0,
+    )
+
+def test_independent_nodes_run_concurrently():
+    """Test that the three workers of the workers pipeline are in flight at the same time."""
+    in_flight = 0
+    peak = 0
+
+    async def service(request):
+        nonlocal in_flight, peak
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.05)
+        in_flight -= 1
+        return completion(f"reply to {prompt.splitlines()[0][:40]}")
+
+    chain = workers_chain()
+    chain.client = mock_client(service)
+    results = asyncio.run(chain.run())
+
+    assert peak == 3
+    assert all(not result.skipped for result in results.values())
+    assert results["final"].start >= max(results[f"result{index}"].start for index in (1, 2, 3))
+    assert chain.wall_seconds < sum(result.duration for result in results.values())
+
+def test_rerun_only_recomputes_changed_nodes(tmp_path):
+    """Test that a re-run with one changed input calls the model only for the nodes that depend on it."""
+    calls = []
+
+    def service(request):
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        calls.append(prompt)
+        return completion(f"<{prompt}>")
+
+    def build(cache):
+        chain = Chain("test", [
+            Node("a", "A about $topic"),
+            Node("b", "B from $a", deps=("a",)),
+            Node("c", "C about $audience"),
+            Node("d", "D from $b and $c", deps=("b", "c")),
+        ], inputs={"topic": "ai", "audience": "devs"}, cache=cache)
+        chain.client = mock_client(service)
+        return chain
+
+    path = str(tmp_path / "cache.sqlite")
+    first = asyncio.run(build(ChainCache(path)).run())
+    assert len(calls) == 4
+
+    calls.clear()
+    second = asyncio.run(build(ChainCache(path)).run(audience="managers"))
+    assert calls == ["C about managers", f"D from {first['b'].output} and <C about managers>"]
+    assert second["a"].memoized == second["b"].memoized == 1
+    assert second["a"].output == first["a"].output
+
+def test_decision_runs_only_the_chosen_branch():
+    """Test that the decision pipeline skips the branches the classifier did not choose."""
+    def service(request):
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        return completion("TECHNICAL" if prompt.startswith("You are a content classifier") else "guidance")
+
+    chain = decision_chain()
+    chain.client = mock_client(service)
+    results = asyncio.run(chain.run())
+
+    assert results["technical"].output == "guidance"
+    assert results["financial"].skipped and results["general"].skipped
+
+def test_fallback_moves_on_until_a_schedule_validates():
+    """Test that the fallback pipeline tries the next model when a reply fails validation."""
+    models = []
+
+    def service(request):
+        body = json.loads(request.content)
+        models.append(body["model"])
+        if body["model"] == "o1-mini":
+            return completion('{"solution": {"Monday": ["Carlos"]}}')
+        return completion(json.dumps({"solution": EXPECTED_SCHEDULE}))
+
+    chain = fallback_chain()
+    chain.client = mock_client(service)
+    results = asyncio.run(chain.run())
+
+    assert models == ["o1-mini", "gpt-4o-mini"]
+    assert json.loads(results["schedule"].output)["solution"] == EXPECTED_SCHEDULE
+
+def test_literal_dollars_are_left_in_prompts():
+    """Test that a $ that is not a chain value survives rendering, and complete() works outside run()."""
+    calls = []
+
+    def service(request):
+        prompt = json.loads(request.content)["messages"][-1]["content"]
+        calls.append(prompt)
+        return completion(f"<{prompt}>")
+
+    chain = Chain("dollars", [
+        Node("plan", "Plan $topic for under $5 a month, then run `echo $HOME` and pay $ 3"),
+    ], inputs={"topic": "hosting"})
+    chain.client = mock_client(service)
+    results = asyncio.run(chain.run())
+    assert calls == ["Plan hosting for under $5 a month, then run `echo $HOME` and pay $ 3"]
+    assert not results["plan"].skipped
+
+    chain.fresh = True
+    assert asyncio.run(chain.complete("Costs $10")) == "<Costs $10>"
+
+def test_cycles_and_unknown_dependencies_are_rejected():
+    """Test that a chain refuses a cycle or a dependency on a missing node."""
+    for nodes in (
+        [Node("a", "$b", deps=("b",)), Node("b", "$a", deps=("a",))],
+        [Node("a", "$missing", deps=("missing",))],
+    ):
+        try:
+            Chain("bad", nodes)
+        except ValueError:
+            continue
+        raise AssertionError("expected a ValueError")
+
+if __name__ == "__main__":
+    main()